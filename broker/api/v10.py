@@ -15,6 +15,7 @@
 
 from broker.utils import api as u
 from broker.service.api import v10 as api
+from broker.service import versions
 from flask_cors import CORS
 from flask import jsonify
 
@@ -36,7 +37,8 @@ def install_plugin(data):
 
 @rest.get('/plugins')
 def get_plugins():
-    return jsonify(api.get_all_plugins()), 200
+    return u.render_versioned(api.get_all_plugins, api.plugins_etag,
+                              versions.RESPONSES, 'plugins')
 
 
 @rest.post('/submissions')
@@ -71,12 +73,21 @@ def terminate_submission(submission_id, data):
 
 @rest.get('/submissions')
 def list_submissions():
-    """ List all submissions (done or not).
+    """ List all submissions (done or not), or the page of
+    submissions matching the filters in the query string.
 
     Normal response codes: 200
     Error response codes: 400, 401
     """
-    return u.render(api.list_submissions())
+    args = u.get_request_args()
+    if not args:
+        return u.render_versioned(api.list_submissions,
+                                  api.submissions_etag,
+                                  versions.RESPONSES, 'submissions')
+
+    return u.render_versioned(
+        lambda: api.query_submissions(args), api.submissions_etag,
+        versions.RESPONSES, 'submissions?' + u.get_request_query_string())
 
 
 @rest.get('/submissions/<submission_id>')
@@ -86,7 +97,31 @@ def submission_status(submission_id):
     Normal response codes: 200
     Error response codes: 400
     """
-    return u.render(api.submission_status(submission_id))
+    return u.render_versioned(
+        lambda: api.submission_status(submission_id),
+        lambda: api.submissions_etag(submission_id),
+        versions.RESPONSES, 'submissions/%s' % submission_id)
+
+
+@rest.get('/submissions/timeline')
+def timeline_summary():
+    """ Percentiles of the duration of each phase across the most
+    recent submissions.
+
+    Normal response codes: 200
+    Error response codes: 400
+    """
+    return u.render(api.timeline_summary(u.get_request_args()))
+
+
+@rest.get('/submissions/<submission_id>/timeline')
+def submission_timeline(submission_id):
+    """ Phases of a specific submission, with their durations.
+
+    Normal response codes: 200
+    Error response codes: 400
+    """
+    return u.render(api.submission_timeline(submission_id))
 
 
 @rest.get('/submissions/<submission_id>/report')
@@ -100,6 +135,17 @@ def submission_report(submission_id):
     return u.render(api.submission_report(submission_id))
 
 
+@rest.post('/submissions/reports', status_code=200)
+def batch_reports(data):
+    """ Stream the detailed reports of the selected submissions
+    as newline delimited JSON, in the order they are fetched.
+
+    Normal response codes: 200
+    Error response codes: 400
+    """
+    return u.render_stream(api.batch_reports(data))
+
+
 @rest.get('/submissions/<submission_id>/errors')
 def submission_errors(submission_id):
     """ Show the errors in an execution.
@@ -117,7 +163,25 @@ def submission_log(submission_id):
     Normal response codes: 200
     Error response codes: 400
     """
-    return u.render(api.submission_log(submission_id))
+    args = u.get_request_args()
+    if args.get('follow', '').lower() in ('1', 'true', 'yes'):
+        return u.render_stream(api.follow_submission_log(submission_id,
+                                                         args),
+                               follow=True)
+    return u.render(api.submission_log(submission_id, args))
+
+
+@rest.get('/submissions/<submission_id>/pods/log')
+def submission_pod_logs(submission_id):
+    """ Stream the logs of the Kubernetes pods of a submission.
+
+    Normal response codes: 200
+    Error response codes: 400
+    """
+    args = u.get_request_args()
+    return u.render_text_stream(
+        api.submission_pod_logs(submission_id, args),
+        follow=args.get('follow', '').lower() in ('1', 'true', 'yes'))
 
 
 @rest.get('/submissions/<submission_id>/visualizer')
@@ -191,7 +255,8 @@ def get_clusters():
     Normal response codes: 200
     Error response codes: 400
     """
-    return u.render(api.get_clusters())
+    return u.render_versioned(api.get_clusters, api.clusters_etag,
+                              versions.RESPONSES, 'clusters')
 
 
 @rest.get('/submissions/cluster/activate')
@@ -225,3 +290,77 @@ def delete_all_submissions(data):
     Error response codes: 400
     """
     return u.render(api.delete_all_submissions(data))
+
+
+@rest.get('/health')
+def health():
+    """ State of the circuit breakers of the framework services.
+
+    Normal response codes: 200
+    """
+    return u.render(api.health())
+
+
+@rest.get('/health/ready')
+def readiness():
+    """ Whether the submissions recovered at startup have been
+    reconciled with the cluster.
+
+    Normal response codes: 200
+    Error response codes: 503
+    """
+    progress = api.readiness()
+    return u.render(progress, status=200 if progress['ready'] else 503)
+
+
+@rest.get('/metrics')
+def prometheus_metrics():
+    """ Latency histograms and gauges of the manager, in the
+    Prometheus text exposition format.
+
+    Normal response codes: 200
+    """
+    return u.render_text(api.prometheus_metrics(),
+                         mimetype='text/plain; version=0.0.4')
+
+
+@rest.get('/debug/profiles')
+def debug_profiles():
+    """ Aggregated profiles of the sampled requests of each endpoint.
+
+    Normal response codes: 200
+    Error response codes: 403
+    """
+    return u.render(api.debug_profiles(u.get_request_headers(),
+                                       u.get_request_args()))
+
+
+@rest.delete('/debug/profiles')
+def clear_debug_profiles(data):
+    """ Drop the aggregated profiles.
+
+    Normal response codes: 204
+    Error response codes: 403
+    """
+    api.clear_debug_profiles(u.get_request_headers())
+    return u.render()
+
+
+@rest.get('/debug/threads')
+def debug_threads():
+    """ Live threads with their stacks, and the thread pools.
+
+    Normal response codes: 200
+    Error response codes: 403
+    """
+    return u.render(api.debug_threads(u.get_request_headers()))
+
+
+@rest.delete('/authorization/cache')
+def flush_authorization_cache(data):
+    """ Drop the cached results of the authorization service.
+
+    Normal response codes: 200
+    Error response codes: 400, 401
+    """
+    return u.render(api.flush_authorization_cache(data))
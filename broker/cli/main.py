@@ -16,11 +16,35 @@
 from flask import Flask
 from broker.api.v10 import rest
 from broker.service import api
+from broker.service.api import v10
 from broker.utils import logger
+from broker.utils import serializer
+from broker.utils import wsgi
 
 
-def main():
+def create_app(initialize=True):
+    """ Builds the Flask application of the manager. Unless
+    ``initialize`` is False, the persistence is connected and the
+    submissions of a previous run are recovered first.
+
+    Returns:
+        flask.Flask -- The application, ready to be served
+    """
     app = Flask(__name__)
     app.register_blueprint(rest)
+    logger.start()
+    if initialize:
+        v10.initialize()
+    return app
+
+
+def main():
     logger.configure_logging()
-    app.run(host='0.0.0.0', port=api.port)
+    serializer.set_json_backend(api.json_backend)
+    app = create_app()
+    if api.server == 'threaded':
+        wsgi.serve(app, api.host, api.port,
+                   pool_size=api.server_threads,
+                   backlog=api.server_backlog)
+    else:
+        app.run(host='0.0.0.0', port=api.port)
@@ -162,3 +162,17 @@ class ClusterNotCreatedException(GenericException):
 class ConfigurationError(GenericException):
     code = "CONFIGURATION_ERROR"
     message = "The configuration has failed"
+
+
+class ServiceUnavailableException(GenericException):
+    code = "SERVICE_UNAVAILABLE"
+    message_template = ("Service %(service)s is unavailable, "
+                        "retry in %(retry_after)d second(s)")
+
+    def __init__(self, service, retry_after=0):
+        self.service = service
+        self.retry_after = retry_after
+        formatted_message = self.message_template % {
+            'service': service, 'retry_after': retry_after}
+        super(ServiceUnavailableException, self).__init__(
+            formatted_message, inject_error_id=False)
@@ -1,3 +1,7 @@
+import json
+import zlib
+
+
 BASIC_PLUGINS = [
         {
             "name": "kubejobs",
@@ -30,6 +34,29 @@ BASIC_PLUGINS = [
     ]
 
 
+def job_metadata(state):
+    ''' Extracts from a job state the metadata that
+    the job persistences index to filter jobs without
+    deserializing them.
+    '''
+    return {
+        "status": getattr(state, 'status', None),
+        "plugin": getattr(state, 'plugin', None),
+        "starting_time": getattr(state, 'starting_time', None)
+    }
+
+
+def compress_report(report):
+    ''' Serializes a final report into the compressed record
+    kept by the job persistences.
+    '''
+    return zlib.compress(json.dumps(report).encode('utf-8'))
+
+
+def decompress_report(data):
+    return json.loads(zlib.decompress(bytes(data)).decode('utf-8'))
+
+
 def check_basic_plugins(db):
     ''' This function checks if the
     basic plugins (kubejobs) are registered into
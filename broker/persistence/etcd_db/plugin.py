@@ -12,52 +12,188 @@
 # implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import datetime
 import dill
 import etcd3
 import json
 
+from broker.persistence import compress_report
+from broker.persistence import decompress_report
+from broker.persistence import job_metadata
 from broker.persistence.persistence_interface import PersistenceInterface
+from broker.utils import metrics
 from broker.persistence.etcd_db.model import Plugin
 
 
 class Etcd3JobPersistence(PersistenceInterface):
 
+    METADATA_PREFIX = 'asperathos_job_metadata:'
+    REPORT_PREFIX = 'asperathos_job_report:'
+    TIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
     def __init__(self, ip, port):
 
         self.etcd_connection = etcd3.client(str(ip), str(port))
 
+    @metrics.timed('persistence_seconds', backend='etcd',
+                   store='jobs')
     def put(self, app_id, state):
         with self.etcd_connection.lock('put', ttl=5):
             ser = dill.dumps(state)
             self.etcd_connection.put(str(app_id), ser)
+            self.etcd_connection.\
+                put(Etcd3JobPersistence.METADATA_PREFIX + str(app_id),
+                    self._serialize_metadata(app_id, state))
+
+    def _serialize_metadata(self, app_id, state):
+        metadata = job_metadata(state)
+        metadata['app_id'] = str(app_id)
+        if metadata['starting_time'] is not None:
+            metadata['starting_time'] = metadata['starting_time'].\
+                strftime(Etcd3JobPersistence.TIME_FORMAT)
+        return json.dumps(metadata)
 
+    def _deserialize_metadata(self, data):
+        metadata = json.loads(data)
+        if metadata['starting_time'] is not None:
+            metadata['starting_time'] = datetime.datetime.strptime(
+                metadata['starting_time'], Etcd3JobPersistence.TIME_FORMAT)
+        return metadata
+
+    @metrics.timed('persistence_seconds', backend='etcd',
+                   store='jobs')
     def get(self, app_id):
         with self.etcd_connection.lock('get', ttl=5):
             data = self.etcd_connection.get(str(app_id))[0]
             return dill.loads(data)
 
+    @metrics.timed('persistence_seconds', backend='etcd',
+                   store='jobs')
+    def put_report(self, app_id, report):
+        """ Stores the final report of a job. The first report stored
+        for a job is kept, the record is never updated.
+        """
+        key = Etcd3JobPersistence.REPORT_PREFIX + str(app_id)
+        self.etcd_connection.transaction(
+            compare=[self.etcd_connection.transactions.version(key) == 0],
+            success=[self.etcd_connection.transactions.put(
+                key, compress_report(report))],
+            failure=[])
+
+    @metrics.timed('persistence_seconds', backend='etcd',
+                   store='jobs')
+    def get_report(self, app_id):
+        """ Returns the final report of a job, or None when it has not
+        been stored.
+        """
+        data = self.etcd_connection.get(
+            Etcd3JobPersistence.REPORT_PREFIX + str(app_id))[0]
+        if data is None:
+            return None
+        return decompress_report(data)
+
     def get_finished_jobs(self):
         all_jobs = self.get_all()
         finished_jobs = filter(lambda a: a.del_resources_authorization is True,
                                all_jobs.values())
         return finished_jobs
 
+    @metrics.timed('persistence_seconds', backend='etcd',
+                   store='jobs')
+    def query(self, status=None, plugin=None, since=None, until=None,
+              after=None, limit=None):
+        """ Gets the ids of the jobs whose metadata match the given
+        filters, ordered by id. Only the small metadata records are
+        read, the serialized jobs are left untouched, but etcd can't
+        filter them: every metadata record is read and the filters
+        are applied here.
+
+        Args:
+            status (list): Accepted job states.
+            plugin (list): Accepted plugin names.
+            since (datetime): Lower bound of the starting time.
+            until (datetime): Upper bound of the starting time.
+            after (string): Id where the previous page ended.
+            limit (int): Maximum number of ids returned.
+        """
+        with self.etcd_connection.lock('getall', ttl=5):
+            raw_metadata = list(self.etcd_connection.get_prefix(
+                Etcd3JobPersistence.METADATA_PREFIX))
+
+        def matches(metadata):
+            starting_time = metadata['starting_time']
+            if status and metadata['status'] not in status:
+                return False
+            if plugin and metadata['plugin'] not in plugin:
+                return False
+            if since is not None and \
+               (starting_time is None or starting_time < since):
+                return False
+            if until is not None and \
+               (starting_time is None or starting_time > until):
+                return False
+            if after is not None and metadata['app_id'] <= after:
+                return False
+            return True
+
+        app_ids = []
+        for data, _ in raw_metadata:
+            metadata = self._deserialize_metadata(data)
+            if matches(metadata):
+                app_ids.append(metadata['app_id'])
+        app_ids.sort()
+
+        return app_ids[:limit] if limit is not None else app_ids
+
+    @metrics.timed('persistence_seconds', backend='etcd',
+                   store='jobs')
     def delete(self, app_id):
         with self.etcd_connection.lock('del', ttl=5):
             self.etcd_connection.delete(str(app_id))
+            self.etcd_connection.\
+                delete(Etcd3JobPersistence.METADATA_PREFIX + str(app_id))
+            self.etcd_connection.\
+                delete(Etcd3JobPersistence.REPORT_PREFIX + str(app_id))
 
     def delete_all(self, prefix='kj-'):
         with self.etcd_connection.lock('delall', ttl=5):
             self.etcd_connection.delete_prefix(prefix)
+            self.etcd_connection.\
+                delete_prefix(Etcd3JobPersistence.METADATA_PREFIX + prefix)
+            self.etcd_connection.\
+                delete_prefix(Etcd3JobPersistence.REPORT_PREFIX + prefix)
 
+    @metrics.timed('persistence_seconds', backend='etcd',
+                   store='jobs')
     def get_all(self, prefix="kj-"):
 
         with self.etcd_connection.lock('getall', ttl=5):
-            all_jobs = dict([(m.key, dill.loads(n)) for (n, m)
-                             in self.etcd_connection.get_prefix(prefix)])
+            raw_jobs = list(self.etcd_connection.get_prefix(prefix))
+            raw_metadata = list(self.etcd_connection.get_prefix(
+                Etcd3JobPersistence.METADATA_PREFIX + prefix))
+        all_jobs = dict([(m.key, dill.loads(n)) for (n, m) in raw_jobs])
 
+        self._add_metadata_records(all_jobs, raw_metadata)
         return all_jobs
 
+    def _add_metadata_records(self, all_jobs, raw_metadata):
+        """ Writes the metadata records of the jobs stored by an older
+        version, which ``query`` would never match otherwise. A record
+        written meanwhile by ``put`` is left as is.
+        """
+        stored = set(m.key for _, m in raw_metadata)
+        for key, state in all_jobs.items():
+            app_id = key.decode('utf-8') if isinstance(key, bytes) else key
+            metadata_key = Etcd3JobPersistence.METADATA_PREFIX + app_id
+            if metadata_key.encode('utf-8') in stored:
+                continue
+            transactions = self.etcd_connection.transactions
+            self.etcd_connection.transaction(
+                compare=[transactions.version(metadata_key) == 0],
+                success=[transactions.put(
+                    metadata_key, self._serialize_metadata(app_id, state))],
+                failure=[])
+
 
 class Etcd3PluginPersistence(PersistenceInterface):
 
@@ -67,6 +203,8 @@ class Etcd3PluginPersistence(PersistenceInterface):
 
         self.etcd_connection = etcd3.client(str(ip), str(port))
 
+    @metrics.timed('persistence_seconds', backend='etcd',
+                   store='plugins')
     def put(self, plugin_name, source, plugin_source,
             component, plugin_module=None):
 
@@ -91,6 +229,8 @@ class Etcd3PluginPersistence(PersistenceInterface):
 
         return plugin
 
+    @metrics.timed('persistence_seconds', backend='etcd',
+                   store='plugins')
     def get(self, plugin_name):
         with self.etcd_connection.lock('get', ttl=5):
             data = self.etcd_connection.\
@@ -105,6 +245,8 @@ class Etcd3PluginPersistence(PersistenceInterface):
                                      plugin_name, component))[0]
             return data
 
+    @metrics.timed('persistence_seconds', backend='etcd',
+                   store='plugins')
     def delete(self, plugin_name):
         with self.etcd_connection.lock('del', ttl=5):
             self.etcd_connection.\
@@ -116,6 +258,8 @@ class Etcd3PluginPersistence(PersistenceInterface):
             self.etcd_connection.\
                 delete_prefix(Etcd3PluginPersistence.PLUGIN_PREFIX)
 
+    @metrics.timed('persistence_seconds', backend='etcd',
+                   store='plugins')
     def get_all(self, prefix=PLUGIN_PREFIX):
 
         with self.etcd_connection.lock('getall', ttl=5):
@@ -15,19 +15,18 @@
 
 # -*- coding: utf_8 -*-
 import peewee
-import configparser
 
-config = configparser.RawConfigParser()
-config.read('./broker.cfg')
+# Opened on the path configured in broker.cfg by the first sqlite
+# persistence created, see init_database.
+db = peewee.SqliteDatabase(None)
 
-if(config.has_option('persistence', 'local_database_path')):
-    local_database_path = config.get('persistence',
-                                     'local_database_path')
-else:
-    local_database_path = 'local_database/db.db'
 
-
-db = peewee.SqliteDatabase(local_database_path)
+def init_database(path):
+    """ Points the models to the database file at ``path``, unless
+    they already have one.
+    """
+    if db.deferred:
+        db.init(path)
 
 
 class BaseModel(peewee.Model):
@@ -40,6 +39,15 @@ class JobState(BaseModel):
 
     app_id = peewee.CharField(unique=True)
     obj_serialized = peewee.BlobField()
+    status = peewee.CharField(null=True, index=True)
+    plugin = peewee.CharField(null=True, index=True)
+    starting_time = peewee.DateTimeField(null=True, index=True)
+
+
+class JobReport(BaseModel):
+
+    app_id = peewee.CharField(unique=True)
+    report = peewee.BlobField()
 
 
 class Plugin(BaseModel):
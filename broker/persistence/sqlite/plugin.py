@@ -13,48 +13,153 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from broker.persistence import compress_report
+from broker.persistence import decompress_report
+from broker.persistence import job_metadata
 from broker.persistence.persistence_interface import PersistenceInterface
-from broker.persistence.sqlite.model import JobState, Plugin
+from broker.utils import metrics
+from broker.persistence.sqlite.model import JobReport, JobState, Plugin
+from broker.persistence.sqlite.model import init_database
+from broker.service import api
 
 import dill
 import peewee
+from playhouse import migrate
 
 
 class SqliteJobPersistence(PersistenceInterface):
 
     def __init__(self):
+        init_database(api.local_database_path)
+        if JobState.table_exists():
+            self._add_metadata_columns()
         try:
             JobState.create_table()
+            JobReport.create_table()
         except peewee.OperationalError:
             pass
 
+    def _add_metadata_columns(self):
+        """ Adds the metadata columns to a table created by an older
+        version and fills them from the stored states. Their indexes
+        are left to ``create_table``.
+        """
+        database = JobState._meta.database
+        table = JobState._meta.table_name
+        columns = [c.name for c in database.get_columns(table)]
+        missing = [field for field in (JobState.status, JobState.plugin,
+                                       JobState.starting_time)
+                   if field.column_name not in columns]
+        if not missing:
+            return
+
+        migrator = migrate.SqliteMigrator(database)
+        operations = []
+        for field in missing:
+            column = field.clone()
+            column.index = False
+            operations.append(migrator.add_column(table, field.column_name,
+                                                  column))
+        migrate.migrate(*operations)
+
+        for row in JobState.select():
+            state = dill.loads(row.obj_serialized)
+            JobState.update(**job_metadata(state)).\
+                where(JobState.app_id == row.app_id).execute()
+
+    @metrics.timed('persistence_seconds', backend='sqlite',
+                   store='jobs')
     def put(self, app_id, state):
+        serialized = dill.dumps(state)
+        metadata = job_metadata(state)
         new_state = JobState(app_id=app_id,
-                             obj_serialized=dill.dumps(state))
+                             obj_serialized=serialized,
+                             **metadata)
         try:
             new_state.save()
 
         except peewee.IntegrityError:
-            query = JobState.update({JobState.
-                                     obj_serialized: dill.dumps(state)}).\
-                                     where(JobState.app_id == app_id)
+            query = JobState.update(obj_serialized=serialized,
+                                    **metadata).\
+                where(JobState.app_id == app_id)
             query.execute()
 
+    @metrics.timed('persistence_seconds', backend='sqlite',
+                   store='jobs')
     def get(self, app_id):
         state = JobState.get(JobState.app_id == app_id)
         return dill.loads(state.obj_serialized)
 
+    @metrics.timed('persistence_seconds', backend='sqlite',
+                   store='jobs')
+    def put_report(self, app_id, report):
+        """ Stores the final report of a job. The first report stored
+        for a job is kept, the record is never updated.
+        """
+        try:
+            JobReport.create(app_id=app_id, report=compress_report(report))
+        except peewee.IntegrityError:
+            pass
+
+    @metrics.timed('persistence_seconds', backend='sqlite',
+                   store='jobs')
+    def get_report(self, app_id):
+        """ Returns the final report of a job, or None when it has not
+        been stored.
+        """
+        row = JobReport.get_or_none(JobReport.app_id == app_id)
+        if row is None:
+            return None
+        return decompress_report(row.report)
+
     def get_finished_jobs(self):
         return dict(filter(lambda obj: obj[1].del_resources_authorization,
                            self.get_all().items()))
 
+    @metrics.timed('persistence_seconds', backend='sqlite',
+                   store='jobs')
+    def query(self, status=None, plugin=None, since=None, until=None,
+              after=None, limit=None):
+        """ Gets the ids of the jobs whose indexed metadata match the
+        given filters, ordered by id.
+
+        Args:
+            status (list): Accepted job states.
+            plugin (list): Accepted plugin names.
+            since (datetime): Lower bound of the starting time.
+            until (datetime): Upper bound of the starting time.
+            after (string): Id where the previous page ended.
+            limit (int): Maximum number of ids returned.
+        """
+        query = JobState.select(JobState.app_id)
+        if status:
+            query = query.where(JobState.status.in_(status))
+        if plugin:
+            query = query.where(JobState.plugin.in_(plugin))
+        if since is not None:
+            query = query.where(JobState.starting_time >= since)
+        if until is not None:
+            query = query.where(JobState.starting_time <= until)
+        if after is not None:
+            query = query.where(JobState.app_id > after)
+        query = query.order_by(JobState.app_id)
+        if limit is not None:
+            query = query.limit(limit)
+
+        return [row.app_id for row in query]
+
+    @metrics.timed('persistence_seconds', backend='sqlite',
+                   store='jobs')
     def delete(self, app_id):
         state = JobState.get(JobState.app_id == app_id)
         state.delete_instance()
+        JobReport.delete().where(JobReport.app_id == app_id).execute()
 
     def delete_all(self):
         JobState.delete()
 
+    @metrics.timed('persistence_seconds', backend='sqlite',
+                   store='jobs')
     def get_all(self):
         all_states = JobState.select()
         all_jobs = dict([(obj.app_id, dill.loads(obj.obj_serialized))
@@ -65,11 +170,14 @@ class SqliteJobPersistence(PersistenceInterface):
 class SqlitePluginPersistence(PersistenceInterface):
 
     def __init__(self):
+        init_database(api.local_database_path)
         try:
             Plugin.create_table()
         except peewee.OperationalError:
             pass
 
+    @metrics.timed('persistence_seconds', backend='sqlite',
+                   store='plugins')
     def put(self, plugin_name, source, plugin_source,
             component, plugin_module=None):
 
@@ -80,6 +188,8 @@ class SqlitePluginPersistence(PersistenceInterface):
 
         return plugin
 
+    @metrics.timed('persistence_seconds', backend='sqlite',
+                   store='plugins')
     def get(self, name):
         plugin = Plugin.get(Plugin.name == name)
         return plugin
@@ -91,6 +201,8 @@ class SqlitePluginPersistence(PersistenceInterface):
                 return p
         return None
 
+    @metrics.timed('persistence_seconds', backend='sqlite',
+                   store='plugins')
     def delete(self, name):
         plugin = Plugin.get(Plugin.name == name)
         plugin.delete_instance()
@@ -98,6 +210,8 @@ class SqlitePluginPersistence(PersistenceInterface):
     def delete_all(self):
         Plugin.delete()
 
+    @metrics.timed('persistence_seconds', backend='sqlite',
+                   store='plugins')
     def get_all(self):
         all_plugins = Plugin.select()
         return all_plugins
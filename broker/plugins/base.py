@@ -167,3 +167,12 @@ class GenericApplicationExecutor(ApplicationExecutor):
 
     def get_application_start_time(self):
         pass
+
+    def get_owner(self):
+        pass
+
+    def get_cluster_statuses(self):
+        pass
+
+    def synchronize(self, statuses=None):
+        pass
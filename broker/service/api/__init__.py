@@ -14,7 +14,6 @@
 # limitations under the License.
 
 import configparser
-import kubernetes as kube
 from broker.utils.logger import Log
 
 API_LOG = Log("APIv10", "logs/APIv10.log")
@@ -31,6 +30,23 @@ try:
     visualizer_url = config.get('services', 'visualizer_url')
     authorization_url = config.get('services', 'authorization_url')
     optimizer_url = config.get('services', 'optimizer_url')
+    connect_timeout = config.getfloat('services', 'connect_timeout',
+                                      fallback=3.05)
+    read_timeout = config.getfloat('services', 'read_timeout', fallback=30)
+    pool_size = config.getint('services', 'pool_size', fallback=10)
+    pool_sizes = dict(
+        (service, config.getint('services', '%s_pool_size' % service,
+                                fallback=pool_size))
+        for service in ('monitor', 'controller', 'visualizer',
+                        'authorization', 'optimizer'))
+    breaker_failure_threshold = config.getint(
+        'services', 'breaker_failure_threshold', fallback=5)
+    breaker_reset_timeout = config.getfloat(
+        'services', 'breaker_reset_timeout', fallback=30)
+    report_timeout = config.getfloat('services', 'report_timeout',
+                                     fallback=60)
+    report_workers = config.getint('services', 'report_workers',
+                                   fallback=8)
 
     """ General configuration """
     host = config.get("general", "host")
@@ -38,12 +54,65 @@ try:
     plugins = config.get('general', 'plugins').split(',')
     cleaner_interval = config.getint('general', 'cleaner_interval',
                                      fallback=1)
+    teardown_timeout = config.getfloat('general', 'teardown_timeout',
+                                       fallback=30)
+    teardown_workers = config.getint('general', 'teardown_workers',
+                                     fallback=16)
+    startup_workers = config.getint('general', 'startup_workers',
+                                    fallback=16)
+    cleanup_retry_interval = config.getint('general',
+                                           'cleanup_retry_interval',
+                                           fallback=60)
+    cleanup_max_retries = config.getint('general', 'cleanup_max_retries',
+                                        fallback=10)
+    server = config.get('general', 'server', fallback='development')
+    server_threads = config.getint('general', 'server_threads',
+                                   fallback=16)
+    server_backlog = config.getint('general', 'server_backlog',
+                                   fallback=128)
+    response_cache_ttl = config.getfloat('general', 'response_cache_ttl',
+                                         fallback=2)
+    response_cache_size = config.getint('general', 'response_cache_size',
+                                        fallback=256)
+    json_backend = config.get('general', 'json_backend', fallback='auto')
+    compression_encodings = config.get(
+        'general', 'compression_encodings',
+        fallback='zstd,br,gzip').replace(' ', '').split(',')
+    compression_level = config.getint('general', 'compression_level',
+                                      fallback=6)
+    compression_min_size = config.getint('general', 'compression_min_size',
+                                         fallback=1024)
+    compression_stream_size = config.getint(
+        'general', 'compression_stream_size', fallback=2 ** 20)
+    log_follow_timeout = config.getfloat('general', 'log_follow_timeout',
+                                         fallback=300)
+    max_followed_streams = config.getint('general', 'max_followed_streams',
+                                         fallback=4)
+    pod_log_buffer_lines = config.getint('kubejobs', 'pod_log_buffer_lines',
+                                         fallback=1000)
+    pod_log_max_bytes = config.getint('kubejobs', 'pod_log_max_bytes',
+                                      fallback=10 * 2 ** 20)
+    authorization_cache_ttl = config.getfloat(
+        'general', 'authorization_cache_ttl', fallback=60)
+    authorization_cache_negative_ttl = config.getfloat(
+        'general', 'authorization_cache_negative_ttl', fallback=5)
+    authorization_cache_size = config.getint(
+        'general', 'authorization_cache_size', fallback=1024)
+
+    """ Debug configuration """
+    debug_token = config.get('debug', 'token', fallback=None) or None
+    profile_sample_rate = config.getfloat('debug', 'profile_sample_rate',
+                                          fallback=0.0)
+    profile_top = config.getint('debug', 'profile_top', fallback=20)
+    profile_max_endpoints = config.getint('debug', 'profile_max_endpoints',
+                                          fallback=64)
 
     """ Validate if really exists a section to listed plugins """
     for plugin in plugins:
         if plugin != '' and plugin not in config.sections():
             raise Exception("plugin '%s' section missing" % plugin)
 
+    local_database_path = 'local_database/db.db'
     if 'persistence' in config.sections():
         if(config.has_option('persistence', 'plugin_name')):
             plugin_name = config.get('persistence', 'plugin_name')
@@ -57,7 +126,6 @@ try:
     # Setting a default persistence type
     else:
         plugin_name = 'sqlite'
-        local_database_path = 'local_database/db.db'
 
     if 'kubejobs' in plugins:
 
@@ -92,6 +160,8 @@ def get_node_cluster(k8s_conf_path):
     Returns:
         string -- The node IP
     """
+    import kubernetes as kube
+
     try:
         kube.config.load_kube_config(k8s_conf_path)
         CoreV1Api = kube.client.CoreV1Api()
@@ -14,23 +14,34 @@
 # limitations under the License.
 
 import filecmp
+import hmac
+import itertools
 import json
 import os
 import shutil
 import socket
 import datetime
 import threading
+import time
+
+from concurrent import futures
 
 from broker.service import plugin_service
 from broker.persistence import check_basic_plugins
-from broker.persistence.etcd_db import plugin as etcd
-from broker.persistence.sqlite import plugin as sqlite
 from broker.service import api
+from broker.service import versions
+from broker.utils import line_index
+from broker.utils import metrics
+from broker.utils import profiler
+from broker.utils import threads
+from broker.utils import timeline
 from broker.utils.logger import Log
 from broker.utils.framework import authorizer
+from broker.utils.framework import breaker
 from broker.utils.framework import visualizer
 from broker import exceptions as ex
 from broker.service.job_cleaner_daemon import JobCleanerDaemon
+from broker.service.submission_registry import SubmissionRegistry
 
 API_LOG = Log("APIv10", "logs/APIv10.log")
 
@@ -41,14 +52,50 @@ SSH_KEY_PATH = '/root/.ssh/id_rsa.pub'
 
 CLUSTER_CONF_PATH = "./data/clusters"
 
+SUBMISSIONS_PAGE_LIMIT = 1000
+
+QUERY_TIME_FORMATS = ['%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S',
+                      '%Y-%m-%d']
+
+SUBMISSION_LOG_FILES = ('execution', 'stderr', 'stdout')
+SUBMISSION_LOG_LIMIT = 10000
+LOG_FOLLOW_INTERVAL = 0.5
+
+# Bounds the detailed reports fetched from the monitor at the same time
+# by every batch report request together.
+REPORT_POOL = futures.ThreadPoolExecutor(max_workers=api.report_workers,
+                                         thread_name_prefix='report')
+threads.register_executor('report', REPORT_POOL)
+
+
+# Set up by initialize. submissions is filled in place, so the modules
+# holding a reference to it see the recovered jobs.
+db_connector = None
+plugin_connector = None
+submissions = SubmissionRegistry()
+job_cleaner_svc = None
+
+_initialized = False
+_initialize_lock = threading.Lock()
+_reconciler = None
+
+# Progress of the reconciliation of the recovered submissions with the
+# cluster, reported by readiness.
+_reconciliation = {'state': 'pending', 'total': 0, 'done': 0, 'failed': 0,
+                   'started': None, 'finished': None}
+_reconciliation_lock = threading.Lock()
+
 
 def setup_database():
+    # only the configured backend and its client are imported
     if api.plugin_name == 'etcd':
+        from broker.persistence.etcd_db import plugin as etcd
         return (etcd.Etcd3JobPersistence(api.persistence_ip,
                                          api.persistence_port),
                 etcd.Etcd3PluginPersistence(api.persistence_ip,
                                             api.persistence_port))
     elif api.plugin_name == 'sqlite':
+        from broker.persistence.sqlite import plugin as sqlite
         return (sqlite.SqliteJobPersistence(),
                 sqlite.SqlitePluginPersistence())
 
@@ -56,43 +103,133 @@ def setup_database():
         raise Exception('Unknown database name')
 
 
-db_connector, plugin_connector = setup_database()
-check_basic_plugins(plugin_connector)
+def initialize(wait=False):
+    """ Connects the persistence, registers the basic plugins and
+    recovers the submissions of a previous run, following the ongoing
+    ones again. The recovered submissions are then reconciled with the
+    cluster in the background, see :func:`reconcile_submissions`, and
+    :func:`readiness` reports the progress. Only the first call does
+    it.
 
+    Args:
+        wait (bool) -- Returns only once the reconciliation is done
+    """
+    global db_connector, plugin_connector, job_cleaner_svc
+    global _initialized, _reconciler
 
-def restore_submissions_backup(db_connector):
-    return db_connector.get_all()
+    with _initialize_lock:
+        if not _initialized:
+            db_connector, plugin_connector = setup_database()
+            check_basic_plugins(plugin_connector)
 
+            submissions.update(restore_submissions_backup(db_connector))
+            job_cleaner_svc = JobCleanerDaemon(
+                submissions, retry_interval=api.cleanup_retry_interval,
+                max_retries=api.cleanup_max_retries)
 
-submissions = restore_submissions_backup(db_connector)
-job_cleaner_svc = JobCleanerDaemon(submissions)
+            recover_ongoing_jobs_thread(submissions)
+            _reconciler = threads.start_thread(
+                reconcile_submissions, 'reconcile',
+                args=(list(submissions.values()),))
+            _initialized = True
+    if wait:
+        _reconciler.join()
 
 
-def delete_jobs_resources_or_activate_cleaner_svc():
-    finished_jobs = db_connector.get_finished_jobs()
-    for job_id in finished_jobs:
-        job = finished_jobs[job_id]
-        now = datetime.datetime.now()
-        elapsed_time = (now - job.finish_time)
-        if elapsed_time.total_seconds() >= job.job_resources_lifetime:
-            try:
-                job.delete_job_resources()
-            except Exception:
-                job.del_resources_authorization = False
-                job.persist_state()
-        else:
-            new_time = int(job.job_resources_lifetime -
-                           elapsed_time.total_seconds())
-            job_cleaner_svc.insert_element(job.app_id, new_time)
+def restore_submissions_backup(db_connector):
+    return db_connector.get_all()
 
 
-delete_jobs_resources_or_activate_cleaner_svc()
+def reconcile_submissions(jobs):
+    """ Releases the resources of the finished jobs and synchronizes
+    every job with the cluster, through ``startup_workers`` threads.
+    The statuses of the jobs in the cluster are listed at once when
+    their plugin can, instead of being requested job by job.
+    """
+    started = time.time()
+    _update_reconciliation(state='running', total=len(jobs),
+                           started=started)
+    statuses = cluster_statuses(jobs)
+
+    pool = futures.ThreadPoolExecutor(max_workers=api.startup_workers,
+                                      thread_name_prefix='reconcile')
+    threads.register_executor('reconcile', pool)
+    try:
+        pending = [pool.submit(reconcile_submission, job,
+                               statuses.get(type(job)))
+                   for job in jobs]
+        for future in futures.as_completed(pending):
+            error = future.exception()
+            if error is not None:
+                API_LOG.log("Reconciliation of a submission failed: %s"
+                            % error)
+            with _reconciliation_lock:
+                _reconciliation['done'] += 1
+                _reconciliation['failed'] += error is not None
+    finally:
+        pool.shutdown()
+        threads.unregister_executor('reconcile')
+
+    finished = time.time()
+    _update_reconciliation(state='done', finished=finished)
+    API_LOG.log("%d submissions reconciled in %.1f seconds"
+                % (len(jobs), finished - started))
+
+
+def _update_reconciliation(**progress):
+    with _reconciliation_lock:
+        _reconciliation.update(progress)
+
+
+def cluster_statuses(jobs):
+    """ Lists the statuses of the jobs in the cluster with one request
+    per plugin. The plugins that can't list them are left out, so
+    their jobs are synchronized one by one.
+
+    Returns:
+        dict -- The statuses by executor class
+    """
+    statuses = {}
+    for job in jobs:
+        kind = type(job)
+        if kind in statuses:
+            continue
+        try:
+            statuses[kind] = job.get_cluster_statuses()
+        except Exception as e:
+            API_LOG.log("Listing the jobs of the cluster failed: %s" % e)
+            statuses[kind] = None
+    return statuses
+
+
+def reconcile_submission(job, statuses=None):
+    if job.del_resources_authorization:
+        release_job_resources(job)
+    job.synchronize(statuses)
+
+
+def release_job_resources(job):
+    """ Deletes the resources of a finished job whose lifetime is
+    over, or schedules their deletion.
+    """
+    now = datetime.datetime.now()
+    elapsed_time = (now - job.finish_time)
+    if elapsed_time.total_seconds() >= job.job_resources_lifetime:
+        try:
+            if job.delete_job_resources():
+                job_cleaner_svc.insert_element(
+                    job.app_id, api.cleanup_retry_interval)
+        except Exception:
+            job.del_resources_authorization = False
+            job.persist_state()
+    else:
+        new_time = int(job.job_resources_lifetime -
+                       elapsed_time.total_seconds())
+        job_cleaner_svc.insert_element(job.app_id, new_time)
 
 
 def create_thread(job):
-    thread = threading.Thread(target=job.wait_job_finish)
-    thread.daemon = True
-    thread.start()
+    threads.start_thread(job.wait_job_finish, 'wait', app_id=job.app_id)
 
 
 def recover_ongoing_jobs_thread(jobs):
@@ -102,15 +239,23 @@ def recover_ongoing_jobs_thread(jobs):
             create_thread(job)
 
 
-recover_ongoing_jobs_thread(submissions)
-
-
-def synchronize_jobs_with_the_cluster(jobs):
-    for key in jobs:
-        jobs[key].synchronize()
+def readiness():
+    """ Reports whether the submissions recovered at startup have been
+    reconciled with the cluster.
 
-
-synchronize_jobs_with_the_cluster(submissions)
+    Returns:
+        dict -- Whether the manager is 'ready', the 'state' of the
+        reconciliation, the 'total' submissions, those 'done' and
+        'failed' so far and the 'elapsed' seconds
+    """
+    with _reconciliation_lock:
+        progress = dict(_reconciliation)
+    started = progress.pop('started')
+    finished = progress.pop('finished')
+    progress['ready'] = progress['state'] == 'done'
+    progress['elapsed'] = None if started is None else \
+        (finished or time.time()) - started
+    return progress
 
 
 def install_plugin(data):
@@ -124,6 +269,7 @@ def install_plugin(data):
                          plugin_source=plugin_repo,
                          component=component,
                          plugin_module=module)
+    versions.PLUGINS.bump()
 
     if component == plugin_service.Components.MANAGER:
         installed = plugin_service.install_plugin(source, plugin_repo)
@@ -154,6 +300,25 @@ def get_all_plugins():
             for p in plugin_connector.get_all()]
 
 
+def plugins_etag():
+    return versions.PLUGINS.etag()
+
+
+def submissions_etag(submission_id=None):
+    """ Gets the ETag of the submissions collection or, if
+    ``submission_id`` is given, of a single submission.
+    Returns:
+        string -- The ETag, or None if the submission does not exist
+    """
+    if submission_id is not None and submission_id not in submissions:
+        return None
+    return versions.SUBMISSIONS.etag(submission_id)
+
+
+def clusters_etag():
+    return versions.CLUSTERS.etag()
+
+
 def run_submission(data):
     plugin_service.check_submission(plugin_connector, data)
     if ('plugin' not in data or 'plugin_info' not in data):
@@ -185,6 +350,7 @@ def run_submission(data):
     submission_data['enable_auth'] = data['enable_auth']
     submission_id, executor = plugin.execute(submission_data)
     submissions[submission_id] = executor
+    versions.SUBMISSIONS.bump(submission_id)
 
     return {"job_id": submission_id}
 
@@ -223,9 +389,8 @@ def end_submission(submission_id, data, hard_finish):
 
 def list_submissions():
     submissions_status = {}
-    for key in submissions:
+    for key, submission in submissions.items():
 
-        submission = submissions.get(key)
         submission.synchronize()
         submissions_status[key] = \
             json.loads(submission.__repr__())
@@ -233,6 +398,93 @@ def list_submissions():
     return submissions_status
 
 
+def query_submissions(args):
+    """ Lists the submissions matching the filters in ``args``.
+    The filters are answered by the indexed metadata of the
+    persistence, so only the submissions of the requested page
+    are synchronized and serialized.
+    Args:
+        args (dict) -- Query parameters. ``status`` and ``plugin``
+        take comma separated values, ``since`` and ``until`` bound the
+        starting time (ISO 8601), ``limit`` and ``cursor`` paginate
+        and ``fields`` lists the fields returned for each submission.
+    Raises:
+        ex.BadRequestException -- Malformed query parameter
+    Returns:
+        dict -- Returns a dict with the 'submissions' of the page by id
+        and the 'next_cursor' to fetch the next page, None on the last
+    """
+    fields = _split_arg(args.get('fields'))
+    app_ids, next_cursor = query_ids(args)
+
+    page = {}
+    for app_id in app_ids:
+        submission = submissions.get(app_id)
+        if submission is None:
+            continue
+        submission.synchronize()
+        representation = json.loads(submission.__repr__())
+        if fields:
+            representation = dict((k, v) for k, v in representation.items()
+                                  if k in fields)
+        page[app_id] = representation
+
+    return {"submissions": page, "next_cursor": next_cursor}
+
+
+def query_ids(args):
+    """ Returns the ids of the page of submissions matching the
+    filters in ``args`` and the cursor of the next page.
+    """
+    limit = _parse_limit(args.get('limit'))
+
+    app_ids = db_connector.query(
+        status=_split_arg(args.get('status')),
+        plugin=_split_arg(args.get('plugin')),
+        since=_parse_time(args.get('since')),
+        until=_parse_time(args.get('until')),
+        after=args.get('cursor') or None,
+        limit=limit + 1 if limit is not None else None)
+
+    next_cursor = None
+    if limit is not None and len(app_ids) > limit:
+        app_ids = app_ids[:limit]
+        next_cursor = app_ids[-1]
+
+    return app_ids, next_cursor
+
+
+def _split_arg(value):
+    if not value:
+        return None
+    return [v.strip() for v in value.split(',') if v.strip()]
+
+
+def _parse_limit(value):
+    if value is None:
+        return None
+    try:
+        limit = int(value)
+    except ValueError:
+        limit = 0
+    if not 0 < limit <= SUBMISSIONS_PAGE_LIMIT:
+        raise ex.BadRequestException("\"limit\" must be an integer between "
+                                     "1 and %d" % SUBMISSIONS_PAGE_LIMIT)
+    return limit
+
+
+def _parse_time(value):
+    if not value:
+        return None
+    for time_format in QUERY_TIME_FORMATS:
+        try:
+            return datetime.datetime.strptime(value, time_format)
+        except ValueError:
+            pass
+    raise ex.BadRequestException("Invalid timestamp \"%s\", expected "
+                                 "YYYY-MM-DDTHH:MM:SS" % value)
+
+
 def submission_status(submission_id):
     if submission_id not in submissions:
         API_LOG.log("Wrong request")
@@ -252,32 +504,274 @@ def submission_report(submission_id):
     return submissions.get(submission_id).get_detailed_report()
 
 
-def submission_log(submission_id):
+def submission_timeline(submission_id):
+    """ Gets the phases a submission went through.
+    Raises:
+        ex.BadRequestException -- Unknown submission
+    Returns:
+        dict -- The 'phases', each with its 'started_at' time, 'offset'
+        from the first phase and 'duration' in seconds, and the
+        'total' duration of the phases
+    """
     if submission_id not in submissions:
         API_LOG.log("Wrong request")
         raise ex.BadRequestException()
 
-    logs = {'execution': '', 'stderr': '', 'stdout': ''}
-
-    exec_log = open("logs/apps/%s/execution" % submission_id, "r")
-    stderr = open("logs/apps/%s/stderr" % submission_id, "r")
-    stdout = open("logs/apps/%s/stdout" % submission_id, "r")
+    phases = _get_timeline(submissions.get(submission_id)).to_list()
+    return {'app_id': submission_id,
+            'phases': phases,
+            'total': sum(phase['duration'] for phase in phases)}
 
-    def remove_newline(x):
-        x.replace("\n", "")
-        return x
 
-    logs['execution'] = map(remove_newline, exec_log.readlines())
-    logs['stderr'] = map(remove_newline, stderr.readlines())
-    logs['stdout'] = map(remove_newline, stdout.readlines())
+def timeline_summary(args):
+    """ Summarizes the duration of each phase across the most recent
+    submissions.
+    Args:
+        args (dict) -- ``limit`` bounds the submissions considered
+    Returns:
+        dict -- The number of 'submissions' considered and, under
+        'phases', the count, p50, p95 and p99 of each phase
+    """
+    limit = _parse_limit(args.get('limit')) or SUBMISSIONS_PAGE_LIMIT
+    timelines = [recorded for recorded in
+                 (_get_timeline(submission)
+                  for submission in list(submissions.values()))
+                 if recorded.phases][-limit:]
+    return {'submissions': len(timelines),
+            'phases': timeline.aggregate(timelines)}
+
+
+def _get_timeline(submission):
+    # submissions of other plugins have no timeline
+    return getattr(submission, 'timeline', None) or timeline.Timeline()
+
+
+def batch_reports(data):
+    """ Fetches the detailed reports of many submissions concurrently.
+    Args:
+        data (dict) -- Either ``ids``, a list of submission ids, or
+        ``filter``, the filters of the submissions listing (status,
+        plugin, since, until, limit, cursor). ``max_concurrency``
+        bounds the reports fetched at the same time.
+    Raises:
+        ex.BadRequestException -- Missing or malformed selection
+    Returns:
+        generator -- Yields one dict per submission, with its 'app_id'
+        and either its 'report' or an 'error', as the fetches complete
+    """
+    if 'ids' in data:
+        app_ids = data['ids']
+        if not isinstance(app_ids, list) or \
+                len(app_ids) > SUBMISSIONS_PAGE_LIMIT:
+            raise ex.BadRequestException("\"ids\" must be a list of at "
+                                         "most %d submission ids"
+                                         % SUBMISSIONS_PAGE_LIMIT)
+    elif isinstance(data.get('filter'), dict):
+        query = dict((key, ','.join(value) if isinstance(value, list)
+                      else str(value))
+                     for key, value in data['filter'].items())
+        query.setdefault('limit', str(SUBMISSIONS_PAGE_LIMIT))
+        app_ids = query_ids(query)[0]
+    else:
+        raise ex.BadRequestException("Either \"ids\" or \"filter\" "
+                                     "must be informed")
+
+    try:
+        concurrency = int(data.get('max_concurrency', api.report_workers))
+    except (TypeError, ValueError):
+        raise ex.BadRequestException("\"max_concurrency\" must be an "
+                                     "integer")
+    concurrency = max(1, min(concurrency, api.report_workers))
+
+    return _fetch_reports(app_ids, concurrency)
+
+
+def _fetch_report(app_id):
+    submission = submissions.get(app_id)
+    if submission is None:
+        raise ex.BadRequestException("Specified submission does not "
+                                     "exists in this Asperathos instance!")
+    return submission.get_detailed_report()
+
+
+def _fetch_reports(app_ids, concurrency):
+    remaining = iter(app_ids)
+    pending = {}
+
+    def submit(count):
+        for app_id in itertools.islice(remaining, count):
+            pending[REPORT_POOL.submit(_fetch_report, app_id)] = app_id
+
+    submit(concurrency)
+    try:
+        while pending:
+            done, _ = futures.wait(pending,
+                                   return_when=futures.FIRST_COMPLETED)
+            submit(len(done))
+            for future in done:
+                app_id = pending.pop(future)
+                try:
+                    yield {"app_id": app_id, "report": future.result()}
+                except Exception as e:
+                    yield {"app_id": app_id,
+                           "error": getattr(e, 'message', str(e)),
+                           "error_name": getattr(e, 'code',
+                                                 type(e).__name__)}
+    finally:
+        # the client went away, drop what was not started yet
+        for future in pending:
+            future.cancel()
+
+
+def submission_log(submission_id, args=None):
+    """ Reads a page of the execution, stderr and stdout logs of a
+    submission through a line index, so only the page is read.
+    Args:
+        args (dict) -- ``file`` selects one of the logs, ``offset`` and
+        ``limit`` select the lines, ``tail`` the last lines
+    Raises:
+        ex.BadRequestException -- Unknown submission or malformed
+        query parameter
+    Returns:
+        dict -- The lines of each log and, under 'offsets', the
+        'next_offset' and 'total_lines' of each one
+    """
+    if submission_id not in submissions:
+        API_LOG.log("Wrong request")
+        raise ex.BadRequestException()
 
-    exec_log.close()
-    stderr.close()
-    stdout.close()
+    args = args or {}
+    names = _log_files(args)
+    limit = _parse_log_arg(args, 'limit', SUBMISSION_LOG_LIMIT)
+    if limit is not None and limit > SUBMISSION_LOG_LIMIT:
+        raise ex.BadRequestException("\"limit\" must be at most %d"
+                                     % SUBMISSION_LOG_LIMIT)
+    offset = _parse_log_arg(args, 'offset', 0)
+    tail = _parse_log_arg(args, 'tail', None)
+
+    logs = {'offsets': {}}
+    for name in names:
+        index = line_index.get_index(_log_path(submission_id, name))
+        total_lines = index.refresh()
+        start = max(total_lines - tail, 0) if tail is not None else offset
+        lines, next_offset = index.read(start, min(limit, tail or limit))
+        logs[name] = lines
+        logs['offsets'][name] = {'offset': start,
+                                 'next_offset': next_offset,
+                                 'total_lines': total_lines}
 
     return logs
 
 
+def follow_submission_log(submission_id, args):
+    """ Follows the logs of a submission, like ``tail -f``.
+    Raises:
+        ex.BadRequestException -- Unknown submission or malformed
+        query parameter
+    Returns:
+        generator -- Yields a dict with the 'file', 'line' number and
+        'text' of every line, starting at ``offset`` or ``tail``, until
+        the submission is no longer running and its logs stop growing,
+        or no line is written for ``log_follow_timeout`` seconds
+    """
+    page = submission_log(submission_id, args)
+    names = [name for name in page if name != 'offsets']
+
+    def follow():
+        offsets = {}
+        for name in names:
+            start = page['offsets'][name]['offset']
+            for number, text in enumerate(page[name], start):
+                if number < page['offsets'][name]['next_offset']:
+                    yield {'file': name, 'line': number, 'text': text}
+            offsets[name] = page['offsets'][name]['next_offset']
+
+        idle_since = time.monotonic()
+        while True:
+            written = False
+            for name in names:
+                index = line_index.get_index(_log_path(submission_id, name))
+                lines, next_offset = index.read(offsets[name],
+                                                SUBMISSION_LOG_LIMIT)
+                for number, text in enumerate(lines, offsets[name]):
+                    if number < next_offset:
+                        written = True
+                        yield {'file': name, 'line': number, 'text': text}
+                offsets[name] = next_offset
+
+            submission = submissions.get(submission_id)
+            running = submission is not None and \
+                submission.get_application_state() in ('created', 'ongoing')
+            if written:
+                idle_since = time.monotonic()
+            elif not running or \
+                    time.monotonic() - idle_since > api.log_follow_timeout:
+                return
+            else:
+                time.sleep(LOG_FOLLOW_INTERVAL)
+
+    return follow()
+
+
+def _log_path(submission_id, name):
+    return os.path.join("logs", "apps", submission_id, name)
+
+
+def _log_files(args):
+    names = _split_arg(args.get('file')) or list(SUBMISSION_LOG_FILES)
+    for name in names:
+        if name not in SUBMISSION_LOG_FILES:
+            raise ex.BadRequestException("\"file\" must be one of %s"
+                                         % ", ".join(SUBMISSION_LOG_FILES))
+    return names
+
+
+def _parse_log_arg(args, name, default):
+    value = args.get(name)
+    if value is None or value == '':
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        value = -1
+    if value < 0:
+        raise ex.BadRequestException("\"%s\" must be a non negative "
+                                     "integer" % name)
+    return value
+
+
+def submission_pod_logs(submission_id, args):
+    """ Streams the logs of the Kubernetes pods of a submission.
+    Args:
+        args (dict) -- ``follow`` keeps streaming while the pods run,
+        ``limit_bytes`` bounds the bytes read from each pod, at most
+        ``pod_log_max_bytes``, and ``tail`` starts at the last lines
+    Raises:
+        ex.BadRequestException -- Unknown submission, malformed query
+        parameter or a plugin without pod logs
+    Returns:
+        generator -- Yields the log lines prefixed with their pod name
+    """
+    if submission_id not in submissions:
+        API_LOG.log("Wrong request")
+        raise ex.BadRequestException()
+
+    submission = submissions.get(submission_id)
+    if not hasattr(submission, 'get_pod_logs'):
+        raise ex.BadRequestException("Submission %s has no pod logs"
+                                     % submission_id)
+
+    follow = args.get('follow', '').lower() in ('1', 'true', 'yes')
+    limit_bytes = _parse_log_arg(args, 'limit_bytes', api.pod_log_max_bytes)
+    if limit_bytes == 0 or limit_bytes > api.pod_log_max_bytes:
+        raise ex.BadRequestException("\"limit_bytes\" must be between 1 "
+                                     "and %d" % api.pod_log_max_bytes)
+    tail = _parse_log_arg(args, 'tail', None)
+
+    return submission.get_pod_logs(follow=follow, limit_bytes=limit_bytes,
+                                   tail_lines=tail)
+
+
 def submission_visualizer(submission_id):
     """ Gets the visualizer url of a specific job.
     Raises:
@@ -347,6 +841,7 @@ def add_cluster(data):
                                        conf_name, conf_name), "w")
         conf_file.write(conf_content)
         conf_file.close()
+        versions.CLUSTERS.bump()
         status = "success"
 
     return {"cluster_name": conf_name, "status": status}
@@ -387,6 +882,7 @@ def add_certificate(cluster_name, data):
             certificate_file.close()
 
             clusters[cluster_name][certificate_name] = certificate_content
+            versions.CLUSTERS.bump()
 
             status = "success"
     else:
@@ -417,6 +913,7 @@ def delete_certificate(cluster_name, certificate_name, data):
                                     certificate_name))
 
             del clusters[cluster_name][certificate_name]
+            versions.CLUSTERS.bump()
 
             status = "success"
         else:
@@ -469,6 +966,7 @@ def delete_cluster(cluster_name, data):
         if(cluster_name == activated_cluster):
             activated_cluster = None
 
+        versions.CLUSTERS.bump()
         status = "success"
 
     return {"cluster_name": conf_name, "status": status}
@@ -510,6 +1008,7 @@ def activate_cluster(cluster_name, data):
 
         # Update the new activate cluster
         activated_cluster = cluster_name
+        versions.CLUSTERS.bump()
 
     return {"cluster_name": conf_name, "status": status}
 
@@ -551,7 +1050,8 @@ def delete_submission(submission_id, data):
         if job_isnt_ongoing and not delete_authorized:
 
             db_connector.delete(submission_id)
-            del submissions[submission_id]
+            submissions.pop(submission_id, None)
+            versions.SUBMISSIONS.forget(submission_id)
             API_LOG.log("%s submission deleted from this \
                         Asperathos instance!" % (submission_id))
         else:
@@ -575,7 +1075,116 @@ def delete_all_submissions(data):
     db_connector.delete_all()
 
     for key in submissions.keys():
-        delete_submission(key, data)
+        try:
+            delete_submission(key, data)
+        except ex.BadRequestException:
+            # deleted by a concurrent request meanwhile
+            pass
+
+
+def health():
+    """ Reports the state of the circuit breakers of the framework
+    services. The manager is degraded while any of them is not closed.
+    Returns:
+        dict -- The overall status and the state of each service
+    """
+    services = breaker.states()
+    degraded = any(state['state'] != breaker.CLOSED
+                   for state in services.values())
+    return {"status": "degraded" if degraded else "ok",
+            "services": services}
+
+
+def prometheus_metrics():
+    """ Renders the metrics of the manager in the Prometheus text
+    exposition format.
+    """
+    return metrics.exposition()
+
+
+def _collect_metrics(registry):
+    states = submissions.counts()
+    # states no submission is in anymore must drop to zero
+    for name, labels, gauge in registry.items():
+        if name == 'submissions':
+            gauge.set(states.pop(labels['state'], 0))
+    for state, count in states.items():
+        registry.gauge('submissions', state=state).set(count)
+
+    registry.gauge('threads').set(threading.active_count())
+    registry.gauge('cleaner_pending_jobs').set(
+        job_cleaner_svc.pending() if job_cleaner_svc is not None else 0)
+
+
+metrics.REGISTRY.add_collector(_collect_metrics)
+
+
+def check_debug_token(headers):
+    """ Checks the debug token sent in the X-Debug-Token header.
+    Raises:
+        ex.Forbidden -- No debug token is configured or the header
+        does not match it
+    """
+    token = headers.get('X-Debug-Token')
+    if not api.debug_token or not token or \
+            not hmac.compare_digest(token, api.debug_token):
+        API_LOG.log("Debug endpoint denied")
+        raise ex.Forbidden()
+
+
+def debug_profiles(headers, args):
+    """ Gets the functions with the highest cumulative time in the
+    profiled requests of each endpoint.
+    Raises:
+        ex.Forbidden -- Missing or wrong debug token
+    Returns:
+        dict -- By endpoint, the number of profiled 'requests' and the
+        top 'functions' with their calls, own and cumulative time and
+        main callers
+    """
+    check_debug_token(headers)
+    return profiler.PROFILER.snapshot(args.get('endpoint'))
+
+
+def clear_debug_profiles(headers):
+    check_debug_token(headers)
+    profiler.PROFILER.clear()
+
+
+def debug_threads(headers):
+    """ Describes the live threads of the manager, with their stacks,
+    and the thread pools.
+    Raises:
+        ex.Forbidden -- Missing or wrong debug token
+    Returns:
+        dict -- 'threads', each with its name, stack and, for the
+        threads that serve a job, the phase the job is in, and
+        'executors', with their live threads and queued work
+    """
+    check_debug_token(headers)
+    snapshot = threads.snapshot()
+    for thread in snapshot['threads']:
+        submission = submissions.get(thread.get('app_id'))
+        if submission is not None:
+            job_timeline = getattr(submission, 'timeline', None)
+            thread['phase'] = getattr(job_timeline, 'current', None)
+            thread['state'] = submission.get_application_state()
+    return snapshot
+
+
+def flush_authorization_cache(data):
+    """ Drops the cached results of the authorization service, so the
+    next request of every user is authorized again.
+    Raises:
+        ex.BadRequestException -- Missing parameters in request
+        ex.UnauthorizedException -- Authetication problem
+    Returns:
+        dict -- The number of cached authorizations dropped
+    """
+    check_authorization(data)
+    flushed = authorizer.flush_cache()
+    API_LOG.log("%d cached authorizations flushed" % flushed)
+    return {"flushed": flushed}
 
 
 def check_authorization(data):
@@ -1,40 +1,100 @@
-import time
 import threading
+import time
 
+from broker.utils import threads
 from broker.utils.accumulated_sum_linked_list import AccumulatedSumLinkedList
+from broker.utils.logger import Log
+
+LOG = Log("JobCleaner", "logs/job_cleaner.log")
 
 
 class JobCleanerDaemon():
 
-    def __init__(self, submissions):
+    def __init__(self, submissions, retry_interval=60, max_retries=10):
         self.submissions = submissions
         self.queue = AccumulatedSumLinkedList()
         self.thread = None
         self.active = False
+        self.retry_interval = retry_interval
+        self.max_retries = max_retries
+        self.retries = {}
+        # jobs are inserted from the request and reconciliation threads
+        self.lock = threading.Lock()
 
     def start_delete_resources_management(self):
-        while not self.queue.is_empty():
+        while True:
+            with self.lock:
+                if self.queue.is_empty():
+                    self.active = False
+                    return
             time.sleep(1)
-            self.queue.head.value.remaining_time -= 1
-            if self.queue.head.value.remaining_time <= 0:
-                jobs_finished_ids = self.queue.pop().value.get_app_ids()
-                for job_id in jobs_finished_ids:
-                    job = self.submissions[job_id]
-                    job.delete_job_resources()
-        self.active = False
+            jobs_finished_ids = []
+            with self.lock:
+                self.queue.head.value.remaining_time -= 1
+                if self.queue.head.value.remaining_time <= 0:
+                    jobs_finished_ids = self.queue.pop().value.get_app_ids()
+            for job_id in jobs_finished_ids:
+                self.delete_resources(job_id)
+
+    def delete_resources(self, job_id):
+        """ Deletes the resources of a job, scheduling a new attempt
+        when some of its teardown steps fail.
+        """
+        job = self.submissions.get(job_id)
+        if job is None:
+            self.retries.pop(job_id, None)
+            return
+
+        try:
+            job.delete_job_resources()
+            failures = getattr(job, 'cleanup_failures', None)
+        except Exception as e:
+            failures = {'teardown': str(e)}
+
+        if not failures:
+            self.retries.pop(job_id, None)
+        elif self.retries.get(job_id, 0) < self.max_retries:
+            self.retries[job_id] = self.retries.get(job_id, 0) + 1
+            LOG.log("Retrying the teardown of %s in %s seconds: %s"
+                    % (job_id, self.retry_interval, failures))
+            self.insert_element(job_id, self.retry_interval)
+        else:
+            self.retries.pop(job_id, None)
+            LOG.log("Giving up the teardown of %s after %s retries: %s"
+                    % (job_id, self.max_retries, failures))
+            self.give_up(job_id, job)
+
+    def give_up(self, job_id, job):
+        """ Drops the deletion authorization of a job whose teardown
+        kept failing, so the submission can be deleted and is not torn
+        down again at every restart. Its failures stay recorded.
+        """
+        job.del_resources_authorization = False
+        try:
+            persist_state = getattr(job, 'persist_state', None)
+            if persist_state is not None:
+                persist_state()
+        except Exception as e:
+            LOG.log("Failed to persist %s: %s" % (job_id, e))
+
+    def pending(self):
+        """ Number of jobs waiting for their resources to be deleted """
+        with self.lock:
+            return sum(len(element.get_app_ids())
+                       for element in self.queue.to_list())
 
     def insert_element(self, app_id, time):
         element = JobRepr(app_id, time)
-        self.queue.insert(element)
-        if not self.active:
+        with self.lock:
+            self.queue.insert(element)
+            start = not self.active
             self.active = True
+        if start:
             self.start_thread()
 
     def start_thread(self):
-        self.thread = \
-            threading.Thread(target=self.start_delete_resources_management)
-        self.thread.daemon = True
-        self.thread.start()
+        self.thread = threads.start_thread(
+            self.start_delete_resources_management, 'job-cleaner')
 
 
 class JobRepr():
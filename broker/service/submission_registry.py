@@ -0,0 +1,187 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import itertools
+import threading
+
+_MISSING = object()
+
+
+class SubmissionRegistry(object):
+    """ Thread-safe registry of the submissions by id.
+
+    The submissions are spread over shards, each with its own lock, so
+    threads working on different submissions rarely wait on each other.
+    Iterating, ``keys``, ``values`` and ``items`` work on a snapshot in
+    insertion order, like a dict, so submissions can be added and
+    removed meanwhile.
+
+    The ids are also indexed by state and owner. The executors call
+    :meth:`refresh` whenever their state changes, so counting the
+    submissions in a state never walks them.
+    """
+
+    def __init__(self, shards=16):
+        # entries are (insertion sequence, job) by id
+        self._shards = [({}, threading.Lock()) for _ in range(shards)]
+        self._sequence = itertools.count()
+        # guards the indexes, always taken after a shard lock
+        self._index_lock = threading.Lock()
+        self._indexed = {}
+        self._states = {}
+        self._owners = {}
+
+    def _shard(self, app_id):
+        return self._shards[hash(app_id) % len(self._shards)]
+
+    def __setitem__(self, app_id, job):
+        items, lock = self._shard(app_id)
+        with lock:
+            # a replaced submission keeps its position
+            entry = items.get(app_id)
+            sequence = next(self._sequence) if entry is None else entry[0]
+            items[app_id] = (sequence, job)
+            self._index(app_id, job)
+
+    def __getitem__(self, app_id):
+        items, lock = self._shard(app_id)
+        with lock:
+            return items[app_id][1]
+
+    def __delitem__(self, app_id):
+        if self.pop(app_id, _MISSING) is _MISSING:
+            raise KeyError(app_id)
+
+    def __contains__(self, app_id):
+        items, lock = self._shard(app_id)
+        with lock:
+            return app_id in items
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        with self._index_lock:
+            return len(self._indexed)
+
+    def get(self, app_id, default=None):
+        items, lock = self._shard(app_id)
+        with lock:
+            entry = items.get(app_id)
+        return default if entry is None else entry[1]
+
+    def pop(self, app_id, default=_MISSING):
+        items, lock = self._shard(app_id)
+        with lock:
+            entry = items.pop(app_id, None)
+            if entry is not None:
+                self._unindex(app_id)
+        if entry is None:
+            if default is _MISSING:
+                raise KeyError(app_id)
+            return default
+        return entry[1]
+
+    def update(self, jobs):
+        for app_id, job in dict(jobs).items():
+            self[app_id] = job
+
+    def keys(self):
+        return [app_id for app_id, job in self.items()]
+
+    def values(self):
+        return [job for app_id, job in self.items()]
+
+    def items(self):
+        snapshot = []
+        for items, lock in self._shards:
+            with lock:
+                snapshot.extend((sequence, app_id, job) for app_id, (
+                    sequence, job) in items.items())
+        snapshot.sort(key=lambda entry: entry[0])
+        return [(app_id, job) for sequence, app_id, job in snapshot]
+
+    def refresh(self, app_id):
+        """ Reads the state of a submission again into the indexes.
+        Unknown ids are ignored.
+        """
+        items, lock = self._shard(app_id)
+        with lock:
+            entry = items.get(app_id)
+            if entry is not None:
+                self._index(app_id, entry[1])
+
+    def ids(self, state=None, owner=None):
+        """ Ids of the submissions in a state and of an owner.
+
+        Arguments:
+            state (str) -- Only the submissions in this state
+            owner (str) -- Only the submissions of this user
+
+        Returns:
+            set -- The matching ids, or every id without filters
+        """
+        with self._index_lock:
+            if state is None and owner is None:
+                return set(self._indexed)
+            matching = None
+            if state is not None:
+                matching = set(self._states.get(state, ()))
+            if owner is not None:
+                owned = self._owners.get(owner, set())
+                matching = (set(owned) if matching is None
+                            else matching & owned)
+            return matching
+
+    def count(self, state):
+        with self._index_lock:
+            return len(self._states.get(state, ()))
+
+    def counts(self):
+        """ Number of submissions in each state, leaving out the
+        states no submission is in.
+        """
+        with self._index_lock:
+            return dict((state, len(app_ids))
+                        for state, app_ids in self._states.items())
+
+    def _index(self, app_id, job):
+        state = job.get_application_state() \
+            if hasattr(job, 'get_application_state') else None
+        owner = job.get_owner() if hasattr(job, 'get_owner') else None
+        with self._index_lock:
+            if self._indexed.get(app_id) == (state, owner):
+                return
+            self._drop(app_id)
+            self._indexed[app_id] = (state, owner)
+            self._states.setdefault(state, set()).add(app_id)
+            if owner is not None:
+                self._owners.setdefault(owner, set()).add(app_id)
+
+    def _unindex(self, app_id):
+        with self._index_lock:
+            self._drop(app_id)
+
+    def _drop(self, app_id):
+        if app_id not in self._indexed:
+            return
+        state, owner = self._indexed.pop(app_id)
+        for index, key in ((self._states, state), (self._owners, owner)):
+            app_ids = index.get(key)
+            if app_ids is None:
+                continue
+            app_ids.discard(app_id)
+            if not app_ids:
+                del index[key]
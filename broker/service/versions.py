@@ -0,0 +1,32 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Version counters of the resources served by the REST API.
+
+Every mutation of a submission, plugin or cluster bumps the matching
+counter. The API derives ETags from them and tags the cached responses
+with those ETags.
+"""
+
+from broker.service import api
+from broker.utils.cache import ResponseCache
+from broker.utils.cache import VersionCounter
+
+SUBMISSIONS = VersionCounter()
+PLUGINS = VersionCounter()
+CLUSTERS = VersionCounter()
+
+RESPONSES = ResponseCache(ttl=api.response_cache_ttl,
+                          max_entries=api.response_cache_size)
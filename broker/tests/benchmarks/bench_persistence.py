@@ -0,0 +1,278 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Microbenchmark of the job persistences.
+
+Fills SqliteJobPersistence and Etcd3JobPersistence with the states of
+KubeJobsExecutor jobs in every lifecycle state, with their submission
+data, reports and timelines, and measures put, get, get_all,
+get_finished_jobs and delete at each number of stored jobs and of
+threads calling them together. One JSON line is printed per backend,
+number of stored jobs, threads and operation.
+
+The sqlite database lives in a temporary directory. etcd is the
+in-process fake of broker.tests.unit.mocks.etcd_mock, optionally
+answering each call after ``--etcd-latency`` milliseconds, unless
+``--etcd`` points to a server. Use a server dedicated to the benchmark:
+get_all reads every job of the server, and the jobs written are
+deleted at the end.
+
+Run it from the repository root:
+
+    python -m broker.tests.benchmarks.bench_persistence \\
+        --backends sqlite,etcd --sizes 1000,10000,100000 \\
+        --concurrency 1,4,16,64
+"""
+
+import argparse
+import contextlib
+import datetime
+import itertools
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+
+import etcd3
+import peewee
+
+from broker.persistence.etcd_db.plugin import Etcd3JobPersistence
+from broker.persistence.sqlite.model import JobReport, JobState
+from broker.persistence.sqlite.plugin import SqliteJobPersistence
+from broker.service import api
+from broker.tests.unit import mocks
+from broker.tests.unit.mocks.etcd_mock import MockEtcd3Client
+from broker.utils import metrics
+from broker.utils.timeline import TIME_FORMAT
+from kubejobs import KubeJobsExecutor
+
+BODY_PATH = os.path.join(os.path.dirname(mocks.__file__),
+                         'body_request.json')
+
+PREFIX = 'kj-bench-'
+
+STATES = ('completed', 'completed', 'completed', 'completed', 'completed',
+          'completed', 'ongoing', 'ongoing', 'failed', 'stopped')
+
+PHASES = ('validate', 'activate_cluster', 'setup_redis',
+          'metric_persistence', 'visualization', 'push_jobs', 'trigger',
+          'monitor', 'controller', 'wait')
+
+
+def make_state(app_id, i, data):
+    """ State of a job as the manager persists it. One job in ten
+    waits for the deletion of its resources.
+    """
+    started = datetime.datetime(2019, 6, 1) + datetime.timedelta(minutes=i)
+    status = STATES[i % len(STATES)]
+    finished = status != 'ongoing'
+    timeline = [{'phase': phase,
+                 'started_at': (started + datetime.timedelta(
+                     seconds=offset)).strftime(TIME_FORMAT),
+                 'offset': float(offset), 'duration': 1.0, 'status': 'ok'}
+                for offset, phase in enumerate(PHASES)]
+    report = {'final_error': 0.01 * (i % 10), 'final_replicas': i % 16,
+              'min_error': -0.5, 'max_error': 0.7,
+              'heuristic_options': {'proportional_gain': 0.1},
+              'scaling_strategy': 'pid'} if finished else {}
+    return KubeJobsExecutor(
+        app_id, starting_time=started, status=status,
+        job_completed=status == 'completed', terminated=finished,
+        data=data, report=report,
+        del_resources_authorization=finished and i % 10 == 0,
+        finish_time=started + datetime.timedelta(minutes=5)
+        if finished else None,
+        redis_ip='10.0.0.%d' % (i % 250 + 1), redis_port=30000 + i % 2000,
+        report_persisted=finished, timeline=timeline)
+
+
+@contextlib.contextmanager
+def sqlite_backend(args):
+    directory = tempfile.mkdtemp(prefix='bench-persistence-')
+    database = peewee.SqliteDatabase(os.path.join(directory, 'jobs.db'))
+    try:
+        with database.bind_ctx([JobState, JobReport]), \
+                mock.patch.object(api, 'plugin_name', 'sqlite'):
+            yield SqliteJobPersistence(), database.atomic
+    finally:
+        database.close()
+        shutil.rmtree(directory)
+
+
+@contextlib.contextmanager
+def etcd_backend(args):
+    host, port = args.etcd.split(':') if args.etcd else (None, None)
+    patches = [mock.patch.object(api, 'plugin_name', 'etcd'),
+               mock.patch.object(api, 'persistence_ip', host, create=True),
+               mock.patch.object(api, 'persistence_port', port,
+                                 create=True)]
+    if not args.etcd:
+        # every connector of the manager shares the fake server
+        client = MockEtcd3Client(latency=args.etcd_latency / 1000.0)
+        patches.append(mock.patch.object(etcd3, 'client',
+                                         return_value=client))
+
+    with contextlib.ExitStack() as stack:
+        for patch in patches:
+            stack.enter_context(patch)
+        persistence = Etcd3JobPersistence(api.persistence_ip,
+                                          api.persistence_port)
+        try:
+            yield persistence, contextlib.ExitStack
+        finally:
+            persistence.delete_all(prefix=PREFIX)
+
+
+BACKENDS = {'sqlite': sqlite_backend, 'etcd': etcd_backend}
+
+
+def measure(operation, calls, concurrency):
+    """ Calls ``operation(i)`` for every ``i`` below ``calls`` from
+    ``concurrency`` threads together.
+    """
+    threads = max(min(concurrency, calls), 1)
+    counter = itertools.count()
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    start_line = threading.Barrier(threads + 1)
+
+    def worker():
+        local_latencies = []
+        local_errors = 0
+        start_line.wait()
+        for i in iter(lambda: next(counter), None):
+            if i >= calls:
+                break
+            start = time.perf_counter()
+            try:
+                operation(i)
+            except Exception:
+                local_errors += 1
+            local_latencies.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local_latencies)
+            errors[0] += local_errors
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    start_line.wait()
+    start = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    result = {'calls': calls, 'threads': threads, 'errors': errors[0],
+              'seconds': elapsed, 'per_second': calls / elapsed,
+              'mean_ms': sum(latencies) / len(latencies) * 1000}
+    for q in (50, 95, 99):
+        result['p%d_ms' % q] = metrics.percentile(latencies, q) * 1000
+    return result
+
+
+def fill(persistence, batch, data, start, end):
+    """ Stores the jobs ``start`` to ``end``, in transactions of a
+    thousand jobs where the backend has them.
+    """
+    for first in range(start, end, 1000):
+        with batch():
+            for i in range(first, min(first + 1000, end)):
+                app_id = '%s%07d' % (PREFIX, i)
+                persistence.put(app_id, make_state(app_id, i, data))
+
+
+def bench(persistence, batch, data, stored, concurrency, args, rng):
+    ids = ['%s%07d' % (PREFIX, i) for i in range(stored)]
+
+    updates = []
+    for _ in range(args.ops):
+        i = rng.randrange(stored)
+        updates.append((ids[i], make_state(ids[i], i, data)))
+    reads = [rng.choice(ids) for _ in range(args.ops)]
+    deleted = ['%sdel-%07d' % (PREFIX, i) for i in range(args.ops)]
+
+    yield 'put', measure(lambda i: persistence.put(*updates[i]),
+                         args.ops, concurrency)
+    yield 'get', measure(lambda i: persistence.get(reads[i]),
+                         args.ops, concurrency)
+
+    with batch():
+        for i, app_id in enumerate(deleted):
+            persistence.put(app_id, make_state(app_id, i, data))
+    yield 'delete', measure(lambda i: persistence.delete(deleted[i]),
+                            args.ops, concurrency)
+
+    yield 'get_all', measure(lambda i: persistence.get_all(),
+                             args.scan_ops, concurrency)
+    yield 'get_finished_jobs', measure(
+        lambda i: list(persistence.get_finished_jobs()),
+        args.scan_ops, concurrency)
+
+
+def _int_list(value):
+    return [int(item) for item in value.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backends', default='sqlite,etcd')
+    parser.add_argument('--sizes', type=_int_list,
+                        default=[1000, 10000, 100000],
+                        help='numbers of stored jobs')
+    parser.add_argument('--concurrency', type=_int_list,
+                        default=[1, 4, 16, 64],
+                        help='numbers of threads calling together')
+    parser.add_argument('--ops', type=int, default=1000,
+                        help='calls of put, get and delete')
+    parser.add_argument('--scan-ops', type=int, default=3,
+                        help='calls of get_all and get_finished_jobs')
+    parser.add_argument('--etcd', help='host:port of an etcd server')
+    parser.add_argument('--etcd-latency', type=float, default=0,
+                        help='milliseconds the fake etcd takes per call')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with open(BODY_PATH) as body_file:
+        data = json.load(body_file)
+
+    for backend in args.backends.split(','):
+        rng = random.Random(args.seed)
+        with BACKENDS[backend](args) as (persistence, batch):
+            stored = 0
+            for size in sorted(args.sizes):
+                fill(persistence, batch, data, stored, size)
+                stored = size
+                for concurrency in args.concurrency:
+                    for operation, result in bench(
+                            persistence, batch, data, stored, concurrency,
+                            args, rng):
+                        record = {'backend': backend, 'stored': stored,
+                                  'concurrency': concurrency,
+                                  'operation': operation}
+                        if backend == 'etcd':
+                            record['etcd'] = args.etcd or 'fake'
+                            record['etcd_latency_ms'] = \
+                                0 if args.etcd else args.etcd_latency
+                        record.update(result)
+                        print(json.dumps(record))
+
+
+if __name__ == '__main__':
+    main()
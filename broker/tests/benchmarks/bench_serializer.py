@@ -0,0 +1,142 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Microbenchmark of the JSON backends of broker.utils.serializer.
+
+Serializes and deserializes payloads shaped like the largest bodies the
+manager handles with every installed backend and prints one JSON line
+per payload and backend.
+
+Run it from the repository root:
+
+    python -m broker.tests.benchmarks.bench_serializer --repeat 20
+"""
+
+import argparse
+import copy
+import datetime
+import json
+import timeit
+
+from broker.utils import serializer
+
+
+def submission_list(size):
+    """ Payload of GET /submissions with the monitor reports embedded. """
+    now = datetime.datetime.now()
+    return dict(('kj-%07d' % i, {
+        'app_id': 'kj-%07d' % i,
+        'starting_time': now,
+        'status': 'completed',
+        'visualizer_url': 'http://visualizer:5002/d/kj-%07d' % i,
+        'redis_ip': '10.0.0.%d' % (i % 255),
+        'redis_port': 30000 + i % 2000,
+        'final_error': 0.01 * (i % 10),
+        'final_replicas': i % 16,
+        'min_error': -0.5,
+        'max_error': 0.7,
+        'heuristic_options': {'proportional_gain': 0.1,
+                              'derivative_gain': 0,
+                              'integral_gain': 0},
+        'scaling_strategy': 'pid'
+    }) for i in range(size))
+
+
+def detailed_report(points):
+    """ Payload of GET /submissions/<id>/report. """
+    start = datetime.datetime.now()
+    return {
+        'job_progress': [{'timestamp': start + datetime.timedelta(seconds=i),
+                          'value': i / float(points)}
+                         for i in range(points)],
+        'replicas': [{'timestamp': start + datetime.timedelta(seconds=i),
+                      'value': i % 16} for i in range(points)],
+        'error': [{'timestamp': start + datetime.timedelta(seconds=i),
+                   'value': 0.5 - i / float(points)} for i in range(points)]
+    }
+
+
+def submission_body(env_vars):
+    """ Body of POST /submissions with a large plugin_info. """
+    return {
+        'plugin': 'kubejobs',
+        'enable_auth': False,
+        'plugin_info': {
+            'cmd': ['python', 'app.py'],
+            'img': 'registry.local/app:latest',
+            'init_size': 4,
+            'redis_workload': 'http://files/workload.txt',
+            'env_vars': dict(('VAR_%d' % i, 'value-%d' % i * 4)
+                             for i in range(env_vars)),
+            'control_parameters': {
+                'schedule_strategy': 'pid',
+                'actuator': 'k8s_replicas',
+                'check_interval': 5,
+                'trigger_down': 0,
+                'trigger_up': 0,
+                'min_rep': 1,
+                'max_rep': 64,
+                'heuristic_options': {'proportional_gain': 0.1,
+                                      'derivative_gain': 0,
+                                      'integral_gain': 0}
+            },
+            'monitor_info': {'expected_time': 400},
+            'enable_visualizer': False
+        }
+    }
+
+
+PAYLOADS = {
+    'submission_list_1k': lambda: submission_list(1000),
+    'detailed_report_10k': lambda: detailed_report(10000),
+    'submission_body_5k_env': lambda: submission_body(5000)
+}
+
+
+def bench(payload, repeat):
+    dumps = serializer.JSONDictSerializer().serialize
+    loads = serializer.JSONDeserializer().deserialize
+    body = dumps(payload)
+
+    dump_time = min(timeit.repeat(lambda: dumps(payload),
+                                  number=1, repeat=repeat))
+    load_time = min(timeit.repeat(lambda: loads(body),
+                                  number=1, repeat=repeat))
+    return len(body), dump_time, load_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    for payload_name, build in sorted(PAYLOADS.items()):
+        payload = build()
+        for backend in sorted(serializer.JSON_BACKENDS):
+            serializer.set_json_backend(backend)
+            size, dump_time, load_time = bench(copy.deepcopy(payload),
+                                               args.repeat)
+            print(json.dumps({
+                'payload': payload_name,
+                'backend': backend,
+                'bytes': size,
+                'serialize_ms': dump_time * 1000,
+                'deserialize_ms': load_time * 1000,
+                'serialize_mb_s': size / dump_time / 2 ** 20
+            }))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Startup benchmark of the manager.
+
+Imports each module in a fresh interpreter and measures the import,
+the whole process and, for the application, create_app, which connects
+the persistence and recovers the submissions. Each run happens in a
+temporary directory holding a copy of broker.cfg, so the logs and the
+sqlite database of the runs are thrown away. One JSON line is printed
+per module, with the heavy dependencies the import loaded. Revisions
+older than create_app, which initialized when importing, can be
+measured too.
+
+Run it from the repository root:
+
+    python -m broker.tests.benchmarks.bench_startup --runs 10
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from broker.utils import metrics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__)))))
+
+HEAVY = ('dill', 'etcd3', 'influxdb', 'kubernetes', 'peewee', 'redis')
+
+CHILD = '''
+import importlib, json, sys, time
+start = time.perf_counter()
+importlib.import_module(%(module)r)
+imported = time.perf_counter()
+result = {'import_ms': (imported - start) * 1000}
+if %(create_app)r:
+    from broker.cli import main
+    # revisions without create_app initialize when importing
+    if hasattr(main, 'create_app'):
+        main.create_app()
+    result['create_app_ms'] = (time.perf_counter() - imported) * 1000
+result['heavy_modules'] = sorted(m for m in %(heavy)r if m in sys.modules)
+print(json.dumps(result))
+'''
+
+
+def run_once(module, create_app):
+    directory = tempfile.mkdtemp(prefix='bench-startup-')
+    try:
+        shutil.copy(os.path.join(ROOT, 'broker.cfg'), directory)
+        os.mkdir(os.path.join(directory, 'local_database'))
+        env = dict(os.environ, PYTHONPATH=ROOT)
+        code = CHILD % {'module': module, 'create_app': create_app,
+                        'heavy': HEAVY}
+        start = time.perf_counter()
+        output = subprocess.check_output(
+            [sys.executable, '-c', code], cwd=directory, env=env,
+            stderr=subprocess.DEVNULL)
+        result = json.loads(output.decode('utf-8').splitlines()[-1])
+        result['process_ms'] = (time.perf_counter() - start) * 1000
+        return result
+    finally:
+        shutil.rmtree(directory)
+
+
+def summarize(module, results):
+    summary = {'module': module, 'runs': len(results),
+               'heavy_modules': results[-1]['heavy_modules']}
+    for key in ('import_ms', 'create_app_ms', 'process_ms'):
+        values = [result[key] for result in results if key in result]
+        if values:
+            summary[key + '_p50'] = metrics.percentile(values, 50)
+            summary[key + '_min'] = min(values)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--modules',
+                        default='broker.service.api,broker.api.v10,'
+                                'kubejobs',
+                        help='modules imported on their own')
+    args = parser.parse_args()
+
+    targets = [(module, False) for module in args.modules.split(',')]
+    targets.append(('broker.api.v10', True))
+    for module, create_app in targets:
+        results = [run_once(module, create_app) for _ in range(args.runs)]
+        summary = summarize(module, results)
+        summary['create_app'] = create_app
+        print(json.dumps(summary))
+
+
+if __name__ == '__main__':
+    main()
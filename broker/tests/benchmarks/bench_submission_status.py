@@ -0,0 +1,144 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Throughput benchmark of GET /submissions/<id>.
+
+Boots the manager API in this process, once with the development server
+used by ``app.run`` and once with the pooled server, and hammers the
+status endpoint of a single submission from a set of client threads.
+
+Run it from the repository root:
+
+    python -m broker.tests.benchmarks.bench_submission_status \\
+        --clients 16 --duration 10 --threads 16
+"""
+
+import argparse
+import json
+import logging
+import threading
+import time
+
+import requests
+from flask import Flask
+from werkzeug import serving
+
+from broker.api.v10 import rest
+from broker.service.api import v10 as api
+from broker.utils import wsgi
+from kubejobs import KubeJobsExecutor
+
+APP_ID = 'kj-bench00'
+
+
+def make_submission():
+    executor = KubeJobsExecutor(APP_ID, status='ongoing')
+    executor.report = {'final_error': 0, 'final_replicas': 4,
+                       'min_error': -0.2, 'max_error': 0.3,
+                       'heuristic_options': {'proportional_gain': 0.1},
+                       'scaling_strategy': 'pid'}
+    api.submissions[APP_ID] = executor
+
+
+def start_server(mode, app, threads):
+    if mode == 'development':
+        server = serving.make_server('127.0.0.1', 0, app)
+    else:
+        server = wsgi.PooledWSGIServer('127.0.0.1', 0, app,
+                                       pool_size=threads)
+    thread = threading.Thread(target=server.serve_forever,
+                              name='bench-server-%s' % mode)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def run_clients(url, clients, duration):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.time() + duration
+
+    def client():
+        session = requests.Session()
+        local_latencies = []
+        local_errors = 0
+        while time.time() < deadline:
+            start = time.time()
+            try:
+                if session.get(url).status_code != 200:
+                    local_errors += 1
+            except requests.exceptions.RequestException:
+                local_errors += 1
+            local_latencies.append(time.time() - start)
+        with lock:
+            latencies.extend(local_latencies)
+            errors[0] += local_errors
+
+    workers = [threading.Thread(target=client) for _ in range(clients)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    return latencies, errors[0]
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(q / 100.0 * len(ordered))))
+    return ordered[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--threads', type=int, default=16,
+                        help='worker threads of the pooled server')
+    parser.add_argument('--modes', default='development,threaded')
+    args = parser.parse_args()
+
+    # Access logs would dominate the measurement.
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    app = Flask(__name__)
+    app.register_blueprint(rest)
+    make_submission()
+
+    for mode in args.modes.split(','):
+        server = start_server(mode, app, args.threads)
+        url = 'http://127.0.0.1:%s/submissions/%s' % (
+            server.server_port, APP_ID)
+        latencies, errors = run_clients(url, args.clients, args.duration)
+        server.shutdown()
+        server.server_close()
+
+        print(json.dumps({
+            'mode': mode,
+            'clients': args.clients,
+            'requests': len(latencies),
+            'errors': errors,
+            'throughput': len(latencies) / args.duration,
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p95_ms': percentile(latencies, 95) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000
+        }))
+
+
+if __name__ == '__main__':
+    main()
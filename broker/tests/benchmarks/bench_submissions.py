@@ -0,0 +1,435 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" End-to-end benchmark of the lifecycle of submissions.
+
+Boots the manager API in this process with local stand-ins for all of
+its dependencies: a fake cluster whose jobs stay active for
+``--job-duration`` seconds replaces the Kubernetes helpers, the Redis
+mock replaces the job queues, and a stub HTTP service plays the
+monitor, the controller and the visualizer and serves the workload.
+
+With ``--cluster simulated`` the real Kubernetes helpers run instead,
+against the simulated cluster of broker.tests.unit.mocks.k8s_simulator,
+whose nodes, image pulls and work queue drain rate are set from the
+command line, and its statistics are added to the summary. This finds
+the bottlenecks of the manager at a given cluster capacity.
+
+Submissions are posted at ``--rate`` per second for ``--duration``
+seconds. Each one is polled every ``--poll-interval`` seconds until it
+finishes and is then deleted. One JSON line is printed per operation,
+followed by a summary with the completed submissions per second, the
+time from submission to completion and the peak thread count and
+resident memory of the process.
+
+Run it from the repository root:
+
+    python -m broker.tests.benchmarks.bench_submissions \\
+        --rate 20 --duration 30 --job-duration 2
+
+    python -m broker.tests.benchmarks.bench_submissions \\
+        --cluster simulated --nodes 10 --rate 50 --duration 60
+"""
+
+import argparse
+import collections
+import contextlib
+import json
+import logging
+import os
+import queue
+import resource
+import threading
+import time
+from unittest import mock
+
+import requests
+from flask import Flask
+from werkzeug import serving
+
+import kubejobs
+from broker.api.v10 import rest
+from broker.service import api
+from broker.service.api import v10 as service
+from broker.tests.unit import mocks
+from broker.tests.unit.mocks.k8s_mock import MockKubeCluster
+from broker.tests.unit.mocks.k8s_simulator import SimulatedCluster
+from broker.tests.unit.mocks.persistence_mock import PersistenceMock
+from broker.tests.unit.mocks.redis_mock import MockRedis
+from broker.utils import metrics
+from broker.utils import wsgi
+
+BODY_PATH = os.path.join(os.path.dirname(mocks.__file__),
+                         'body_request.json')
+
+FINAL_STATES = ('completed', 'failed', 'error', 'stopped', 'terminated',
+                'not found')
+
+# Period of the thread count and memory samples
+SAMPLE_INTERVAL = 0.5
+
+
+def framework_stub(workload_items):
+    """ Flask app answering the calls the manager makes to the monitor,
+    the controller and the visualizer, and serving the workload.
+    """
+    app = Flask('framework')
+    workload = ''.join('item-%d\n' % i for i in range(workload_items))
+    report = json.dumps({'final_error': 0, 'final_replicas': 1,
+                         'min_error': -0.1, 'max_error': 0.1})
+
+    @app.route('/workload')
+    def get_workload():
+        return workload
+
+    @app.route('/monitoring/<app_id>/report')
+    def get_report(app_id):
+        return report, 200, {'Content-Type': 'application/json'}
+
+    @app.route('/visualizing/<app_id>')
+    def get_visualizer_url(app_id):
+        return json.dumps({'url': 'http://visualizer/%s' % app_id})
+
+    @app.route('/monitoring/<app_id>', methods=['POST'])
+    @app.route('/monitoring/<app_id>/stop', methods=['PUT'])
+    @app.route('/scaling/<app_id>', methods=['POST'])
+    @app.route('/scaling/<app_id>/stop', methods=['PUT'])
+    @app.route('/visualizing/<app_id>', methods=['POST'])
+    @app.route('/visualizing/<app_id>/stop', methods=['PUT'])
+    def accept(app_id):
+        return '', 204
+
+    return app
+
+
+def start_server(server, name):
+    thread = threading.Thread(target=server.serve_forever, name=name)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+@contextlib.contextmanager
+def stand_ins(cluster, framework_url, persistence):
+    """ Replaces the dependencies of the manager and initializes it on
+    them. ``persistence`` is None to keep the configured backend, the
+    plugins are always kept in the configured one.
+    """
+    with contextlib.ExitStack() as stack:
+        if isinstance(cluster, SimulatedCluster):
+            stack.enter_context(cluster.patch())
+        else:
+            stack.enter_context(mock.patch.object(kubejobs, 'k8s',
+                                                  cluster))
+            stack.enter_context(mock.patch.object(
+                kubejobs.redis, 'StrictRedis',
+                lambda **kwargs: MockRedis()))
+        for name in ('monitor_url', 'controller_url', 'visualizer_url'):
+            stack.enter_context(mock.patch.object(api, name,
+                                                  framework_url))
+        if persistence is not None:
+            stack.enter_context(mock.patch.object(
+                kubejobs.KubeJobsExecutor, 'get_db_connector',
+                lambda executor: persistence))
+            plugins = service.setup_database()[1]
+            stack.enter_context(mock.patch.object(
+                service, 'setup_database', lambda: (persistence, plugins)))
+        service.initialize()
+        yield
+
+
+def submission_body(framework_url):
+    with open(BODY_PATH) as body_file:
+        plugin_info = json.load(body_file)
+    plugin_info['redis_workload'] = framework_url + '/workload'
+    # the deprecated config_id of the sample is a number, which the
+    # Kubernetes client rejects as the value of an environment variable
+    plugin_info.pop('config_id', None)
+    return {'plugin': 'kubejobs', 'enable_auth': False,
+            'plugin_info': plugin_info}
+
+
+def rss_bytes():
+    """ Resident memory of this process, or its peak where the current
+    value is not exposed.
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize()
+    except (IOError, OSError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Load(object):
+    """ Drives the lifecycle of the submissions and keeps the latency
+    of every request, by operation.
+    """
+
+    def __init__(self, url, body, rate, duration, poll_interval):
+        self.url = url
+        self.body = body
+        self.rate = rate
+        self.duration = duration
+        self.poll_interval = poll_interval
+        self.lock = threading.Lock()
+        self.latencies = collections.defaultdict(list)
+        self.errors = collections.Counter()
+        self.submissions = queue.Queue()
+        self.tracked = queue.Queue()
+        self.outstanding = 0
+        self.finished = threading.Event()
+        self.local = threading.local()
+
+    def session(self):
+        if not hasattr(self.local, 'session'):
+            self.local.session = requests.Session()
+        return self.local.session
+
+    def request(self, operation, method, path, expected, **kwargs):
+        start = time.monotonic()
+        try:
+            response = self.session().request(method, self.url + path,
+                                              **kwargs)
+        except requests.exceptions.RequestException:
+            response = None
+        latency = time.monotonic() - start
+        ok = response is not None and response.status_code in expected
+        with self.lock:
+            self.latencies[operation].append(latency)
+            if not ok:
+                self.errors[operation] += 1
+        return response if ok else None
+
+    def record(self, operation, seconds):
+        with self.lock:
+            self.latencies[operation].append(seconds)
+
+    def schedule(self):
+        """ Releases the submissions at the requested rate. """
+        start = time.monotonic()
+        for i in range(int(self.rate * self.duration)):
+            delay = start + i / float(self.rate) - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self.submissions.put(time.monotonic())
+
+    def submit(self):
+        while True:
+            released = self.submissions.get()
+            if released is None:
+                return
+            response = self.request('submit', 'POST', '/submissions',
+                                    (200, 202), json=self.body)
+            if response is None:
+                continue
+            with self.lock:
+                self.outstanding += 1
+            self.tracked.put({'app_id': response.json()['job_id'],
+                              'submitted': released, 'finished': None,
+                              'due': time.monotonic()})
+
+    def poll(self):
+        while not self.finished.is_set():
+            try:
+                submission = self.tracked.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            delay = submission['due'] - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            if self.advance(submission):
+                with self.lock:
+                    self.outstanding -= 1
+            else:
+                submission['due'] = time.monotonic() + self.poll_interval
+                self.tracked.put(submission)
+
+    def advance(self, submission):
+        """ Moves a submission one step through its lifecycle.
+
+        Returns:
+            bool -- Whether the submission is gone from the manager
+        """
+        path = '/submissions/%s' % submission['app_id']
+        response = self.request('status', 'GET', path, (200, 400))
+        if response is None:
+            return False
+        if response.status_code == 400:
+            if submission['finished'] is not None:
+                self.record('deletion', time.monotonic() -
+                            submission['finished'])
+            return True
+        if response.json()['status'] not in FINAL_STATES:
+            return False
+
+        if submission['finished'] is None:
+            submission['finished'] = time.monotonic()
+            self.record('turnaround', submission['finished'] -
+                        submission['submitted'])
+        # the job is only deleted once its resources are released, so
+        # it is deleted again until it is gone
+        self.request('delete', 'DELETE', path, (200, 204),
+                     json={'enable_auth': False})
+        return False
+
+    def pending(self):
+        with self.lock:
+            return self.outstanding + self.submissions.qsize()
+
+
+def sample(samples, stop):
+    while not stop.wait(SAMPLE_INTERVAL):
+        samples.append((threading.active_count(), rss_bytes()))
+
+
+def summarize(name, latencies, errors, elapsed):
+    summary = {'operation': name, 'count': len(latencies),
+               'errors': errors, 'per_second': len(latencies) / elapsed}
+    for q in (50, 95, 99):
+        value = metrics.percentile(latencies, q)
+        summary['p%d_ms' % q] = None if value is None else value * 1000
+    return summary
+
+
+def run(args):
+    if args.cluster == 'simulated':
+        cluster = SimulatedCluster(
+            nodes=args.nodes, node_cpu=args.node_cpu,
+            node_memory=args.node_memory,
+            image_pull_seconds=args.image_pull,
+            drain_rate=args.drain_rate)
+    else:
+        cluster = MockKubeCluster(job_duration=args.job_duration)
+    framework = start_server(serving.make_server(
+        '127.0.0.1', 0, framework_stub(args.workload_items), threaded=True),
+        'bench-framework')
+    framework_url = 'http://127.0.0.1:%s' % framework.server_port
+    persistence = PersistenceMock() if args.persistence == 'memory' \
+        else None
+
+    app = Flask(__name__)
+    app.register_blueprint(rest)
+    manager = start_server(wsgi.PooledWSGIServer(
+        '127.0.0.1', 0, app, pool_size=args.threads), 'bench-manager')
+
+    load = Load('http://127.0.0.1:%s' % manager.server_port,
+                submission_body(framework_url), args.rate, args.duration,
+                args.poll_interval)
+    samples = [(threading.active_count(), rss_bytes())]
+    stop_sampling = threading.Event()
+    workers = [threading.Thread(target=sample,
+                                args=(samples, stop_sampling))]
+    workers += [threading.Thread(target=load.submit)
+                for _ in range(args.clients)]
+    workers += [threading.Thread(target=load.poll)
+                for _ in range(args.pollers)]
+
+    with stand_ins(cluster, framework_url, persistence):
+        start = time.monotonic()
+        for worker in workers:
+            worker.start()
+        load.schedule()
+        for _ in range(args.clients):
+            load.submissions.put(None)
+
+        deadline = time.monotonic() + args.drain_timeout
+        while load.pending() and time.monotonic() < deadline:
+            time.sleep(0.1)
+        elapsed = time.monotonic() - start
+        load.finished.set()
+        stop_sampling.set()
+        for worker in workers:
+            worker.join()
+        # a deleted submission may still be releasing its resources
+        for thread in threading.enumerate():
+            if thread.name.startswith('application:'):
+                thread.join(max(deadline - time.monotonic(), 0))
+
+    manager.shutdown()
+    manager.server_close()
+    framework.shutdown()
+    framework.server_close()
+
+    for name in ('submit', 'status', 'delete', 'turnaround', 'deletion'):
+        print(json.dumps(summarize(name, load.latencies[name],
+                                   load.errors[name], elapsed)))
+
+    completed = len(load.latencies['turnaround'])
+    summary = {
+        'rate': args.rate,
+        'duration': args.duration,
+        'cluster': args.cluster,
+        'persistence': args.persistence,
+        'submitted': len(load.latencies['submit']) - load.errors['submit'],
+        'completed': completed,
+        'deleted': len(load.latencies['deletion']),
+        'unfinished': load.pending(),
+        'elapsed': elapsed,
+        'throughput': completed / elapsed,
+        'threads_peak': max(count for count, rss in samples),
+        'rss_start_mb': samples[0][1] / 2.0 ** 20,
+        'rss_peak_mb': max(rss for count, rss in samples) / 2.0 ** 20,
+        'jobs_left_in_cluster': cluster.active_jobs()
+    }
+    if args.cluster == 'simulated':
+        summary['simulation'] = cluster.stats()
+    else:
+        summary['job_duration'] = args.job_duration
+    print(json.dumps(summary))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rate', type=float, default=10,
+                        help='submissions per second')
+    parser.add_argument('--duration', type=float, default=10,
+                        help='seconds during which submissions arrive')
+    parser.add_argument('--cluster', choices=('mock', 'simulated'),
+                        default='mock',
+                        help='jobs active for a fixed time, or the '
+                        'simulated cluster')
+    parser.add_argument('--job-duration', type=float, default=1,
+                        help='seconds each job stays active in the mock')
+    parser.add_argument('--nodes', type=int, default=3,
+                        help='nodes of the simulated cluster')
+    parser.add_argument('--node-cpu', default='4')
+    parser.add_argument('--node-memory', default='16Gi')
+    parser.add_argument('--image-pull', type=float, default=5,
+                        help='seconds to pull the image on a node')
+    parser.add_argument('--drain-rate', type=float, default=10,
+                        help='work items each pod processes per second')
+    parser.add_argument('--poll-interval', type=float, default=0.5)
+    parser.add_argument('--clients', type=int, default=8,
+                        help='threads posting submissions')
+    parser.add_argument('--pollers', type=int, default=8,
+                        help='threads polling and deleting submissions')
+    parser.add_argument('--threads', type=int, default=16,
+                        help='worker threads of the pooled server')
+    parser.add_argument('--workload-items', type=int, default=100)
+    parser.add_argument('--persistence', choices=('memory', 'configured'),
+                        default='memory',
+                        help='keep the jobs in memory or in the backend '
+                        'of broker.cfg')
+    parser.add_argument('--drain-timeout', type=float, default=60,
+                        help='seconds to wait for the last submissions')
+    args = parser.parse_args()
+
+    # Access logs would dominate the measurement.
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    run(args)
+
+
+if __name__ == '__main__':
+    main()
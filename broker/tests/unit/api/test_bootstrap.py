@@ -0,0 +1,220 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import datetime
+import unittest
+from unittest import mock
+
+import flask
+
+from broker.api.v10 import rest
+from broker.cli import main
+from broker.service.api import v10
+from broker.tests.unit.mocks.persistence_mock import PersistenceMock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__))))))
+
+
+class JobStub(object):
+    """
+    Class that represents a submission recovered from the persistence
+    """
+
+    listed = 0
+
+    def __init__(self, app_id, job_completed):
+        self.app_id = app_id
+        self.job_completed = job_completed
+        self.terminated = job_completed
+        self.del_resources_authorization = False
+        self.statuses = None
+
+    def get_cluster_statuses(self):
+        JobStub.listed += 1
+        return {self.app_id: 'listed'}
+
+    def synchronize(self, statuses=None):
+        self.statuses = statuses
+
+
+class TestBootstrap(unittest.TestCase):
+    """
+    Class that represents the tests of the initialization of the
+    manager
+    """
+
+    def setUp(self):
+        self.jobs = {'kj-400001': JobStub('kj-400001', True),
+                     'kj-400002': JobStub('kj-400002', False)}
+        self.persistence = PersistenceMock()
+        self.persistence.get_all = lambda: dict(self.jobs)
+        self.setup_database = mock.Mock(
+            return_value=(self.persistence, mock.Mock()))
+
+        JobStub.listed = 0
+        self.patches = [
+            mock.patch.object(v10, '_initialized', False),
+            mock.patch.object(v10, '_reconciliation', dict(
+                v10._reconciliation, state='pending')),
+            mock.patch.object(v10, 'db_connector', None),
+            mock.patch.object(v10, 'plugin_connector', None),
+            mock.patch.object(v10, 'job_cleaner_svc', None),
+            mock.patch.object(v10, 'setup_database', self.setup_database),
+            mock.patch.object(v10, 'check_basic_plugins'),
+            mock.patch.object(v10, 'create_thread')]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in reversed(self.patches):
+            patch.stop()
+        for app_id in self.jobs:
+            v10.submissions.pop(app_id, None)
+
+    def test_import_is_lazy(self):
+        """
+        Verify that importing the API neither loads the persistence
+        and cluster clients, creates the database nor starts threads
+        """
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        shutil.copy(os.path.join(ROOT, 'broker.cfg'), directory)
+        os.mkdir(os.path.join(directory, 'local_database'))
+        code = ('import json, sys, threading; import broker.api.v10; '
+                'print(threading.active_count()); '
+                'print(json.dumps(sorted(sys.modules)))')
+
+        output = subprocess.check_output(
+            [sys.executable, '-c', code], cwd=directory,
+            env=dict(os.environ, PYTHONPATH=ROOT),
+            stderr=subprocess.DEVNULL)
+
+        lines = output.decode('utf-8').splitlines()
+        self.assertEqual(lines[-2], '1')
+        modules = json.loads(lines[-1])
+        for heavy in ('dill', 'etcd3', 'influxdb', 'kubejobs',
+                      'kubernetes', 'peewee', 'redis'):
+            self.assertNotIn(heavy, modules)
+        self.assertEqual(os.listdir(os.path.join(directory,
+                                                 'local_database')), [])
+
+    def test_initialize(self):
+        """
+        Verify that initialize recovers the submissions, follows the
+        ongoing ones again and synchronizes them all from a single
+        listing of the cluster
+        """
+        v10.initialize(wait=True)
+
+        self.assertIs(v10.db_connector, self.persistence)
+        self.assertIs(v10.submissions['kj-400001'], self.jobs['kj-400001'])
+        self.assertIs(v10.submissions['kj-400002'], self.jobs['kj-400002'])
+        v10.create_thread.assert_called_once_with(self.jobs['kj-400002'])
+        self.assertEqual(JobStub.listed, 1)
+        for job in self.jobs.values():
+            self.assertIn(job.statuses, ({'kj-400001': 'listed'},
+                                         {'kj-400002': 'listed'}))
+        self.assertEqual(v10.job_cleaner_svc.pending(), 0)
+
+    def test_reconcile_listing_failed(self):
+        """
+        Verify that the submissions are synchronized one by one when
+        the cluster can't be listed, and those failing are counted
+        """
+        def fail():
+            raise Exception('connection refused')
+
+        def fail_synchronize(statuses=None):
+            raise Exception('connection refused')
+
+        for job in self.jobs.values():
+            job.get_cluster_statuses = fail
+        self.jobs['kj-400001'].synchronize = fail_synchronize
+
+        v10.reconcile_submissions(list(self.jobs.values()))
+
+        self.assertIsNone(self.jobs['kj-400002'].statuses)
+        progress = v10.readiness()
+        self.assertTrue(progress['ready'])
+        self.assertEqual((progress['total'], progress['done'],
+                          progress['failed']), (2, 2, 1))
+
+    def test_reconcile_finished(self):
+        """
+        Verify that the resources of the finished submissions are
+        released, or their release scheduled, before they are
+        synchronized
+        """
+        now = datetime.datetime.now()
+        released = mock.Mock(return_value={})
+        for job, lifetime in zip(self.jobs.values(), (0, 600)):
+            job.del_resources_authorization = True
+            job.finish_time = now
+            job.job_resources_lifetime = lifetime
+            job.delete_job_resources = released
+        v10.job_cleaner_svc = mock.Mock()
+
+        v10.reconcile_submissions(list(self.jobs.values()))
+
+        self.assertEqual(released.call_count, 1)
+        app_id, seconds = v10.job_cleaner_svc.insert_element.call_args[0]
+        self.assertEqual(app_id, 'kj-400002')
+        self.assertAlmostEqual(seconds, 600, delta=2)
+
+    def test_readiness(self):
+        """
+        Verify that GET /health/ready answers 503 until the recovered
+        submissions are reconciled
+        """
+        app = flask.Flask(__name__)
+        app.register_blueprint(rest)
+        client = app.test_client()
+
+        resp = client.get('/health/ready')
+        self.assertEqual(resp.status_code, 503)
+        self.assertEqual(resp.get_json()['state'], 'pending')
+
+        v10.initialize(wait=True)
+        resp = client.get('/health/ready')
+
+        self.assertEqual(resp.status_code, 200)
+        body = resp.get_json()
+        self.assertTrue(body['ready'])
+        self.assertEqual((body['total'], body['done'], body['failed']),
+                         (2, 2, 0))
+
+    def test_initialize_once(self):
+        """
+        Verify that only the first call of initialize, through the
+        application factory too, does the initialization
+        """
+        app = main.create_app()
+        v10.initialize(wait=True)
+        main.create_app(initialize=False)
+
+        self.assertIn('v10', app.blueprints)
+        self.assertEqual(self.setup_database.call_count, 1)
+        self.assertEqual(v10.create_thread.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
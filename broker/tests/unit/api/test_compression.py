@@ -0,0 +1,184 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gzip
+import json
+import threading
+import unittest
+import zlib
+from unittest import mock
+
+import flask
+
+from broker.service import api
+from broker.utils import api as u
+from broker.utils import metrics
+from broker.utils.cache import ResponseCache
+from broker.utils.cache import VersionCounter
+
+ITEMS = [{'app_id': 'kj-%06d' % i, 'status': 'completed'}
+         for i in range(100)]
+
+
+class TestCompression(unittest.TestCase):
+    """
+    Class that represents the tests of the response compression
+    """
+
+    def setUp(self):
+        self.builds = 0
+        self.counter = VersionCounter()
+        self.cache = ResponseCache(ttl=60)
+        rest = u.Rest('compression', __name__)
+
+        @rest.get('/large')
+        def large():
+            return u.render({'items': ITEMS})
+
+        @rest.get('/small')
+        def small():
+            return u.render({'items': ITEMS[:1]})
+
+        @rest.get('/stream')
+        def stream():
+            return u.render_stream(iter(ITEMS))
+
+        @rest.get('/follow')
+        def follow():
+            return u.render_text_stream(iter(['line']), follow=True)
+
+        @rest.get('/versioned')
+        def versioned():
+            def build():
+                self.builds += 1
+                return {'items': ITEMS}
+            return u.render_versioned(build, lambda: 'etag-1',
+                                      self.cache, 'versioned')
+
+        @rest.get('/changing')
+        def changing():
+            def build():
+                # a job thread persists the resource meanwhile
+                body = {'version': self.counter.version()}
+                self.counter.bump('kj-000001')
+                return body
+            return u.render_versioned(build, self.counter.etag,
+                                      self.cache, 'changing')
+
+        app = flask.Flask(__name__)
+        app.register_blueprint(rest)
+        self.client = app.test_client()
+        self.stream_size = api.compression_stream_size
+
+    def tearDown(self):
+        api.compression_stream_size = self.stream_size
+
+    def get(self, path, encoding='gzip'):
+        return self.client.get(path, headers={'Accept-Encoding': encoding})
+
+    def test_gzip(self):
+        """
+        Verify that large bodies are compressed for clients accepting
+        gzip and that the compression is recorded
+        """
+        compressed = metrics.REGISTRY.counter(
+            'response_compressed_bytes_total', encoding='gzip')
+        before = compressed.value
+
+        resp = self.get('/large')
+
+        self.assertEqual(resp.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', resp.headers['Vary'])
+        self.assertEqual(json.loads(gzip.decompress(resp.data)),
+                         {'items': ITEMS})
+        self.assertEqual(compressed.value - before, len(resp.data))
+
+    def test_not_compressed(self):
+        """
+        Verify that small bodies and clients not accepting any of
+        the available encodings get the body as is
+        """
+        for path, encoding in (('/small', 'gzip'), ('/large', 'identity'),
+                               ('/large', 'gzip;q=0, compress')):
+            resp = self.get(path, encoding)
+            self.assertNotIn('Content-Encoding', resp.headers)
+            self.assertIn('items', json.loads(resp.data))
+
+    def test_stream(self):
+        """
+        Verify that streamed and very large bodies are compressed while
+        they are sent
+        """
+        api.compression_stream_size = 0
+        for path in ('/stream', '/large'):
+            resp = self.get(path)
+            self.assertEqual(resp.headers['Content-Encoding'], 'gzip')
+            self.assertNotIn('Content-Length', resp.headers)
+
+            body = zlib.decompressobj(31).decompress(resp.data)
+            self.assertIn(b'kj-000099', body)
+
+    def test_follow_slots(self):
+        """
+        Verify that followed streams beyond the limit are answered 503
+        and that closing one frees its slot
+        """
+        with mock.patch.object(u, 'FOLLOW_SLOTS',
+                               threading.BoundedSemaphore(1)):
+            first = self.client.get('/follow', buffered=False)
+            second = self.client.get('/follow')
+            self.assertEqual(second.status_code, 503)
+
+            first.close()
+            third = self.client.get('/follow')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(third.status_code, 200)
+        self.assertEqual(third.data, b'line\n')
+
+    def test_versioned_cache(self):
+        """
+        Verify that the cached body of each encoding is served with
+        its own Content-Encoding
+        """
+        for encoding in ('gzip', 'identity', 'gzip', 'identity'):
+            resp = self.get('/versioned', encoding)
+            if encoding == 'gzip':
+                self.assertEqual(resp.headers['Content-Encoding'], 'gzip')
+                data = gzip.decompress(resp.data)
+            else:
+                self.assertNotIn('Content-Encoding', resp.headers)
+                data = resp.data
+            self.assertEqual(json.loads(data), {'items': ITEMS})
+
+        self.assertEqual(self.builds, 2)
+
+    def test_versioned_changed(self):
+        """
+        Verify that a body built while its resource changed is neither
+        tagged nor cached
+        """
+        etag = self.counter.etag()
+
+        resp = self.get('/changing', 'identity')
+
+        self.assertIsNone(resp.headers.get('ETag'))
+        self.assertEqual(json.loads(resp.data), {'version': 0})
+        self.assertIsNone(self.cache.get('changing', etag))
+        self.assertIsNone(self.cache.get('changing', self.counter.etag()))
+
+
+if __name__ == '__main__':
+    unittest.main()
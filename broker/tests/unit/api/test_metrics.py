@@ -0,0 +1,96 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import unittest
+from unittest import mock
+
+import flask
+
+from broker.api.v10 import rest
+from broker.service.api import v10
+from broker.tests.unit.mocks.persistence_mock import PersistenceMock
+from kubejobs import KubeJobsExecutor
+
+
+class TestMetricsEndpoint(unittest.TestCase):
+    """
+    Class that represents the tests of GET /metrics
+    """
+
+    def setUp(self):
+        app = flask.Flask(__name__)
+        app.register_blueprint(rest)
+        self.client = app.test_client()
+
+        self.jobs = {}
+        for app_id, status in (('kj-100001', 'ongoing'),
+                               ('kj-100002', 'ongoing'),
+                               ('kj-100003', 'completed')):
+            job = KubeJobsExecutor(app_id, status=status)
+            job.db_connector = PersistenceMock()
+            self.jobs[app_id] = job
+        v10.submissions.update(self.jobs)
+
+    def tearDown(self):
+        for app_id in self.jobs:
+            v10.submissions.pop(app_id, None)
+
+    def test_metrics(self):
+        """
+        Verify that the routes are timed and the gauges collected
+        """
+        self.client.get('/submissions/kj-100001')
+        resp = self.client.get('/metrics')
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.mimetype, 'text/plain')
+        lines = resp.data.decode('utf-8').splitlines()
+        self.assertIn('# TYPE http_request_seconds histogram', lines)
+        self.assertTrue(any(
+            line.startswith('http_request_seconds_count{endpoint='
+                            '"submission_status",method="GET",'
+                            'status="200"}') for line in lines))
+        self.assertIn('submissions{state="ongoing"} 2', lines)
+        self.assertIn('submissions{state="completed"} 1', lines)
+        self.assertTrue(any(line.startswith('threads ') for line in lines))
+        self.assertIn('cleaner_pending_jobs 0', lines)
+
+        for app_id in ('kj-100001', 'kj-100002'):
+            v10.submissions.pop(app_id)
+        lines = self.client.get('/metrics').data.decode('utf-8').splitlines()
+        self.assertIn('submissions{state="ongoing"} 0', lines)
+
+    def test_tuple_response(self):
+        """
+        Verify that views returning a (body, status) tuple, as
+        POST /plugins does, are answered and timed with their status
+        """
+        with mock.patch.object(v10, 'install_plugin',
+                               return_value=({'message': 'failed'}, 400)):
+            resp = self.client.post('/plugins', data=json.dumps({}),
+                                    content_type='application/json')
+
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(resp.get_json(), {'message': 'failed'})
+        lines = self.client.get('/metrics').data.decode('utf-8').splitlines()
+        self.assertTrue(any(
+            line.startswith('http_request_seconds_count{endpoint='
+                            '"install_plugin",method="POST",'
+                            'status="400"}') for line in lines))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import unittest
+
+import flask
+
+from broker.api.v10 import rest
+from broker.service.api import v10
+from broker.tests.unit.mocks.persistence_mock import PersistenceMock
+from broker.utils import serializer
+from kubejobs import KubeJobsExecutor
+
+MSGPACK = 'application/msgpack'
+
+
+class ReportJob(KubeJobsExecutor):
+
+    def __init__(self, app_id):
+        KubeJobsExecutor.__init__(self, app_id)
+        self.db_connector = PersistenceMock()
+
+    def get_detailed_report(self):
+        return {'job_progress': self.app_id}
+
+
+@unittest.skipUnless(serializer.msgpack_available(), "msgpack not installed")
+class TestMsgpackEndpoints(unittest.TestCase):
+    """
+    Class that represents the tests of MessagePack bodies against
+    the REST API
+    """
+
+    def setUp(self):
+        app = flask.Flask(__name__)
+        app.register_blueprint(rest)
+        self.client = app.test_client()
+
+        self.jobs = {'kj-000001': ReportJob('kj-000001'),
+                     'kj-000002': ReportJob('kj-000002')}
+        v10.submissions.update(self.jobs)
+
+    def tearDown(self):
+        for app_id in self.jobs:
+            v10.submissions.pop(app_id, None)
+
+    def test_response(self):
+        """
+        Verify that clients accepting MessagePack get the same
+        document as JSON clients
+        """
+        resp = self.client.get('/submissions/kj-000001',
+                               headers={'Accept': MSGPACK})
+        expected = self.client.get('/submissions/kj-000001',
+                                   headers={'Accept': 'application/json'})
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.mimetype, MSGPACK)
+        self.assertIn('Accept', resp.headers['Vary'])
+        body = serializer.MsgpackDeserializer().deserialize(resp.data)
+        self.assertEqual(body['body'], json.loads(expected.data))
+
+    def test_request(self):
+        """
+        Verify that MessagePack request bodies are parsed
+        """
+        body = serializer.MsgpackDictSerializer().serialize(
+            {'ids': ['kj-000001', 'kj-000002']})
+
+        resp = self.client.post('/submissions/reports', data=body,
+                                content_type=MSGPACK)
+
+        self.assertEqual(resp.status_code, 200)
+        reports = [json.loads(line) for line in resp.data.splitlines()]
+        self.assertEqual(sorted(r['report']['job_progress']
+                                for r in reports),
+                         ['kj-000001', 'kj-000002'])
+
+    def test_negotiation(self):
+        """
+        Verify that JSON is preferred when both are accepted and that
+        an unsupported content type is rejected
+        """
+        resp = self.client.get('/submissions/kj-000001', headers={
+            'Accept': 'application/json, %s' % MSGPACK})
+        self.assertEqual(resp.mimetype, 'application/json')
+
+        resp = self.client.get('/submissions/kj-000001', headers={
+            'Accept': '%s;q=0.5, application/json;q=0.1' % MSGPACK})
+        self.assertEqual(resp.mimetype, MSGPACK)
+
+        resp = self.client.get('/submissions/kj-000001',
+                               headers={'Accept': 'text/html'})
+        self.assertEqual(resp.status_code, 400)
+
+        resp = self.client.post('/submissions/reports', data=b'ids',
+                                content_type='application/xml')
+        self.assertEqual(resp.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import threading
+import unittest
+
+import flask
+
+from broker.api.v10 import rest
+from broker.service.api import v10
+from broker.tests.unit.mocks.persistence_mock import PersistenceMock
+from kubejobs import KubeJobsExecutor
+
+
+class ReportJob(KubeJobsExecutor):
+
+    def __init__(self, app_id, release=None):
+        KubeJobsExecutor.__init__(self, app_id)
+        self.db_connector = PersistenceMock()
+        self.release = release
+
+    def get_detailed_report(self):
+        if self.release is not None:
+            self.release.wait(5)
+        if self.app_id == 'kj-000003':
+            raise Exception("monitor failure")
+        return {'job_progress': self.app_id}
+
+
+class TestBatchReports(unittest.TestCase):
+    """
+    Class that represents the tests of POST /submissions/reports
+    """
+
+    def setUp(self):
+        app = flask.Flask(__name__)
+        app.register_blueprint(rest)
+        self.client = app.test_client()
+
+        self.release = threading.Event()
+        self.jobs = {
+            'kj-000001': ReportJob('kj-000001', self.release),
+            'kj-000002': ReportJob('kj-000002'),
+            'kj-000003': ReportJob('kj-000003')
+        }
+        v10.submissions.update(self.jobs)
+
+    def tearDown(self):
+        self.release.set()
+        for app_id in self.jobs:
+            v10.submissions.pop(app_id, None)
+
+    def post(self, body):
+        return self.client.post('/submissions/reports', json=body)
+
+    def test_stream_as_completed(self):
+        """
+        Verify that reports are streamed as they complete and that
+        failures are reported per submission
+        """
+        resp = self.post({'ids': ['kj-000001', 'kj-000002',
+                                  'kj-000003', 'kj-000004']})
+        lines = resp.response
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.mimetype, 'application/x-ndjson')
+
+        first = [json.loads(next(lines)) for i in range(3)]
+        self.release.set()
+        last = json.loads(next(lines))
+
+        results = dict((line['app_id'], line) for line in first)
+        self.assertEqual(results['kj-000002']['report'],
+                         {'job_progress': 'kj-000002'})
+        self.assertEqual(results['kj-000003']['error'], "monitor failure")
+        self.assertEqual(results['kj-000004']['error_name'], "BAD_REQUEST")
+        self.assertEqual(last, {'app_id': 'kj-000001',
+                                'report': {'job_progress': 'kj-000001'}})
+
+    def test_bad_selection(self):
+        """
+        Verify that a selection without ids or filter is rejected
+        """
+        self.assertEqual(self.post({}).status_code, 400)
+        self.assertEqual(self.post({'ids': 'kj-000001'}).status_code, 400)
+        self.assertEqual(self.post({'ids': [], 'max_concurrency': 'x'})
+                         .status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,248 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import bisect
+import collections
+import contextlib
+import threading
+import time
+
+
+class KeyMetadata():
+    """
+    Class that represents a mock of the metadata of an etcd key
+    """
+
+    def __init__(self, key, version):
+        self.key = key
+        self.version = version
+
+
+class Compare():
+    """
+    Class that represents a mock of a comparison of a transaction
+    """
+
+    def __init__(self, key, target):
+        self.key = key
+        self.target = target
+        self.value = None
+
+    def __eq__(self, value):
+        self.value = value
+        return self
+
+
+class Transactions():
+    """
+    Class that represents a mock of the transaction helpers of the
+    etcd client
+    """
+
+    def version(self, key):
+        return Compare(key, 'version')
+
+    def put(self, key, value):
+        return ('put', key, value)
+
+    def delete(self, key):
+        return ('delete', key, None)
+
+
+class MockEtcd3Client():
+    """
+    Class that represents a mock of the etcd3 client, keeping the
+    keys in memory. Every call waits ``latency`` seconds, as the
+    round trip to a server would.
+    """
+
+    def __init__(self, latency=0):
+        """ Constructor of the mock of an etcd3 client
+
+        Args:
+            latency (float): Representing the seconds each call takes
+
+        Returns:
+            MockEtcd3Client: The simulation of an etcd3 client
+        """
+        self.latency = latency
+        self.data = {}
+        self.versions = {}
+        self.keys = []
+        self.mutex = threading.Lock()
+        self.locks = collections.defaultdict(threading.Lock)
+        self.transactions = Transactions()
+
+    def _call(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    @staticmethod
+    def _key(key):
+        return key.encode('utf-8') if isinstance(key, str) else key
+
+    @staticmethod
+    def _value(value):
+        return value.encode('utf-8') if isinstance(value, str) else value
+
+    def _put(self, key, value):
+        if key not in self.data:
+            bisect.insort(self.keys, key)
+        self.data[key] = value
+        self.versions[key] = self.versions.get(key, 0) + 1
+
+    def _delete(self, key):
+        if self.data.pop(key, None) is None:
+            return False
+        del self.keys[bisect.bisect_left(self.keys, key)]
+        self.versions.pop(key, None)
+        return True
+
+    def put(self, key, value):
+        """ Function that simulates the storage of a key
+
+        Args:
+            key (string): Representing the key
+            value (bytes): Representing the value
+
+        Returns:
+            None
+        """
+        self._call()
+        with self.mutex:
+            self._put(self._key(key), self._value(value))
+
+    def get(self, key):
+        """ Function that simulates the read of a key
+
+        Args:
+            key (string): Representing the key
+
+        Returns:
+            tuple: Representing the value, None when the key does not
+            exist, and its metadata
+        """
+        self._call()
+        key = self._key(key)
+        with self.mutex:
+            value = self.data.get(key)
+            if value is None:
+                return None, None
+            return value, KeyMetadata(key, self.versions[key])
+
+    def _range(self, prefix):
+        start = bisect.bisect_left(self.keys, prefix)
+        end = start
+        while end < len(self.keys) and self.keys[end].startswith(prefix):
+            end += 1
+        return self.keys[start:end]
+
+    def get_prefix(self, prefix):
+        """ Function that simulates the read of the keys starting
+        with a prefix
+
+        Args:
+            prefix (string): Representing the prefix
+
+        Returns:
+            list: Representing the (value, metadata) tuples, ordered
+            by key
+        """
+        self._call()
+        with self.mutex:
+            return [(self.data[key], KeyMetadata(key, self.versions[key]))
+                    for key in self._range(self._key(prefix))]
+
+    def delete(self, key):
+        """ Function that simulates the deletion of a key
+
+        Args:
+            key (string): Representing the key
+
+        Returns:
+            bool: Representing whether the key existed
+        """
+        self._call()
+        with self.mutex:
+            return self._delete(self._key(key))
+
+    def delete_prefix(self, prefix):
+        """ Function that simulates the deletion of the keys starting
+        with a prefix
+
+        Args:
+            prefix (string): Representing the prefix
+
+        Returns:
+            None
+        """
+        self._call()
+        with self.mutex:
+            for key in self._range(self._key(prefix)):
+                self._delete(key)
+
+    def transaction(self, compare, success, failure):
+        """ Function that simulates an atomic transaction
+
+        Args:
+            compare (list): Representing the version comparisons
+            success (list): Representing the operations run when
+                            every comparison holds
+            failure (list): Representing the operations run otherwise
+
+        Returns:
+            tuple: Representing whether the comparisons held and the
+            responses of the operations
+        """
+        self._call()
+        with self.mutex:
+            succeeded = all(
+                self.versions.get(self._key(c.key), 0) == c.value
+                for c in compare)
+            for operation, key, value in (success if succeeded
+                                          else failure):
+                if operation == 'put':
+                    self._put(self._key(key), self._value(value))
+                else:
+                    self._delete(self._key(key))
+            return succeeded, []
+
+    @contextlib.contextmanager
+    def lock(self, name, ttl=60):
+        """ Function that simulates a distributed lock, held by one
+        caller at a time
+
+        Args:
+            name (string): Representing the name of the lock
+            ttl (int): Representing the lifetime of the lock
+
+        Returns:
+            contextmanager: Holding the lock while the block runs
+        """
+        self._call()
+        with self.mutex:
+            lock = self.locks[name]
+        with lock:
+            yield
+            self._call()
+
+    def size(self):
+        """ Function that counts the stored keys.
+
+        Returns:
+            int: Representing the number of keys
+        """
+        with self.mutex:
+            return len(self.data)
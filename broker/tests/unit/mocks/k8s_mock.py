@@ -13,6 +13,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import threading
+import time
+
 
 class Job():
     """
@@ -176,3 +179,112 @@ class MockKube():
         """
         sts = Status(None)
         return sts
+
+    def stream_job_logs(self, app_id, namespace="default", follow=False,
+                        limit_bytes=None, tail_lines=None,
+                        buffer_lines=1000):
+        """ Function that simulates the logs of the pods of a job.
+
+        Args:
+            app_id (string): Representing id of the application
+
+        Returns:
+            generator: Representing the (pod name, line) tuples
+            of two pods of the job
+        """
+        pods = ["%s-%s" % (app_id, suffix) for suffix in ("a", "b")]
+        lines = [(pod, "line %d" % i) for pod in pods for i in range(2)]
+        if tail_lines is not None:
+            lines = [(pod, line) for pod, line in lines
+                     if int(line.split()[1]) >= 2 - tail_lines]
+        return iter(lines)
+
+
+class MockKubeCluster(MockKube):
+    """
+    Class that represents a mock of the k8s helpers serving many jobs,
+    each one active for a fixed time after its creation
+    """
+
+    def __init__(self, job_duration=1.0):
+        """ Constructor of the mock of a cluster
+
+        Args:
+            job_duration (float): Representing the seconds a job
+                                  stays active
+
+        Returns:
+            MockKubeCluster: A mock of a cluster
+        """
+        self.job_duration = job_duration
+        self.created = {}
+        self.lock = threading.Lock()
+
+    def create_job(self, app_id, cmd, img, init_size,
+                   env_vars, config_id="",
+                   job_termination_grace_period_seconds=30, **kwargs):
+        """ Function that simulates the creation of a job
+
+        Args:
+            app_id (string): Representing id of the application
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.created[app_id] = time.monotonic()
+
+    def get_job_status(self, app_id, namespace="default"):
+        """ Function that simulates a request to job status.
+
+        Args:
+            app_id (string): Representing id of the application
+
+        Returns:
+            Status: Active until the job has run for job_duration
+            seconds, complete from then on
+
+        Raises:
+            Exception: The job does not exist
+        """
+        with self.lock:
+            created = self.created.get(app_id)
+        if created is None:
+            raise Exception("Job %s not found" % app_id)
+        if time.monotonic() - created < self.job_duration:
+            return Status(1)
+        return Status(None)
+
+    def list_job_statuses(self, namespace="default"):
+        """ Function that simulates a request to the statuses of
+        every job.
+
+        Returns:
+            dict: Representing the status of each created job by id
+        """
+        with self.lock:
+            app_ids = list(self.created)
+        return dict((app_id, self.get_job_status(app_id))
+                    for app_id in app_ids)
+
+    def terminate_job(self, app_id):
+        """ Function that simulates a termination
+        of the job.
+
+        Args:
+            app_id (string): Representing id of the application
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.created.pop(app_id, None)
+
+    def active_jobs(self):
+        """ Function that counts the jobs that were not terminated.
+
+        Returns:
+            int: Representing the number of jobs
+        """
+        with self.lock:
+            return len(self.created)
@@ -0,0 +1,740 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Simulated Kubernetes cluster that stands in for the client API used by
+broker.utils.plugins.k8s, so the real helpers and the real
+KubeJobsExecutor run against it.
+
+The cluster has nodes with cpu, memory and pod capacity. A pod waits
+``scheduling_latency`` seconds before it is bound to the least allocated
+node it fits in, then for its image to be pulled on that node, once per
+node and image, and for its container to start. The running pods of a
+job drain the work queue the executor filled in the Redis of the job,
+``drain_rate`` items per second each, and the job completes once the
+queue is empty. Every change of a job or a pod is sent to the watchers.
+"""
+
+import collections
+import contextlib
+import datetime
+import itertools
+import queue
+import random
+import string
+import threading
+import time
+from unittest import mock
+
+import kubernetes as kube
+import redis
+
+from broker.tests.unit.mocks.redis_mock import MockRedis
+from broker.utils import metrics
+
+QUANTITY_SUFFIXES = collections.OrderedDict([
+    ('Ki', 2 ** 10), ('Mi', 2 ** 20), ('Gi', 2 ** 30), ('Ti', 2 ** 40),
+    ('m', 1e-3), ('k', 1e3), ('M', 1e6), ('G', 1e9), ('T', 1e12)])
+
+DEFAULT_REQUESTS = {'cpu': '100m', 'memory': '128Mi'}
+
+FINISHED_PHASES = ('Succeeded', 'Failed')
+
+
+def parse_quantity(value):
+    """ Converts a Kubernetes quantity, like '500m' or '2Gi', to a
+    number of cores or bytes.
+    """
+    value = str(value)
+    for suffix, factor in QUANTITY_SUFFIXES.items():
+        if value.endswith(suffix):
+            return float(value[:-len(suffix)]) * factor
+    return float(value)
+
+
+def _field(obj, name):
+    """ Reads ``name`` from a request body, given either as a dict or
+    as a client model.
+    """
+    if obj is None:
+        return None
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
+
+def _parse_selector(selector):
+    if not selector:
+        return {}
+    return dict(term.split('=', 1) for term in selector.split(','))
+
+
+def _not_found(kind, name):
+    return kube.client.rest.ApiException(
+        status=404, reason='%s "%s" not found' % (kind, name))
+
+
+class Resource(object):
+    """ Plain object with the attributes of a Kubernetes API model. """
+
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+class SimulatedNode(object):
+
+    def __init__(self, name, cpu, memory, max_pods, address):
+        self.name = name
+        self.cpu = cpu
+        self.memory = memory
+        self.max_pods = max_pods
+        self.address = address
+        self.allocated_cpu = 0.0
+        self.allocated_memory = 0.0
+        self.pods = 0
+        # image -> time its pull ends
+        self.images = {}
+
+    def fits(self, pod):
+        return (self.pods < self.max_pods and
+                self.allocated_cpu + pod.cpu <= self.cpu and
+                self.allocated_memory + pod.memory <= self.memory)
+
+    def bind(self, pod):
+        self.allocated_cpu += pod.cpu
+        self.allocated_memory += pod.memory
+        self.pods += 1
+
+    def release(self, pod):
+        self.allocated_cpu -= pod.cpu
+        self.allocated_memory -= pod.memory
+        self.pods -= 1
+
+
+class SimulatedPod(object):
+
+    def __init__(self, name, namespace, labels, image, cpu, memory,
+                 created, job=None):
+        self.name = name
+        self.namespace = namespace
+        self.labels = labels
+        self.image = image
+        self.cpu = cpu
+        self.memory = memory
+        self.created = created
+        self.job = job
+        self.phase = 'Pending'
+        self.node = None
+        self.ready_at = None
+        self.started = None
+        self.processed = 0
+
+
+class SimulatedJob(object):
+
+    def __init__(self, name, namespace, labels, parallelism, created):
+        self.name = name
+        self.namespace = namespace
+        self.labels = labels
+        self.parallelism = parallelism
+        self.created = created
+        self.pods = []
+        self.started = None
+        self.completed = None
+        self.credit = 0.0
+
+
+class SimulatedRedis(MockRedis):
+    """ Redis of a job, reachable once the pod behind its service runs.
+    """
+
+    def __init__(self, cluster, app):
+        MockRedis.__init__(self)
+        self.cluster = cluster
+        self.app = app
+
+    def info(self):
+        if not self.cluster.running({'app': self.app}):
+            raise redis.exceptions.ConnectionError(
+                "%s is not running" % self.app)
+        return {'loading': 0}
+
+    def llen(self, queue_name):
+        return len(self.map.get(queue_name, []))
+
+
+class SimulatedLogResponse(object):
+
+    def __init__(self, data):
+        self.data = data
+
+    def stream(self, amt):
+        for start in range(0, len(self.data), amt):
+            yield self.data[start:start + amt]
+
+    def release_conn(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class SimulatedApi(object):
+    """ Methods of BatchV1Api and CoreV1Api used by the manager, served
+    by a :class:`SimulatedCluster`.
+    """
+
+    def __init__(self, cluster):
+        self.cluster = cluster
+
+    def create_namespaced_job(self, namespace, body, **kwargs):
+        return self.cluster.create_job(namespace, body)
+
+    def read_namespaced_job_status(self, name, namespace, **kwargs):
+        return self.cluster.read_job(name, namespace)
+
+    read_namespaced_job = read_namespaced_job_status
+
+    def list_namespaced_job(self, namespace, label_selector=None,
+                            **kwargs):
+        return self.cluster.list_jobs(namespace, label_selector)
+
+    def delete_namespaced_job(self, name, namespace, body=None, **kwargs):
+        self.cluster.delete_job(name, namespace)
+
+    def create_namespaced_pod(self, namespace, body, **kwargs):
+        return self.cluster.create_pod(namespace, body)
+
+    def read_namespaced_pod_status(self, name, namespace, **kwargs):
+        return self.cluster.read_pod(name, namespace)
+
+    read_namespaced_pod = read_namespaced_pod_status
+
+    def list_namespaced_pod(self, namespace, label_selector=None,
+                            **kwargs):
+        return self.cluster.list_pods(namespace, label_selector)
+
+    def delete_namespaced_pod(self, name, namespace, body=None, **kwargs):
+        self.cluster.delete_pod(name, namespace)
+
+    def read_namespaced_pod_log(self, name, namespace, tail_lines=None,
+                                **kwargs):
+        return self.cluster.pod_log(name, namespace, tail_lines)
+
+    def create_namespaced_service(self, namespace, body, **kwargs):
+        return self.cluster.create_service(namespace, body)
+
+    def delete_namespaced_service(self, name, namespace, body=None,
+                                  **kwargs):
+        self.cluster.delete_service(name, namespace)
+
+    def list_node(self, **kwargs):
+        return self.cluster.list_nodes()
+
+
+class SimulatedWatch(object):
+    """ Stand-in of kubernetes.watch.Watch over a simulated cluster.
+    """
+
+    def __init__(self, cluster):
+        self.cluster = cluster
+        self._stopped = threading.Event()
+
+    def stop(self):
+        self._stopped.set()
+
+    def stream(self, func, *args, **kwargs):
+        """ Yields the objects listed by ``func`` as ADDED events, then
+        the events of the jobs or pods it lists until :meth:`stop` is
+        called or ``timeout_seconds`` pass.
+        """
+        kind = 'job' if 'job' in func.__name__ else 'pod'
+        selector = _parse_selector(kwargs.get('label_selector'))
+        timeout = kwargs.get('timeout_seconds')
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        events = self.cluster.subscribe()
+        try:
+            for item in func(*args, **kwargs).items:
+                yield {'type': 'ADDED', 'object': item}
+            while not self._stopped.is_set():
+                if deadline is not None and time.monotonic() >= deadline:
+                    return
+                try:
+                    event_kind, event = events.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                labels = event['object'].metadata.labels or {}
+                if event_kind == kind and all(
+                        labels.get(k) == v for k, v in selector.items()):
+                    yield event
+        finally:
+            self.cluster.unsubscribe(events)
+
+
+class SimulatedCluster(object):
+    """ In-process Kubernetes cluster for capacity planning.
+
+    The simulation advances on :meth:`advance`, called every
+    ``tick_interval`` seconds by the thread started with :meth:`start`,
+    or only by hand, with a fake ``clock``, when ``tick_interval`` is
+    None. :meth:`patch` puts the cluster in place of the Kubernetes
+    client and of Redis.
+    """
+
+    def __init__(self, nodes=3, node_cpu='4', node_memory='16Gi',
+                 max_pods=110, scheduling_latency=0.05,
+                 image_pull_seconds=5.0, container_start_seconds=1.0,
+                 drain_rate=10.0, default_requests=None,
+                 tick_interval=0.05, clock=time.monotonic, seed=0):
+        self.nodes = [SimulatedNode('node-%d' % i, parse_quantity(node_cpu),
+                                    parse_quantity(node_memory), max_pods,
+                                    '10.0.0.%d' % (i + 1))
+                      for i in range(nodes)]
+        self.scheduling_latency = scheduling_latency
+        self.image_pull_seconds = image_pull_seconds
+        self.container_start_seconds = container_start_seconds
+        self.drain_rate = drain_rate
+        self.default_requests = default_requests or DEFAULT_REQUESTS
+        self.tick_interval = tick_interval
+        self.clock = clock
+        self.random = random.Random(seed)
+
+        self.lock = threading.RLock()
+        self.jobs = {}
+        self.pods = {}
+        self.services = {}
+        self.stores = {}
+        self.node_ports = {}
+        self.pending = collections.deque()
+        self.starting = []
+        self._ports = itertools.count(30000)
+        self._subscribers = []
+        self._last = clock()
+        self._origin = (clock(), datetime.datetime.now())
+        self._ticker = None
+        self._stop = threading.Event()
+
+        self.image_pulls = 0
+        self.completed_jobs = 0
+        self.peak_pending = 0
+        self.scheduling_delays = []
+        self.startup_delays = []
+
+    # -- simulation --
+
+    def advance(self, now=None):
+        """ Moves the simulation to ``now``: binds the pending pods that
+        fit, starts the pods whose images are ready, drains the work
+        queues and completes the jobs whose queue is empty.
+        """
+        with self.lock:
+            now = self.clock() if now is None else now
+            elapsed, self._last = max(now - self._last, 0), now
+            self._schedule(now)
+            self._start_containers(now)
+            self._drain(now, elapsed)
+            self.peak_pending = max(self.peak_pending, len(self.pending))
+
+    def _schedule(self, now):
+        waiting = collections.deque()
+        while self.pending:
+            pod = self.pending.popleft()
+            if pod.name not in self.pods:
+                continue
+            node = None
+            if now - pod.created >= self.scheduling_latency:
+                fitting = [n for n in self.nodes if n.fits(pod)]
+                if fitting:
+                    node = min(fitting,
+                               key=lambda n: n.allocated_cpu / n.cpu)
+            if node is None:
+                waiting.append(pod)
+                continue
+
+            node.bind(pod)
+            pod.node = node
+            pulled = node.images.get(pod.image)
+            if pulled is None:
+                pulled = node.images[pod.image] = \
+                    now + self.image_pull_seconds
+                self.image_pulls += 1
+            pod.ready_at = max(now, pulled) + self.container_start_seconds
+            self.scheduling_delays.append(now - pod.created)
+            self.starting.append(pod)
+            self._emit('pod', 'MODIFIED', pod)
+        self.pending = waiting
+
+    def _start_containers(self, now):
+        starting = []
+        for pod in self.starting:
+            if pod.name not in self.pods:
+                continue
+            if pod.ready_at > now:
+                starting.append(pod)
+                continue
+            pod.phase = 'Running'
+            pod.started = now
+            self.startup_delays.append(now - pod.created)
+            job = self.jobs.get(pod.job)
+            if job is not None and job.started is None:
+                job.started = now
+            self._emit('pod', 'MODIFIED', pod)
+        self.starting = starting
+
+    def _drain(self, now, elapsed):
+        for job in self.jobs.values():
+            if job.completed is not None:
+                continue
+            pods = [self.pods[name] for name in job.pods
+                    if name in self.pods]
+            running = [pod for pod in pods if pod.phase == 'Running']
+            if not running:
+                continue
+
+            store = self.stores.get('redis-%s' % job.name)
+            items = store.map.get('job', []) if store is not None else []
+            # a pod drains only from the moment it started
+            since = now - elapsed
+            job.credit += self.drain_rate * sum(
+                now - max(pod.started, since) for pod in running)
+            taken = min(int(job.credit), len(items))
+            job.credit -= int(job.credit)
+            del items[:taken]
+            share, extra = divmod(taken, len(running))
+            for i, pod in enumerate(running):
+                pod.processed += share + (1 if i < extra else 0)
+
+            if items:
+                continue
+            # the queue is empty, so the workers exit
+            for pod in running:
+                pod.phase = 'Succeeded'
+                pod.node.release(pod)
+                self._emit('pod', 'MODIFIED', pod)
+            if all(pod.phase in FINISHED_PHASES for pod in pods):
+                job.completed = now
+                self.completed_jobs += 1
+                self._emit('job', 'MODIFIED', job)
+
+    def start(self):
+        """ Advances the simulation from a thread every
+        ``tick_interval`` seconds until :meth:`stop`.
+        """
+        self._stop.clear()
+
+        def tick():
+            while not self._stop.wait(self.tick_interval):
+                self.advance()
+
+        self._ticker = threading.Thread(target=tick, name='k8s-simulator')
+        self._ticker.daemon = True
+        self._ticker.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._ticker is not None:
+            self._ticker.join()
+            self._ticker = None
+
+    @contextlib.contextmanager
+    def patch(self):
+        """ Serves the Kubernetes client, its watches and Redis from
+        this cluster while the block runs, advancing the simulation
+        from a thread unless it was started already or is advanced by
+        hand.
+        """
+        api = SimulatedApi(self)
+        patches = [
+            mock.patch.object(kube.config, 'load_kube_config'),
+            mock.patch.object(kube.client, 'BatchV1Api', return_value=api),
+            mock.patch.object(kube.client, 'CoreV1Api', return_value=api),
+            mock.patch.object(kube.watch, 'Watch',
+                              lambda: SimulatedWatch(self)),
+            mock.patch.object(redis, 'StrictRedis', self.redis_client)]
+        started = self._ticker is None and self.tick_interval is not None
+        with contextlib.ExitStack() as stack:
+            for patch in patches:
+                stack.enter_context(patch)
+            if started:
+                self.start()
+            try:
+                yield api
+            finally:
+                if started:
+                    self.stop()
+
+    # -- watches --
+
+    def subscribe(self):
+        events = queue.Queue()
+        with self.lock:
+            self._subscribers.append(events)
+        return events
+
+    def unsubscribe(self, events):
+        with self.lock:
+            self._subscribers.remove(events)
+
+    def _emit(self, kind, event_type, obj):
+        if not self._subscribers:
+            return
+        snapshot = self._job_model(obj) if kind == 'job' \
+            else self._pod_model(obj)
+        for events in self._subscribers:
+            events.put((kind, {'type': event_type, 'object': snapshot}))
+
+    # -- API --
+
+    def create_job(self, namespace, body):
+        metadata = _field(body, 'metadata')
+        spec = _field(body, 'spec')
+        template = _field(_field(spec, 'template'), 'spec')
+        container = _field(template, 'containers')[0]
+        name = _field(metadata, 'name')
+        requests = _field(_field(container, 'resources'), 'requests')
+
+        with self.lock:
+            if name in self.jobs:
+                raise kube.client.rest.ApiException(
+                    status=409, reason='job "%s" already exists' % name)
+            now = self.clock()
+            job = SimulatedJob(name, namespace,
+                               dict(_field(metadata, 'labels') or {}),
+                               _field(spec, 'parallelism') or 1, now)
+            self.jobs[name] = job
+            self._emit('job', 'ADDED', job)
+            for _ in range(job.parallelism):
+                pod_name = '%s-%s' % (name, ''.join(self.random.choice(
+                    string.ascii_lowercase + string.digits)
+                    for _ in range(5)))
+                job.pods.append(pod_name)
+                self._add_pod(pod_name, namespace, {'job-name': name},
+                              _field(container, 'image'), requests, name)
+            return self._job_model(job)
+
+    def create_pod(self, namespace, body):
+        metadata = _field(body, 'metadata')
+        container = _field(_field(body, 'spec'), 'containers')[0]
+        requests = _field(_field(container, 'resources'), 'requests')
+        name = _field(metadata, 'name')
+        with self.lock:
+            if name in self.pods:
+                raise kube.client.rest.ApiException(
+                    status=409, reason='pod "%s" already exists' % name)
+            pod = self._add_pod(name, namespace,
+                                dict(_field(metadata, 'labels') or {}),
+                                _field(container, 'image'), requests)
+            return self._pod_model(pod)
+
+    def _add_pod(self, name, namespace, labels, image, requests, job=None):
+        requests = requests or self.default_requests
+        pod = SimulatedPod(name, namespace, labels, image,
+                           parse_quantity(requests.get('cpu', 0)),
+                           parse_quantity(requests.get('memory', 0)),
+                           self.clock(), job)
+        self.pods[name] = pod
+        self.pending.append(pod)
+        self._emit('pod', 'ADDED', pod)
+        return pod
+
+    def create_service(self, namespace, body):
+        metadata = _field(body, 'metadata')
+        spec = _field(body, 'spec')
+        name = _field(metadata, 'name')
+        selector = dict(_field(spec, 'selector') or {})
+        with self.lock:
+            if name in self.services:
+                raise kube.client.rest.ApiException(
+                    status=409, reason='service "%s" already exists' % name)
+            port = _field(_field(spec, 'ports')[0], 'port')
+            node_port = next(self._ports)
+            service = Resource(
+                metadata=Resource(name=name, namespace=namespace,
+                                  labels=_field(metadata, 'labels')),
+                spec=Resource(selector=selector,
+                              type=_field(spec, 'type'),
+                              ports=[Resource(port=port,
+                                              node_port=node_port)]))
+            self.services[name] = service
+            self.node_ports[node_port] = name
+            self.stores[name] = SimulatedRedis(self, selector.get('app'))
+            return service
+
+    def read_job(self, name, namespace):
+        with self.lock:
+            job = self.jobs.get(name)
+            if job is None:
+                raise _not_found('job', name)
+            return self._job_model(job)
+
+    def read_pod(self, name, namespace):
+        with self.lock:
+            pod = self.pods.get(name)
+            if pod is None:
+                raise _not_found('pod', name)
+            return self._pod_model(pod)
+
+    def list_jobs(self, namespace, label_selector=None):
+        selector = _parse_selector(label_selector)
+        with self.lock:
+            return Resource(items=[
+                self._job_model(job) for job in self.jobs.values()
+                if job.namespace == namespace and all(
+                    job.labels.get(k) == v for k, v in selector.items())])
+
+    def list_pods(self, namespace, label_selector=None):
+        selector = _parse_selector(label_selector)
+        with self.lock:
+            return Resource(items=[
+                self._pod_model(pod) for pod in self.pods.values()
+                if pod.namespace == namespace and all(
+                    pod.labels.get(k) == v for k, v in selector.items())])
+
+    def list_nodes(self):
+        ready = [Resource(type='Ready', status='True')]
+        return Resource(items=[
+            Resource(metadata=Resource(name=node.name),
+                     status=Resource(conditions=ready, addresses=[
+                         Resource(type='InternalIP',
+                                  address=node.address)]))
+            for node in self.nodes])
+
+    def running(self, labels):
+        """ Whether a pod with ``labels`` is running. """
+        with self.lock:
+            return any(pod.phase == 'Running' and all(
+                pod.labels.get(k) == v for k, v in labels.items())
+                for pod in self.pods.values())
+
+    def delete_job(self, name, namespace):
+        with self.lock:
+            job = self.jobs.pop(name, None)
+            if job is None:
+                raise _not_found('job', name)
+            for pod_name in job.pods:
+                if pod_name in self.pods:
+                    self.delete_pod(pod_name, namespace)
+            self._emit('job', 'DELETED', job)
+
+    def delete_pod(self, name, namespace):
+        with self.lock:
+            pod = self.pods.pop(name, None)
+            if pod is None:
+                raise _not_found('pod', name)
+            if pod.node is not None and pod.phase not in FINISHED_PHASES:
+                pod.node.release(pod)
+            self._emit('pod', 'DELETED', pod)
+
+    def delete_service(self, name, namespace):
+        with self.lock:
+            service = self.services.pop(name, None)
+            if service is None:
+                raise _not_found('service', name)
+            self.node_ports.pop(service.spec.ports[0].node_port, None)
+            self.stores.pop(name, None)
+
+    def pod_log(self, name, namespace, tail_lines=None):
+        with self.lock:
+            pod = self.pods.get(name)
+            if pod is None:
+                raise _not_found('pod', name)
+            first = 0 if tail_lines is None \
+                else max(pod.processed - tail_lines, 0)
+            lines = ['processed item %d\n' % i
+                     for i in range(first, pod.processed)]
+        return SimulatedLogResponse(''.join(lines).encode('utf-8'))
+
+    def redis_client(self, host=None, port=None, **kwargs):
+        """ Stand-in of redis.StrictRedis, connected to the Redis of
+        the service exposed on the node port ``port``.
+        """
+        with self.lock:
+            store = self.stores.get(self.node_ports.get(port))
+        if store is None:
+            return SimulatedRedis(self, None)
+        return store
+
+    # -- models --
+
+    def _time(self, value):
+        if value is None:
+            return None
+        clock, wall = self._origin
+        return wall + datetime.timedelta(seconds=value - clock)
+
+    def _job_model(self, job):
+        pods = [self.pods[name] for name in job.pods if name in self.pods]
+        active = sum(1 for pod in pods if pod.phase not in FINISHED_PHASES)
+        succeeded = sum(1 for pod in pods if pod.phase == 'Succeeded')
+        conditions = None
+        if job.completed is not None:
+            conditions = [Resource(type='Complete', status='True')]
+        return Resource(
+            metadata=Resource(name=job.name, namespace=job.namespace,
+                              labels=dict(job.labels)),
+            spec=Resource(parallelism=job.parallelism),
+            status=Resource(active=active or None,
+                            succeeded=succeeded or None,
+                            failed=None,
+                            conditions=conditions,
+                            start_time=self._time(job.started),
+                            completion_time=self._time(job.completed)))
+
+    def _pod_model(self, pod):
+        labels = dict(pod.labels)
+        return Resource(
+            metadata=Resource(name=pod.name, namespace=pod.namespace,
+                              labels=labels),
+            spec=Resource(node_name=pod.node.name if pod.node else None),
+            status=Resource(phase=pod.phase,
+                            start_time=self._time(pod.started)))
+
+    # -- reports --
+
+    def active_jobs(self):
+        """ Number of jobs that were not deleted. """
+        with self.lock:
+            return len(self.jobs)
+
+    def stats(self):
+        """ Summary of the simulation: pods by phase, the pending and
+        running jobs, the allocation of the nodes and the delays to
+        bind and start the pods.
+        """
+        with self.lock:
+            phases = collections.Counter(pod.phase
+                                         for pod in self.pods.values())
+            cpu = sum(node.cpu for node in self.nodes)
+            memory = sum(node.memory for node in self.nodes)
+            summary = {
+                'nodes': len(self.nodes),
+                'pods': dict(phases),
+                'unscheduled_pods': len(self.pending),
+                'peak_unscheduled_pods': self.peak_pending,
+                'jobs': len(self.jobs),
+                'completed_jobs': self.completed_jobs,
+                'image_pulls': self.image_pulls,
+                'cpu_allocated': round(sum(
+                    node.allocated_cpu for node in self.nodes) / cpu, 6),
+                'memory_allocated': round(sum(
+                    node.allocated_memory for node in self.nodes) / memory,
+                    6)}
+            for name, delays in (('scheduling', self.scheduling_delays),
+                                 ('startup', self.startup_delays)):
+                for q in (50, 95, 99):
+                    summary['%s_p%d' % (name, q)] = \
+                        metrics.percentile(delays, q)
+            return summary
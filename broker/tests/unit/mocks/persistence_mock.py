@@ -18,14 +18,23 @@ from broker.persistence.persistence_interface import PersistenceInterface
 
 class PersistenceMock(PersistenceInterface):
 
+    def __init__(self):
+        self.reports = {}
+
     def put(self, app_id, state):
         pass
 
+    def put_report(self, app_id, report):
+        self.reports.setdefault(app_id, report)
+
+    def get_report(self, app_id):
+        return self.reports.get(app_id)
+
     def get(self, app_id):
         pass
 
     def get_finished_jobs(self):
-        pass
+        return {}
 
     def delete(self, app_id):
         pass
@@ -34,4 +43,8 @@ class PersistenceMock(PersistenceInterface):
         pass
 
     def get_all(self, prefix="kj-"):
-        pass
+        return {}
+
+    def query(self, status=None, plugin=None, since=None, until=None,
+              after=None, limit=None):
+        return []
@@ -76,3 +76,31 @@ class MockRedis():
 
     def delete(self, queue_name):
         self.map.pop(queue_name)
+
+    """ Function the simulates the check of the connection
+        to redis
+
+    Returns:
+        bool: Representing that the server answered
+    """
+
+    def ping(self):
+        return True
+
+    """ Function the simulates the read of a range of a
+        redis queue
+
+    Args:
+        queue_name (string): Representing the name of the queue
+        start (int): Representing the first index
+        end (int): Representing the last index, inclusive
+
+    Returns:
+        list: Representing the items in the range
+    """
+
+    def lrange(self, queue_name, start, end):
+        items = self.map.get(queue_name, [])
+        if end == -1:
+            return items[start:]
+        return items[start:end + 1]
@@ -0,0 +1,80 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+import unittest
+from unittest import mock
+
+import dill
+
+from broker.persistence.etcd_db import plugin as etcd
+from broker.tests.unit.mocks.etcd_mock import MockEtcd3Client
+
+
+class JobStub(object):
+    """
+    Class that represents the persisted state of a job
+    """
+
+    def __init__(self, status, starting_time=None, plugin='kubejobs'):
+        self.status = status
+        self.starting_time = starting_time
+        self.plugin = plugin
+        self.del_resources_authorization = False
+
+
+class TestEtcd3JobPersistence(unittest.TestCase):
+
+    def setUp(self):
+        self.client = MockEtcd3Client()
+        with mock.patch.object(etcd.etcd3, 'client',
+                               return_value=self.client):
+            self.persistence = etcd.Etcd3JobPersistence('localhost', 2379)
+
+        self.now = datetime.datetime(2019, 6, 1, 12, 0, 0)
+        self.persistence.put('kj-000001', JobStub('completed', self.now))
+
+    def tearDown(self):
+        pass
+
+    def test_query_status(self):
+        """
+        Verify that the jobs are filtered by their metadata records
+        """
+        self.persistence.put('kj-000002', JobStub('ongoing', self.now))
+
+        self.assertEqual(self.persistence.query(status=['ongoing']),
+                         ['kj-000002'])
+
+    def test_metadata_added_on_load(self):
+        """
+        Verify that loading the jobs stored before the metadata records
+        existed writes their records, so queries match them
+        """
+        self.client.put('kj-000002', dill.dumps(JobStub('ongoing',
+                                                        self.now)))
+        self.assertEqual(self.persistence.query(status=['ongoing']), [])
+
+        jobs = self.persistence.get_all()
+
+        self.assertEqual(len(jobs), 2)
+        self.assertEqual(self.persistence.query(status=['ongoing']),
+                         ['kj-000002'])
+        self.assertEqual(self.persistence.query(since=self.now),
+                         ['kj-000001', 'kj-000002'])
+
+
+if __name__ == '__main__':
+    unittest.main()
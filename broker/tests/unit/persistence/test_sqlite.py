@@ -0,0 +1,114 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+import unittest
+
+import peewee
+
+from broker.persistence.sqlite.model import JobReport, JobState
+from broker.persistence.sqlite.plugin import SqliteJobPersistence
+
+
+class JobStub(object):
+    """
+    Class that represents the persisted state of a job
+    """
+
+    def __init__(self, status, starting_time=None, plugin='kubejobs'):
+        self.status = status
+        self.starting_time = starting_time
+        self.plugin = plugin
+        self.del_resources_authorization = False
+
+
+class TestSqliteJobPersistence(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Bind the job model to an in-memory database
+        """
+        self.database = peewee.SqliteDatabase(':memory:')
+        self.binding = self.database.bind_ctx([JobState, JobReport])
+        self.binding.__enter__()
+        self.persistence = SqliteJobPersistence()
+
+        self.now = datetime.datetime(2019, 6, 1, 12, 0, 0)
+        self.persistence.put('kj-000001', JobStub('completed', self.now))
+        self.persistence.put('kj-000002', JobStub('ongoing', self.now))
+        self.persistence.put('kj-000003', JobStub(
+            'ongoing', self.now + datetime.timedelta(days=1)))
+        self.persistence.put('kj-000004', JobStub('created'))
+
+    def tearDown(self):
+        self.binding.__exit__(None, None, None)
+        self.database.close()
+
+    def test_query_status(self):
+        """
+        Verify that jobs are filtered by their latest persisted state
+        """
+        self.assertEqual(self.persistence.query(status=['ongoing']),
+                         ['kj-000002', 'kj-000003'])
+
+        self.persistence.put('kj-000002', JobStub('completed', self.now))
+        self.assertEqual(self.persistence.query(status=['ongoing']),
+                         ['kj-000003'])
+
+    def test_query_time_range(self):
+        """
+        Verify that jobs are filtered by starting time
+        """
+        self.assertEqual(self.persistence.query(
+            since=self.now + datetime.timedelta(hours=1)), ['kj-000003'])
+        self.assertEqual(self.persistence.query(until=self.now),
+                         ['kj-000001', 'kj-000002'])
+
+    def test_query_plugin(self):
+        """
+        Verify that jobs are filtered by plugin
+        """
+        self.assertEqual(len(self.persistence.query(plugin=['kubejobs'])), 4)
+        self.assertEqual(self.persistence.query(plugin=['other']), [])
+
+    def test_query_pagination(self):
+        """
+        Verify that pages are contiguous and ordered by id
+        """
+        first = self.persistence.query(limit=2)
+        second = self.persistence.query(after=first[-1], limit=2)
+
+        self.assertEqual(first, ['kj-000001', 'kj-000002'])
+        self.assertEqual(second, ['kj-000003', 'kj-000004'])
+
+    def test_report(self):
+        """
+        Verify that final reports are stored once and deleted
+        with their job
+        """
+        report = {'summary': {'final_replicas': 2},
+                  'detailed': {'job_progress': [0.5, 1.0]}}
+        self.assertIsNone(self.persistence.get_report('kj-000001'))
+
+        self.persistence.put_report('kj-000001', report)
+        self.persistence.put_report('kj-000001', {'summary': {}})
+        self.assertEqual(self.persistence.get_report('kj-000001'), report)
+
+        self.persistence.delete('kj-000001')
+        self.assertIsNone(self.persistence.get_report('kj-000001'))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -13,17 +13,23 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
 import copy
 import json
+import threading
+import requests
 import requests_mock
 import unittest
 import datetime
+from unittest import mock
 
 from broker import exceptions as ex
 from kubejobs import KubeJobsExecutor
 from kubejobs import KubeJobsProvider
 from broker.service import api
-from broker.tests.unit.mocks.k8s_mock import MockKube
+from broker.service import versions
+from broker.service.api import v10
+from broker.tests.unit.mocks.k8s_mock import MockKube, Status
 from broker.tests.unit.mocks.persistence_mock import PersistenceMock
 from broker.tests.unit.mocks.redis_mock import MockRedis
 from broker.persistence.sqlite import plugin as sqlite
@@ -82,6 +88,54 @@ class TestKubeJobsPlugin(unittest.TestCase):
         self.assertTrue(isinstance(self.job1.get_db_connector(),
                                    sqlite.SqliteJobPersistence))
 
+    def test_synchronize_statuses(self):
+        """
+        Verify that synchronize reads the listed statuses instead of
+        requesting the status of the job, and that a job missing from
+        them is not found
+        """
+        self.job1.k8s = None
+        self.job1.update_application_state('created')
+        self.job1.synchronize({self.job_id1: Status(1)})
+        self.assertEqual(self.job1.get_application_state(), 'ongoing')
+
+        self.job1.synchronize({self.job_id2: Status(1)})
+        self.assertEqual(self.job1.get_application_state(), 'not found')
+        self.assertTrue(self.job1.terminated)
+
+    def test_update_state_reindexed(self):
+        """
+        Verify that the submissions index follows a state change even
+        when persisting the job fails
+        """
+        def fail(app_id, job):
+            raise Exception('database is locked')
+
+        v10.submissions[self.job_id1] = self.job1
+        self.addCleanup(v10.submissions.pop, self.job_id1, None)
+        self.job1.db_connector.put = fail
+
+        self.assertRaises(Exception,
+                          self.job1.update_application_state, 'ongoing')
+
+        self.assertIn(self.job_id1, v10.submissions.ids(state='ongoing'))
+        self.assertNotIn(self.job_id1, v10.submissions.ids(state='created'))
+
+    def test_synchronize_unchanged(self):
+        """
+        Verify that synchronizing a job whose state did not change
+        neither persists it nor bumps its version
+        """
+        self.job1.k8s = None
+        self.job1.synchronize({})
+        version = versions.SUBMISSIONS.version(self.job_id1)
+
+        self.job1.synchronize({})
+        self.job1.status = 'failed'
+        self.job1.synchronize({})
+
+        self.assertEqual(versions.SUBMISSIONS.version(self.job_id1), version)
+
     def test_get_workload(self):
         """
         Verify that the workload has been pulled correctly
@@ -287,6 +341,96 @@ class TestKubeJobsPlugin(unittest.TestCase):
 
             self.job1.delete_job_resources()
 
+    def test_delete_job_resources_partial_failure(self):
+        """
+        Verify that a failed teardown step does not stop the others
+        and that only the failed steps are retried
+        """
+        self.job1.del_resources_authorization = True
+        stop_monitor = api.monitor_url + '/monitoring/' + \
+            self.job_id1 + '/stop'
+        stop_controller = api.controller_url + '/scaling/' + \
+            self.job_id1 + '/stop'
+        with requests_mock.Mocker() as m:
+            m.put(stop_monitor, text="")
+            m.put(stop_controller, exc=requests.exceptions.ConnectTimeout)
+            failures = self.job1.delete_job_resources()
+
+            self.assertEqual(list(failures), ['controller'])
+            self.assertEqual(self.job1.cleanup_failures, failures)
+            self.assertTrue(self.job1.del_resources_authorization)
+
+            m.put(stop_controller, text="")
+            self.assertEqual(self.job1.delete_job_resources(), {})
+            self.assertFalse(self.job1.del_resources_authorization)
+            self.assertEqual(sorted(r.url for r in m.request_history),
+                             sorted([stop_monitor, stop_controller,
+                                     stop_controller]))
+
+    def test_delete_job_resources_error_status(self):
+        """
+        Verify that a service answering with an error status fails its
+        teardown step, which is then retried
+        """
+        self.job1.del_resources_authorization = True
+        stop_monitor = api.monitor_url + '/monitoring/' + \
+            self.job_id1 + '/stop'
+        stop_controller = api.controller_url + '/scaling/' + \
+            self.job_id1 + '/stop'
+        with requests_mock.Mocker() as m:
+            m.put(stop_monitor, status_code=500, text="")
+            m.put(stop_controller, text="")
+            failures = self.job1.delete_job_resources()
+
+            self.assertEqual(list(failures), ['monitor'])
+            self.assertIn('500', failures['monitor'])
+            self.assertTrue(self.job1.del_resources_authorization)
+
+            m.put(stop_monitor, text="")
+            self.assertEqual(self.job1.delete_job_resources(), {})
+            self.assertFalse(self.job1.del_resources_authorization)
+
+    def test_delete_job_resources_already_released(self):
+        """
+        Verify that a component that doesn't know the job anymore, or
+        the monitor answering that it doesn't monitor it, counts as
+        released
+        """
+        self.job1.del_resources_authorization = True
+        with requests_mock.Mocker() as m:
+            m.put(api.monitor_url + '/monitoring/' + self.job_id1 + '/stop',
+                  status_code=400,
+                  text='{"error": "Application not being monitored"}')
+            m.put(api.controller_url + '/scaling/' + self.job_id1 + '/stop',
+                  status_code=404, text="")
+
+            self.assertEqual(self.job1.delete_job_resources(), {})
+            self.assertFalse(self.job1.del_resources_authorization)
+
+    def test_delete_job_resources_in_flight(self):
+        """
+        Verify that a step still running after its timeout is waited
+        for again by the retry instead of being started twice
+        """
+        release = threading.Event()
+        calls = []
+
+        def stop():
+            calls.append('monitor')
+            release.wait(5)
+
+        self.job1.teardown_steps = lambda: collections.OrderedDict(
+            [('monitor', stop)])
+        with mock.patch.object(api, 'teardown_timeout', 0.05):
+            failures = self.job1.delete_job_resources()
+            self.assertEqual(list(failures), ['monitor'])
+
+            release.set()
+            self.assertEqual(self.job1.delete_job_resources(), {})
+
+        self.assertEqual(calls, ['monitor'])
+        self.assertEqual(self.job1.teardown_futures, {})
+
     def test_get_update_application_state(self):
         """
         Test the Get and Update Application State of
@@ -404,6 +548,20 @@ class TestKubeJobsPlugin(unittest.TestCase):
 
         self.assertEqual(self.job1.report, json.loads(response))
 
+    def test_get_report_breaker_open(self):
+        """
+        Verify that the report is not polled again while the breaker
+        of the monitor is open
+        """
+        self.job1.data = {'monitor_info': {}, 'monitor_plugin': 'kubejobs'}
+        unavailable = ex.ServiceUnavailableException('monitor', 30)
+        with mock.patch('kubejobs.monitor.get_job_report',
+                        side_effect=unavailable) as get_job_report:
+            self.assertEqual(self.job1.get_report(), -1)
+
+        self.assertEqual(get_job_report.call_count, 1)
+        self.assertEqual(self.job1.report, {'message': unavailable.message})
+
     def test_get_detailed_report(self):
 
         response = json.dumps({'final_error': 0,
@@ -435,6 +593,68 @@ class TestKubeJobsPlugin(unittest.TestCase):
             self.assertEqual(self.job1.get_detailed_report(),
                              json.loads(response))
 
+    def test_persist_final_report(self):
+        """
+        Verify that the final reports are served from the persistence
+        and left out of the serialized state
+        """
+        summary = {'final_error': 0, 'final_replicas': 2}
+        detailed = {'job_progress': {'2019-06-01T12:00:00': 1.0}}
+        self.job1.data = {'monitor_info': {}, 'monitor_plugin': 'kubejobs'}
+        self.job1.enable_detailed_report = True
+        with requests_mock.Mocker() as m:
+            m.get(api.monitor_url + '/monitoring/' +
+                  self.job1.app_id + '/report', text=json.dumps(summary))
+            m.get(api.monitor_url + '/monitoring/' + self.job1.app_id +
+                  '/report/detailed', text=json.dumps(detailed))
+            self.assertEqual(self.job1.get_report(), 200)
+            self.job1.persist_final_report()
+            calls = m.call_count
+
+            self.assertEqual(self.job1.get_detailed_report(), detailed)
+            self.assertEqual(m.call_count, calls)
+
+        rebuild, args = self.job1.__reduce__()
+        self.assertIsNone(args[5])
+        restored = rebuild(*args)
+        restored.db_connector = self.job1.db_connector
+        self.assertEqual(restored.report, summary)
+        self.assertEqual(restored.get_detailed_report(), detailed)
+
+    def test_persist_final_report_failed(self):
+        """
+        Verify that a persistence error while storing the final report
+        is logged and leaves the report to be fetched from the monitor
+        """
+        def fail(app_id, report):
+            raise Exception('database is locked')
+
+        self.job1.data = {'monitor_info': {}, 'monitor_plugin': 'kubejobs'}
+        self.job1.db_connector.put_report = fail
+        with requests_mock.Mocker() as m:
+            m.get(api.monitor_url + '/monitoring/' + self.job1.app_id +
+                  '/report/detailed', text='{}')
+            self.job1.persist_final_report()
+
+        self.assertFalse(self.job1.report_persisted)
+
+    def test_timeline(self):
+        """
+        Test that the phases of the application are recorded, up to
+        the failed one, and restored with the job
+        """
+        with self.assertRaises(Exception):
+            self.job1.start_application({})
+
+        phases = self.job1.timeline.to_list()
+        self.assertEqual([(p['phase'], p['status']) for p in phases],
+                         [('validate', 'error')])
+        self.assertEqual(self.job1.get_application_state(), 'error')
+
+        rebuild, args = self.job1.__reduce__()
+        restored = rebuild(*args)
+        self.assertEqual(restored.timeline.to_list(), phases)
+
     def test_add_redis_info_to_data(self):
 
         self.job1.data = {}
@@ -462,6 +682,16 @@ class TestKubeJobsPlugin(unittest.TestCase):
         self.assertEqual(strategy, schedule_strategy)
         self.assertEqual(heuristics, heuristic_options)
 
+    def test_get_pod_logs(self):
+        """
+        Test that the pod logs are prefixed with the pod name
+        """
+        self.assertEqual(list(self.job1.get_pod_logs()),
+                         ["[kj-000001-a] line 0", "[kj-000001-a] line 1",
+                          "[kj-000001-b] line 0", "[kj-000001-b] line 1"])
+        self.assertEqual(list(self.job1.get_pod_logs(tail_lines=1)),
+                         ["[kj-000001-a] line 1", "[kj-000001-b] line 1"])
+
     def test_stop_job(self):
         """
         Test that the stop request works, changing
@@ -25,11 +25,65 @@ class TestJobCleaner(unittest.TestCase):
     """
 
     def setUp(self):
-        self.cleaner = JobCleanerDaemon({})
+        self.job = JobStub()
+        self.cleaner = JobCleanerDaemon({'kj-000001': self.job},
+                                        retry_interval=5, max_retries=1)
+        self.cleaner.start_thread = lambda: None
 
     def tearDown(self):
         pass
 
+    def test_retry_failed_teardown(self):
+        """
+        Verify that a job whose teardown failed is scheduled again,
+        at most max_retries times
+        """
+        self.cleaner.delete_resources('kj-000001')
+        self.assertEqual(self.job.attempts, 1)
+        self.assertFalse(self.cleaner.queue.is_empty())
+
+        self.cleaner.queue.pop()
+        self.cleaner.delete_resources('kj-000001')
+        self.assertTrue(self.cleaner.queue.is_empty())
+
+    def test_give_up(self):
+        """
+        Verify that giving up a teardown drops the deletion
+        authorization, so the submission can be deleted
+        """
+        self.cleaner.delete_resources('kj-000001')
+        self.cleaner.queue.pop()
+        self.cleaner.delete_resources('kj-000001')
+
+        self.assertFalse(self.job.del_resources_authorization)
+        self.assertEqual(self.job.persisted, 1)
+        self.assertEqual(self.job.cleanup_failures,
+                         {'monitor': 'connection refused'})
+
+    def test_deleted_submission(self):
+        """
+        Verify that submissions deleted meanwhile are skipped
+        """
+        self.cleaner.delete_resources('kj-000002')
+        self.assertTrue(self.cleaner.queue.is_empty())
+
+
+class JobStub(object):
+
+    def __init__(self):
+        self.attempts = 0
+        self.persisted = 0
+        self.cleanup_failures = {}
+        self.del_resources_authorization = True
+
+    def persist_state(self):
+        self.persisted += 1
+
+    def delete_job_resources(self):
+        self.attempts += 1
+        self.cleanup_failures = {'monitor': 'connection refused'}
+        return self.cleanup_failures
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,150 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import unittest
+
+from broker.service.submission_registry import SubmissionRegistry
+
+
+class JobStub(object):
+    """
+    Class that represents a submission with a state and an owner
+    """
+
+    def __init__(self, status='ongoing', owner=None):
+        self.status = status
+        self.owner = owner
+
+    def get_application_state(self):
+        return self.status
+
+    def get_owner(self):
+        return self.owner
+
+
+class TestSubmissionRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = SubmissionRegistry(shards=4)
+
+    def tearDown(self):
+        pass
+
+    def test_mapping(self):
+        """
+        Verify that the registry behaves like the dict it replaces
+        """
+        job = JobStub()
+        self.registry['kj-000001'] = job
+        self.registry.update({'kj-000002': JobStub()})
+
+        self.assertIs(self.registry['kj-000001'], job)
+        self.assertIn('kj-000002', self.registry)
+        self.assertEqual(len(self.registry), 2)
+        self.assertEqual(sorted(self.registry),
+                         ['kj-000001', 'kj-000002'])
+        self.assertIsNone(self.registry.get('kj-000003'))
+        self.assertIs(self.registry.pop('kj-000001'), job)
+        self.assertIsNone(self.registry.pop('kj-000001', None))
+        del self.registry['kj-000002']
+
+        self.assertEqual(len(self.registry), 0)
+        self.assertRaises(KeyError, self.registry.pop, 'kj-000001')
+        self.assertRaises(KeyError, self.registry.__getitem__, 'kj-000001')
+
+    def test_insertion_order(self):
+        """
+        Verify that snapshots follow the insertion order across the
+        shards, and that replacing a submission keeps its position
+        """
+        app_ids = ['kj-%06d' % i for i in range(20, 0, -1)]
+        for app_id in app_ids:
+            self.registry[app_id] = JobStub()
+        job = JobStub()
+        self.registry[app_ids[0]] = job
+
+        self.assertEqual(self.registry.keys(), app_ids)
+        self.assertIs(self.registry.values()[0], job)
+
+    def test_indexes(self):
+        """
+        Verify that the submissions are counted and listed by state
+        and owner, and that refresh reads a new state
+        """
+        jobs = {'kj-000001': JobStub('ongoing', 'alice'),
+                'kj-000002': JobStub('ongoing', 'bob'),
+                'kj-000003': JobStub('completed', 'alice')}
+        self.registry.update(jobs)
+
+        self.assertEqual(self.registry.counts(),
+                         {'ongoing': 2, 'completed': 1})
+        self.assertEqual(self.registry.ids(owner='alice'),
+                         {'kj-000001', 'kj-000003'})
+        self.assertEqual(self.registry.ids(state='ongoing', owner='alice'),
+                         {'kj-000001'})
+        self.assertEqual(self.registry.ids(state='failed'), set())
+
+        jobs['kj-000001'].status = 'completed'
+        self.registry.refresh('kj-000001')
+        self.registry.refresh('kj-000004')
+        self.registry.pop('kj-000002')
+
+        self.assertEqual(self.registry.counts(), {'completed': 2})
+        self.assertEqual(self.registry.count('ongoing'), 0)
+        self.assertEqual(self.registry.ids(owner='bob'), set())
+
+    def test_snapshot(self):
+        """
+        Verify that submissions can be removed while iterating
+        """
+        for i in range(10):
+            self.registry['kj-%06d' % i] = JobStub()
+
+        for app_id in self.registry.keys():
+            del self.registry[app_id]
+
+        self.assertEqual(len(self.registry), 0)
+        self.assertEqual(self.registry.counts(), {})
+
+    def test_concurrency(self):
+        """
+        Verify that the counts stay exact while many threads add,
+        refresh, list and remove submissions at once
+        """
+        def work(worker):
+            for i in range(200):
+                app_id = 'kj-%d-%d' % (worker, i)
+                job = JobStub('created')
+                self.registry[app_id] = job
+                job.status = 'ongoing'
+                self.registry.refresh(app_id)
+                self.registry.items()
+                if i % 2:
+                    self.registry.pop(app_id)
+
+        workers = [threading.Thread(target=work, args=(worker,))
+                   for worker in range(8)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(len(self.registry), 800)
+        self.assertEqual(self.registry.counts(), {'ongoing': 800})
+
+
+if __name__ == '__main__':
+    unittest.main()
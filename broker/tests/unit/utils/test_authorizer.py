@@ -0,0 +1,102 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+import requests_mock
+
+from broker.utils.framework import authorizer
+
+AUTHORIZER_URL = 'http://authorizer:5004/authorize'
+
+
+class TestAuthorizer(unittest.TestCase):
+    """
+    Class that represents the tests of the cached authorization
+    """
+
+    def setUp(self):
+        authorizer.flush_cache()
+
+    def tearDown(self):
+        authorizer.flush_cache()
+
+    def test_cached_authorization(self):
+        """
+        Verify that the service is only called once per credentials
+        """
+        with requests_mock.Mocker() as m:
+            m.post(AUTHORIZER_URL, text='{"success": true}')
+            for i in range(3):
+                authorization = authorizer.get_authorization(
+                    AUTHORIZER_URL, 'user', 'pass')
+                self.assertTrue(authorization['success'])
+            authorizer.get_authorization(AUTHORIZER_URL, 'user', 'other')
+
+            self.assertEqual(m.call_count, 2)
+
+    def test_flush(self):
+        """
+        Verify that flushing the cache authorizes again
+        """
+        with requests_mock.Mocker() as m:
+            m.post(AUTHORIZER_URL, text='{"success": true}')
+            authorizer.get_authorization(AUTHORIZER_URL, 'user', 'pass')
+            self.assertEqual(authorizer.flush_cache(), 1)
+            authorizer.get_authorization(AUTHORIZER_URL, 'user', 'pass')
+
+            self.assertEqual(m.call_count, 2)
+
+    def test_service_errors_not_cached(self):
+        """
+        Verify that error responses of the service are not cached
+        """
+        with requests_mock.Mocker() as m:
+            m.post(AUTHORIZER_URL, status_code=500, text='error')
+            authorization = authorizer.get_authorization(
+                AUTHORIZER_URL, 'user', 'pass')
+            authorizer.get_authorization(AUTHORIZER_URL, 'user', 'pass')
+
+            self.assertFalse(authorization['success'])
+            self.assertEqual(m.call_count, 2)
+
+    def test_parse_authorization(self):
+        """
+        Verify that only JSON or Python literals are accepted
+        """
+        self.assertEqual(authorizer.parse_authorization('{"success": true}'),
+                         {'success': True})
+        self.assertEqual(authorizer.parse_authorization("{'success': False}"),
+                         {'success': False})
+        self.assertEqual(authorizer.parse_authorization(
+            "__import__('os').getcwd()"), {'success': False})
+        self.assertEqual(authorizer.parse_authorization('[true]'),
+                         {'success': False})
+
+    def test_credentials_key(self):
+        """
+        Verify that keys do not expose the credentials
+        """
+        key = authorizer.credentials_key(AUTHORIZER_URL, 'user', 'pass')
+
+        self.assertNotIn('pass', key)
+        self.assertNotEqual(key, authorizer.credentials_key(
+            AUTHORIZER_URL, 'user', 'pass2'))
+        self.assertNotEqual(key, authorizer.credentials_key(
+            AUTHORIZER_URL, 'userp', 'ass'))
+
+
+if __name__ == "__main__":
+    unittest.main()
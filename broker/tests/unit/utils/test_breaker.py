@@ -0,0 +1,92 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+import unittest
+
+import requests_mock
+
+from broker import exceptions as ex
+from broker.utils.framework import breaker
+from broker.utils.framework import session
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """
+    Class that represents the tests of the framework circuit breakers
+    """
+
+    def setUp(self):
+        self.breaker = breaker.CircuitBreaker('test', failure_threshold=2,
+                                              reset_timeout=0.1)
+
+    def tearDown(self):
+        pass
+
+    def fail(self):
+        raise IOError("connection refused")
+
+    def test_open_after_failures(self):
+        """
+        Verify that the circuit opens after consecutive failures
+        and then fails fast
+        """
+        self.assertRaises(IOError, self.breaker.call, self.fail)
+        self.assertEqual(self.breaker.state, breaker.CLOSED)
+        self.assertRaises(IOError, self.breaker.call, self.fail)
+        self.assertEqual(self.breaker.state, breaker.OPEN)
+
+        self.assertRaises(ex.ServiceUnavailableException,
+                          self.breaker.call, lambda: 'ok')
+        self.assertEqual(self.breaker.snapshot()['retry_after'], 1)
+
+    def test_half_open_probe(self):
+        """
+        Verify that a single probe is let through once the reset
+        timeout has passed and that its outcome decides the state
+        """
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        time.sleep(0.15)
+
+        self.breaker.before_call()
+        self.assertEqual(self.breaker.state, breaker.HALF_OPEN)
+        self.assertRaises(ex.ServiceUnavailableException,
+                          self.breaker.before_call)
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, breaker.OPEN)
+
+        time.sleep(0.15)
+        self.assertEqual(self.breaker.call(lambda: 'ok'), 'ok')
+        self.assertEqual(self.breaker.state, breaker.CLOSED)
+
+    def test_session_breaker(self):
+        """
+        Verify that 5xx responses trip the breaker of a session
+        """
+        service = session.ServiceSession('test', breaker=self.breaker)
+        url = 'http://monitor:5001/monitoring/kj-000001/report'
+        with requests_mock.Mocker() as m:
+            m.get(url, status_code=503)
+            service.get(url)
+            service.get(url)
+            self.assertRaises(ex.ServiceUnavailableException,
+                              service.get, url)
+
+            self.assertEqual(m.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
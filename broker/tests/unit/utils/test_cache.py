@@ -0,0 +1,153 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+import unittest
+
+from broker.utils.cache import ResponseCache
+from broker.utils.cache import TTLCache
+from broker.utils.cache import VersionCounter
+
+
+class TestVersionCounter(unittest.TestCase):
+
+    def setUp(self):
+        self.counter = VersionCounter()
+
+    def tearDown(self):
+        pass
+
+    def test_bump(self):
+        """
+        Verify that bumping an item changes both the item
+        and the collection ETags
+        """
+        collection_etag = self.counter.etag()
+        item_etag = self.counter.etag('kj-000001')
+        other_etag = self.counter.etag('kj-000002')
+
+        self.counter.bump('kj-000001')
+
+        self.assertNotEqual(self.counter.etag(), collection_etag)
+        self.assertNotEqual(self.counter.etag('kj-000001'), item_etag)
+        self.assertEqual(self.counter.etag('kj-000002'), other_etag)
+
+    def test_forget(self):
+        """
+        Verify that forgetting an item changes the collection ETag
+        """
+        self.counter.bump('kj-000001')
+        collection_etag = self.counter.etag()
+
+        self.counter.forget('kj-000001')
+
+        self.assertNotEqual(self.counter.etag(), collection_etag)
+        self.assertEqual(self.counter.version('kj-000001'), 0)
+
+    def test_epoch(self):
+        """
+        Verify that counters of different processes don't share ETags
+        """
+        self.assertNotEqual(self.counter.etag(), VersionCounter().etag())
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = ResponseCache(ttl=60, max_entries=2)
+
+    def tearDown(self):
+        pass
+
+    def test_get_current_etag(self):
+        """
+        Verify that an entry is served only for the ETag it was built for
+        """
+        self.cache.put('submissions', 'etag-1', b'{}')
+
+        self.assertEqual(self.cache.get('submissions', 'etag-1'), b'{}')
+        self.assertIsNone(self.cache.get('submissions', 'etag-2'))
+        self.assertIsNone(self.cache.get('submissions', 'etag-1'))
+
+    def test_expiration(self):
+        """
+        Verify that expired entries are not served
+        """
+        self.cache.ttl = 0.01
+        self.cache.put('plugins', 'etag-1', b'[]')
+        time.sleep(0.02)
+
+        self.assertIsNone(self.cache.get('plugins', 'etag-1'))
+
+    def test_max_entries(self):
+        """
+        Verify that the oldest entry is evicted when the cache is full
+        """
+        self.cache.put('a', 'etag', b'a')
+        self.cache.put('b', 'etag', b'b')
+        self.cache.put('c', 'etag', b'c')
+
+        self.assertIsNone(self.cache.get('a', 'etag'))
+        self.assertEqual(self.cache.get('c', 'etag'), b'c')
+
+    def test_invalidate(self):
+        """
+        Verify that invalidation only drops the entries with the prefix
+        """
+        self.cache.put('submissions/kj-000001', 'etag', b'{}')
+        self.cache.put('clusters', 'etag', b'{}')
+
+        self.cache.invalidate('submissions')
+
+        self.assertIsNone(self.cache.get('submissions/kj-000001', 'etag'))
+        self.assertEqual(self.cache.get('clusters', 'etag'), b'{}')
+
+
+class TestTTLCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = TTLCache(max_entries=2)
+
+    def tearDown(self):
+        pass
+
+    def test_expiration(self):
+        """
+        Verify that every entry expires after its own TTL
+        """
+        self.cache.put('short', 1, ttl=0.05)
+        self.cache.put('long', 2, ttl=60)
+        time.sleep(0.1)
+
+        self.assertIsNone(self.cache.get('short'))
+        self.assertEqual(self.cache.get('long'), 2)
+
+    def test_bounded(self):
+        """
+        Verify that the oldest entry is evicted and that
+        the cache can be cleared
+        """
+        self.cache.put('a', 1, ttl=60)
+        self.cache.put('b', 2, ttl=60)
+        self.cache.put('c', 3, ttl=60)
+
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(len(self.cache), 2)
+        self.assertEqual(self.cache.clear(), 2)
+        self.assertIsNone(self.cache.get('c'))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,247 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import unittest
+
+from unittest import mock
+
+import kubernetes as kube
+import redis
+
+from broker.tests.unit.mocks.k8s_simulator import SimulatedCluster
+from broker.utils.plugins import k8s
+
+
+class FakeLogResponse(object):
+
+    def __init__(self, chunks, block=None):
+        self.chunks = chunks
+        self.block = block
+        self.released = False
+
+    def stream(self, amt):
+        for chunk in self.chunks:
+            yield chunk
+        if self.block is not None:
+            self.block.wait(5)
+
+    def release_conn(self):
+        self.released = True
+
+    def close(self):
+        if self.block is not None:
+            self.block.set()
+
+
+class FakeCoreV1Api(object):
+
+    def __init__(self, logs, block=None):
+        self.logs = logs
+        self.block = block
+        self.responses = []
+
+    def list_namespaced_pod(self, namespace, label_selector):
+        pods = [mock.Mock() for name in self.logs]
+        for pod, name in zip(pods, self.logs):
+            pod.metadata.name = name
+        return mock.Mock(items=pods)
+
+    def read_namespaced_pod_log(self, name, namespace, **kwargs):
+        response = FakeLogResponse(self.logs[name], self.block)
+        self.responses.append(response)
+        return response
+
+
+class TestStreamJobLogs(unittest.TestCase):
+
+    def stream(self, core_api, **kwargs):
+        patch_config = mock.patch.object(k8s.kube.config,
+                                         'load_kube_config')
+        patch_api = mock.patch.object(k8s.kube.client, 'CoreV1Api',
+                                      return_value=core_api)
+        with patch_config, patch_api:
+            return k8s.stream_job_logs('kj-000001', **kwargs)
+
+    def test_multiplex(self):
+        """
+        Verify that the lines of every pod are yielded with the pod
+        name, including lines split across chunks and a last line
+        without line break
+        """
+        core_api = FakeCoreV1Api({
+            'kj-000001-a': [b'first\nsec', b'ond\n'],
+            'kj-000001-b': [b'only'],
+        })
+
+        lines = list(self.stream(core_api, buffer_lines=1))
+
+        self.assertEqual(sorted(lines),
+                         [('kj-000001-a', 'first'),
+                          ('kj-000001-a', 'second'),
+                          ('kj-000001-b', 'only')])
+        self.assertTrue(all(r.released for r in core_api.responses))
+
+    def test_long_line(self):
+        """
+        Verify that lines are never buffered beyond the size limit
+        """
+        core_api = FakeCoreV1Api({
+            'kj-000001-a': [b'x' * (k8s.MAX_LOG_LINE_BYTES + 10)],
+        })
+
+        lines = [line for pod, line in self.stream(core_api)]
+
+        self.assertEqual([len(line) for line in lines],
+                         [k8s.MAX_LOG_LINE_BYTES, 10])
+
+    def test_close(self):
+        """
+        Verify that closing a followed stream stops the readers
+        """
+        block = threading.Event()
+        core_api = FakeCoreV1Api({'kj-000001-a': [b'line\n']}, block)
+
+        logs = self.stream(core_api, follow=True)
+        self.assertEqual(next(logs), ('kj-000001-a', 'line'))
+        logs.close()
+
+        self.assertTrue(block.is_set())
+
+
+class TestSimulatedCluster(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0.0
+        self.cluster = SimulatedCluster(
+            nodes=1, node_cpu='1', scheduling_latency=1,
+            image_pull_seconds=2, container_start_seconds=1,
+            drain_rate=5, tick_interval=None, clock=lambda: self.now)
+        self.patch = self.cluster.patch()
+        self.api = self.patch.__enter__()
+
+    def tearDown(self):
+        self.patch.__exit__(None, None, None)
+
+    def advance(self, now):
+        self.now = now
+        self.cluster.advance()
+
+    def create_job(self, app_id, init_size, items=0):
+        service = self.api.create_namespaced_service(
+            'default', {'metadata': {'name': 'redis-%s' % app_id},
+                        'spec': {'ports': [{'port': 6379}],
+                                 'selector': {'app': 'redis-%s' % app_id}}})
+        queue = redis.StrictRedis(port=service.spec.ports[0].node_port)
+        for i in range(items):
+            queue.rpush('job', 'item-%d' % i)
+        k8s.create_job(app_id, ['run'], 'app:latest', init_size, {})
+
+    def test_job_lifecycle(self):
+        """
+        Verify that the pods of a job are scheduled, pull their image
+        and drain the queue of the job, which completes once it is
+        empty, and that the job can be terminated twice
+        """
+        self.create_job('kj-000001', 2, items=20)
+        self.assertEqual(k8s.get_job_status('kj-000001').active, 2)
+
+        self.advance(1)
+        pods = self.api.list_namespaced_pod(
+            'default', label_selector='job-name=kj-000001').items
+        self.assertEqual([pod.status.phase for pod in pods],
+                         ['Pending', 'Pending'])
+        self.assertEqual([pod.spec.node_name for pod in pods],
+                         ['node-0', 'node-0'])
+
+        self.advance(4)
+        self.advance(5)
+        status = k8s.get_job_status('kj-000001')
+        self.assertEqual(status.active, 2)
+        self.assertIsNone(status.conditions)
+
+        self.advance(6)
+        status = k8s.get_job_status('kj-000001')
+        self.assertIsNone(status.active)
+        self.assertEqual(status.succeeded, 2)
+        self.assertEqual(status.conditions.pop().type, 'Complete')
+        self.assertEqual(self.cluster.stats()['image_pulls'], 1)
+
+        k8s.terminate_job('kj-000001')
+        k8s.terminate_job('kj-000001')
+        self.assertEqual(self.cluster.active_jobs(), 0)
+        self.assertEqual(self.cluster.services, {})
+
+    def test_list_job_statuses(self):
+        """
+        Verify that the statuses of every job are listed at once
+        """
+        self.create_job('kj-000001', 1)
+        self.create_job('kj-000002', 2)
+
+        statuses = k8s.list_job_statuses()
+
+        self.assertEqual(sorted(statuses), ['kj-000001', 'kj-000002'])
+        self.assertEqual(statuses['kj-000002'].active, 2)
+
+    def test_capacity(self):
+        """
+        Verify that pods wait unscheduled while the node is full and
+        are bound once a job is deleted
+        """
+        self.create_job('kj-000001', 8)
+        self.create_job('kj-000002', 4)
+        self.advance(1)
+
+        stats = self.cluster.stats()
+        self.assertEqual(stats['unscheduled_pods'], 2)
+        self.assertEqual(stats['cpu_allocated'], 1)
+
+        k8s.terminate_job('kj-000001')
+        self.advance(2)
+        self.assertEqual(self.cluster.stats()['unscheduled_pods'], 0)
+
+    def test_watch(self):
+        """
+        Verify that a watch lists the pods of a job and then streams
+        their changes
+        """
+        self.create_job('kj-000001', 1)
+        self.create_job('kj-000002', 1)
+        watch = kube.watch.Watch()
+        events = watch.stream(self.api.list_namespaced_pod,
+                              namespace='default',
+                              label_selector='job-name=kj-000001')
+
+        event = next(events)
+        self.assertEqual(event['type'], 'ADDED')
+        self.assertEqual(event['object'].status.phase, 'Pending')
+
+        self.advance(1)
+        event = next(events)
+        self.assertEqual(event['type'], 'MODIFIED')
+        self.assertEqual(event['object'].metadata.labels,
+                         {'job-name': 'kj-000001'})
+        self.assertEqual(event['object'].spec.node_name, 'node-0')
+
+        self.advance(4)
+        self.assertEqual(next(events)['object'].status.phase, 'Running')
+
+        watch.stop()
+        self.assertEqual(list(events), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
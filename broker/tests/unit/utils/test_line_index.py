@@ -0,0 +1,95 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from broker.utils.line_index import LineIndex
+
+
+class TestLineIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'stdout')
+        self.write(['line %d' % i for i in range(25)])
+        self.index = LineIndex(self.path, step=4)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, lines, mode='a', end='\n'):
+        with open(self.path, mode) as log_file:
+            log_file.write('\n'.join(lines) + end)
+
+    def test_read(self):
+        """
+        Verify that a page is read from any line, including lines
+        that are not indexed
+        """
+        self.assertEqual(self.index.refresh(), 25)
+
+        lines, next_offset = self.index.read(9, 3)
+        self.assertEqual(lines, ['line 9', 'line 10', 'line 11'])
+        self.assertEqual(next_offset, 12)
+
+        lines, next_offset = self.index.read(23, 10)
+        self.assertEqual(lines, ['line 23', 'line 24'])
+        self.assertEqual(next_offset, 25)
+
+        self.assertEqual(self.index.read(30, 10), ([], 30))
+
+    def test_append(self):
+        """
+        Verify that appended lines are indexed incrementally and that
+        a partial line is returned but read again once complete
+        """
+        self.index.refresh()
+        self.write(['line 25', 'line 26'], end='')
+        self.assertEqual(self.index.refresh(), 26)
+
+        lines, next_offset = self.index.read(24, 10)
+        self.assertEqual(lines, ['line 24', 'line 25', 'line 26'])
+        self.assertEqual(next_offset, 26)
+
+        self.write(['0'])
+        lines, next_offset = self.index.read(next_offset, 10)
+        self.assertEqual(lines, ['line 260'])
+        self.assertEqual(next_offset, 27)
+
+    def test_truncate(self):
+        """
+        Verify that the index is rebuilt when the file is truncated
+        """
+        self.index.refresh()
+        self.write(['first', 'second'], mode='w')
+
+        self.assertEqual(self.index.refresh(), 2)
+        self.assertEqual(self.index.read(0, 10), (['first', 'second'], 2))
+
+    def test_missing_file(self):
+        """
+        Verify that a missing file has no lines
+        """
+        index = LineIndex(os.path.join(self.directory, 'stderr'))
+
+        self.assertEqual(index.refresh(), 0)
+        self.assertEqual(index.read(0, 10), ([], 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import os
+import queue
+import shutil
+import tempfile
+import unittest
+
+from unittest.mock import patch
+
+from broker.utils import logger
+
+
+class TestLog(unittest.TestCase):
+    """
+    Class that represents the tests of the queued logger
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read(self, name):
+        logger.flush()
+        with open(os.path.join(self.directory, name)) as log_file:
+            return log_file.read().splitlines()
+
+    def test_log_written_by_listener(self):
+        """
+        Verify that messages reach the file of their logger
+        """
+        log = logger.Log("TestLogWritten",
+                         os.path.join(self.directory, "written.log"))
+        log.log("first message")
+        log.log("second message")
+
+        self.assertEqual(self.read("written.log"),
+                         ["first message", "second message"])
+
+    def test_sample(self):
+        """
+        Verify that sampled messages are suppressed and counted
+        """
+        log = logger.Log("TestLogSample",
+                         os.path.join(self.directory, "sample.log"))
+        for i in range(3):
+            log.sample("polling", key="job", interval=3600)
+        log.sample("polling", key="other", interval=3600)
+        log.sample("polling", key="job", interval=0)
+
+        self.assertEqual(self.read("sample.log"),
+                         ["polling", "polling",
+                          "polling (2 similar messages suppressed)"])
+
+    def test_levels(self):
+        """
+        Verify that levels configured per logger are applied
+        """
+        self.assertEqual(logger.parse_levels("UtilsAPI:warning, A:B:DEBUG"),
+                         {"UtilsAPI": logging.WARNING, "A:B": logging.DEBUG})
+        with self.assertLogs(logger.__name__, logging.WARNING):
+            self.assertEqual(logger.parse_levels("A:LOUD, B:error"),
+                             {"B": logging.ERROR})
+
+        with patch.object(logger, '_levels', {"TestLogLevel": logging.ERROR}):
+            log = logger.Log("TestLogLevel",
+                             os.path.join(self.directory, "level.log"))
+        log.log("filtered")
+        log.logger.error("kept")
+
+        self.assertEqual(self.read("level.log"), ["kept"])
+
+    def test_listener_started_lazily(self):
+        """
+        Verify that creating a logger starts no thread, and that the
+        writer thread starts with the first record
+        """
+        logger.stop()
+        log = logger.Log("TestLogLazy",
+                         os.path.join(self.directory, "lazy.log"))
+        self.assertIsNone(logger._listener)
+
+        log.log("first message")
+
+        self.assertIsNotNone(logger._listener)
+        self.assertEqual(self.read("lazy.log"), ["first message"])
+
+    def test_drops_reported(self):
+        """
+        Verify that the writer reports the dropped records once it
+        empties the queue, without anyone flushing
+        """
+        console = CapturingHandler()
+        log = logger.Log("TestLogDrops",
+                         os.path.join(self.directory, "drops.log"))
+        logger._dropped.reset()
+
+        with patch.object(logger._dispatcher, 'console', console):
+            logger._dropped.increment()
+            log.log("after the drops")
+            logger._queue.join()
+
+        self.assertIn("1 log records dropped, the log queue was full",
+                      [record.getMessage() for record in console.records])
+        self.assertEqual(logger._dropped.value, 0)
+
+    def test_sample_keys_bounded(self):
+        """
+        Verify that the sampled keys are forgotten, the expired ones
+        first, once there are too many
+        """
+        log = logger.Log("TestLogSampleKeys",
+                         os.path.join(self.directory, "keys.log"))
+        with patch.object(logger, 'sample_keys', 4):
+            log.sample("old", key="old", interval=0)
+            for i in range(3):
+                log.sample("job", key="kj-%d" % i, interval=3600)
+            log.sample("new", key="new", interval=3600)
+            self.assertNotIn("old", log._samples)
+
+            for i in range(10):
+                log.sample("job", key="kj-%d" % (i + 3), interval=3600)
+            self.assertLessEqual(len(log._samples), 4)
+
+    def test_full_queue_drops(self):
+        """
+        Verify that a full queue drops records instead of blocking
+        """
+        handler = logger._DroppingQueueHandler(queue.Queue(1))
+        record = logging.makeLogRecord({'msg': 'message'})
+        logger._dropped.reset()
+
+        handler.handle(record)
+        handler.handle(record)
+
+        self.assertEqual(handler.queue.qsize(), 1)
+        self.assertEqual(logger._dropped.reset(), 1)
+
+
+class CapturingHandler(logging.Handler):
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from broker.utils import metrics
+
+
+class TestMetrics(unittest.TestCase):
+    """
+    Class that represents the tests of the metrics registry
+    """
+
+    def setUp(self):
+        self.registry = metrics.Registry()
+
+    def tearDown(self):
+        pass
+
+    def test_histogram(self):
+        """
+        Verify bucket counts and percentiles of a histogram
+        """
+        histogram = self.registry.histogram('latency', target='a')
+        for value in range(1, 101):
+            histogram.observe(value / 100.0)
+
+        self.assertEqual(histogram.count, 100)
+        self.assertEqual(sum(histogram.bucket_counts), 100)
+        self.assertEqual(histogram.bucket_counts[-1], 0)
+        self.assertEqual(histogram.percentiles(),
+                         {'p50': 0.5, 'p95': 0.95, 'p99': 0.99})
+
+    def test_registry(self):
+        """
+        Verify that metrics are identified by name and labels
+        """
+        counter = self.registry.counter('errors', target='a')
+        counter.inc()
+
+        self.assertIs(self.registry.counter('errors', target='a'), counter)
+        self.assertIsNot(self.registry.counter('errors', target='b'),
+                         counter)
+        self.assertRaises(TypeError, self.registry.histogram,
+                          'errors', target='a')
+        self.assertEqual(self.registry.snapshot()[0],
+                         {'name': 'errors', 'labels': {'target': 'a'},
+                          'value': {'value': 1}})
+
+    def test_exposition(self):
+        """
+        Verify the Prometheus text format of every kind of metric
+        """
+        self.registry.histogram('latency', endpoint='a"b').observe(0.2)
+        self.registry.counter('errors').inc(3)
+        self.registry.add_collector(
+            lambda registry: registry.gauge('threads').set(7))
+
+        lines = metrics.exposition(self.registry).splitlines()
+
+        self.assertIn('# TYPE latency histogram', lines)
+        self.assertIn('latency_bucket{endpoint="a\\"b",le="0.1"} 0', lines)
+        self.assertIn('latency_bucket{endpoint="a\\"b",le="0.25"} 1', lines)
+        self.assertIn('latency_bucket{endpoint="a\\"b",le="+Inf"} 1', lines)
+        self.assertIn('latency_count{endpoint="a\\"b"} 1', lines)
+        self.assertIn('errors 3', lines)
+        self.assertIn('# TYPE threads gauge', lines)
+        self.assertIn('threads 7', lines)
+
+    def test_timed(self):
+        """
+        Verify that decorated functions and instrumented clients are
+        timed, including the calls that raise
+        """
+        @metrics.timed('test_call_seconds', backend='test')
+        def fail():
+            raise ValueError()
+
+        self.assertRaises(ValueError, fail)
+        self.assertEqual(metrics.REGISTRY.histogram(
+            'test_call_seconds', backend='test', operation='fail').count, 1)
+
+        client = metrics.InstrumentedClient({'job': 1},
+                                            'test_command_seconds')
+        self.assertEqual(client.get('job'), 1)
+        self.assertEqual(metrics.REGISTRY.histogram(
+            'test_command_seconds', command='get').count, 1)
+
+    def test_percentile(self):
+        """
+        Verify the nearest-rank percentile
+        """
+        self.assertIsNone(metrics.percentile([], 50))
+        self.assertEqual(metrics.percentile([3, 1, 2], 50), 2)
+        self.assertEqual(metrics.percentile([3, 1, 2], 100), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+import flask
+
+from broker.api.v10 import rest
+from broker.service import api
+from broker.utils import profiler
+
+
+def busy(n):
+    return sum(square(i) for i in range(n))
+
+
+def square(i):
+    return i * i
+
+
+class TestProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.app = flask.Flask(__name__)
+        self.profiler = profiler.Profiler(top=2, max_endpoints=2,
+                                          token='secret')
+
+    def call(self, endpoint, headers=None):
+        with self.app.test_request_context(headers=headers or {}):
+            return self.profiler.call(endpoint, busy, 100)
+
+    def test_sampling(self):
+        """
+        Verify that only sampled requests or requests with the debug
+        token are profiled
+        """
+        self.assertEqual(self.call('a'), busy(100))
+        self.call('a', {profiler.PROFILE_HEADER: 'wrong'})
+        self.assertEqual(self.profiler.snapshot(), {})
+
+        self.call('a', {profiler.PROFILE_HEADER: 'secret'})
+        self.profiler.sample_rate = 1
+        self.call('a')
+
+        profile = self.profiler.snapshot()['a']
+        self.assertEqual(profile['requests'], 2)
+        self.assertEqual(len(profile['functions']), 2)
+        self.assertTrue(any('busy' in f['function']
+                            for f in profile['functions']))
+
+    def test_memory_cap(self):
+        """
+        Verify that the functions and endpoints kept are bounded
+        """
+        self.profiler.sample_rate = 1
+        for endpoint in ('a', 'b', 'c'):
+            self.call(endpoint)
+
+        self.assertEqual(sorted(self.profiler.snapshot()), ['b', 'c'])
+        for endpoint_profile in self.profiler._profiles.values():
+            self.assertLessEqual(len(endpoint_profile.functions),
+                                 2 * profiler.KEPT_FUNCTIONS_FACTOR)
+
+
+class TestDebugProfilesEndpoint(unittest.TestCase):
+
+    def setUp(self):
+        app = flask.Flask(__name__)
+        app.register_blueprint(rest)
+        self.client = app.test_client()
+        self.token = api.debug_token
+        profiler.PROFILER.token = api.debug_token = 'secret'
+
+    def tearDown(self):
+        profiler.PROFILER.token = api.debug_token = self.token
+        profiler.PROFILER.clear()
+
+    def test_profiles(self):
+        """
+        Verify that requests with the debug header are profiled and
+        served only with the debug token
+        """
+        self.client.get('/health',
+                        headers={profiler.PROFILE_HEADER: 'secret'})
+
+        resp = self.client.get('/debug/profiles',
+                               headers={'X-Debug-Token': 'secret'})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json['health']['requests'], 1)
+
+        for headers in ({}, {'X-Debug-Token': 'wrong'}):
+            resp = self.client.get('/debug/profiles', headers=headers)
+            self.assertEqual(resp.status_code, 403)
+
+
+if __name__ == '__main__':
+    unittest.main()
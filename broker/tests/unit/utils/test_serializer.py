@@ -0,0 +1,165 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+import enum
+import json
+import unittest
+
+from broker import exceptions as ex
+from broker.utils import serializer
+
+
+class Component(enum.Enum):
+    MANAGER = 'manager'
+
+
+class TestJSONSerializer(unittest.TestCase):
+    """
+    Class that represents the tests of the JSON serializers
+    against every installed backend
+    """
+
+    def setUp(self):
+        self.previous_backend = serializer.get_json_backend()
+        self.payload = {
+            'app_id': 'kj-000001',
+            'starting_time': datetime.datetime(2019, 6, 1, 12, 30, 15,
+                                               123456),
+            'report': {'final_replicas': 4, 'min_error': -0.25},
+            'cmd': ['python', 'job.py'],
+            1: 'non string key'
+        }
+
+    def tearDown(self):
+        serializer.set_json_backend(self.previous_backend.name)
+
+    def test_backends_agree(self):
+        """
+        Verify that every backend produces the same document,
+        including the datetime formatting
+        """
+        documents = []
+        for name in serializer.JSON_BACKENDS:
+            serializer.set_json_backend(name)
+            body = serializer.JSONDictSerializer().serialize(self.payload)
+            documents.append(json.loads(body))
+
+        for document in documents:
+            self.assertEqual(document['starting_time'], '2019-06-01T12:30:15')
+            self.assertEqual(document, documents[0])
+
+    def test_same_output(self):
+        """
+        Verify that every backend writes the same body, byte for byte,
+        for non-finite floats, enums and non-ASCII text too
+        """
+        fixtures = [
+            self.payload,
+            {'min_error': float('nan'), 'errors': [float('inf'), 0.5]},
+            {'component': Component.MANAGER},
+            {'cmd': ['echo', 'ol\u00e1'], 'init_size': 1}]
+        for fixture in fixtures:
+            bodies = []
+            for name in serializer.JSON_BACKENDS:
+                serializer.set_json_backend(name)
+                body = serializer.JSONDictSerializer().serialize(fixture)
+                if isinstance(body, bytes):
+                    body = body.decode('utf-8')
+                bodies.append(body)
+            self.assertEqual(len(set(bodies)), 1, bodies)
+
+        serializer.set_json_backend('json')
+        self.assertEqual(
+            serializer.JSONDictSerializer().serialize(fixtures[1]),
+            '{"min_error":null,"errors":[null,0.5]}')
+        self.assertEqual(
+            serializer.JSONDictSerializer().serialize(fixtures[2]),
+            '{"component":"manager"}')
+
+    def test_round_trip(self):
+        """
+        Verify that a serialized body is deserialized back
+        """
+        for name in serializer.JSON_BACKENDS:
+            serializer.set_json_backend(name)
+            body = serializer.JSONDictSerializer().serialize(
+                {'env_vars': {'VAR1': 'value'}, 'init_size': 1})
+            data = serializer.JSONDeserializer().deserialize(body)['body']
+            self.assertEqual(data, {'env_vars': {'VAR1': 'value'},
+                                    'init_size': 1})
+
+    def test_big_integers(self):
+        """
+        Verify that integers wider than 64 bits are serialized
+        """
+        for name in serializer.JSON_BACKENDS:
+            serializer.set_json_backend(name)
+            body = serializer.JSONDictSerializer().serialize({'n': 2 ** 70})
+            self.assertEqual(json.loads(body), {'n': 2 ** 70})
+
+    def test_malformed_body(self):
+        """
+        Verify that a malformed body raises MalformedRequestBody
+        """
+        for name in serializer.JSON_BACKENDS:
+            serializer.set_json_backend(name)
+            self.assertRaises(ex.MalformedRequestBody,
+                              serializer.JSONDeserializer().deserialize,
+                              '{"init_size": ')
+
+    def test_unknown_backend(self):
+        """
+        Verify that selecting a missing backend fails
+        """
+        self.assertRaises(ex.ConfigurationError,
+                          serializer.set_json_backend, 'missing')
+
+
+@unittest.skipUnless(serializer.msgpack_available(), "msgpack not installed")
+class TestMsgpackSerializer(unittest.TestCase):
+    """
+    Class that represents the tests of the MessagePack serializers
+    """
+
+    def test_matches_json(self):
+        """
+        Verify that MessagePack carries the same values as JSON,
+        including the datetime formatting
+        """
+        payload = {
+            'app_id': 'kj-000001',
+            'starting_time': datetime.datetime(2019, 6, 1, 12, 30, 15,
+                                               123456),
+            'plugin_info': {'env_vars': {'LANG': 'C'}, 'cmd': ['job.py']}
+        }
+
+        body = serializer.MsgpackDictSerializer().serialize(payload)
+        document = serializer.MsgpackDeserializer().deserialize(body)
+
+        self.assertEqual(document['body'], json.loads(
+            serializer.JSONDictSerializer().serialize(payload)))
+
+    def test_malformed_body(self):
+        """
+        Verify that a malformed body is rejected
+        """
+        self.assertRaises(ex.MalformedRequestBody,
+                          serializer.MsgpackDeserializer().deserialize,
+                          b'\xc1')
+
+
+if __name__ == "__main__":
+    unittest.main()
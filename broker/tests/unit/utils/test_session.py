@@ -0,0 +1,85 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+import requests
+import requests_mock
+
+from broker.utils import metrics
+from broker.utils.framework import session
+
+
+class TestServiceSession(unittest.TestCase):
+    """
+    Class that represents the tests of the pooled framework sessions
+    """
+
+    def setUp(self):
+        self.session = session.ServiceSession('test', pool_size=2,
+                                              connect_timeout=1,
+                                              read_timeout=2)
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_shared_session(self):
+        """
+        Verify that every call for a service returns the same session
+        """
+        self.assertIs(session.get_session('monitor'),
+                      session.get_session('monitor'))
+        self.assertIsNot(session.get_session('monitor'),
+                         session.get_session('controller'))
+
+    def test_default_timeout(self):
+        """
+        Verify that requests get the configured timeouts
+        """
+        with requests_mock.Mocker() as m:
+            m.get('http://monitor:5001/report', text='{}')
+            self.session.get('http://monitor:5001/report')
+            self.session.get('http://monitor:5001/report', timeout=9)
+
+            self.assertEqual(m.request_history[0].timeout, (1, 2))
+            self.assertEqual(m.request_history[1].timeout, 9)
+
+    def test_latency_recorded(self):
+        """
+        Verify that latencies and errors are recorded per target
+        """
+        histogram = metrics.REGISTRY.histogram(
+            'framework_request_seconds', service='test',
+            target='controller:5000')
+        errors = metrics.REGISTRY.counter(
+            'framework_request_errors_total', service='test',
+            target='controller:5000', error='ConnectTimeout')
+        count = histogram.count
+
+        with requests_mock.Mocker() as m:
+            m.put('http://controller:5000/stop', status_code=200)
+            m.post('http://controller:5000/start',
+                   exc=requests.exceptions.ConnectTimeout)
+            self.session.put('http://controller:5000/stop')
+            self.assertRaises(requests.exceptions.ConnectTimeout,
+                              self.session.post,
+                              'http://controller:5000/start')
+
+        self.assertEqual(histogram.count, count + 2)
+        self.assertEqual(errors.value, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import unittest
+
+from concurrent import futures
+
+import flask
+
+from broker.api.v10 import rest
+from broker.service import api
+from broker.service.api import v10
+from broker.tests.unit.mocks.persistence_mock import PersistenceMock
+from broker.utils import threads
+from kubejobs import KubeJobsExecutor
+
+
+def wait_release(event):
+    event.wait(5)
+
+
+class TestThreads(unittest.TestCase):
+
+    def setUp(self):
+        self.release = threading.Event()
+
+    def tearDown(self):
+        self.release.set()
+
+    def find(self, name):
+        return [thread for thread in threads.snapshot()['threads']
+                if thread['name'] == name]
+
+    def test_registry(self):
+        """
+        Verify that started threads are named, described with their
+        stack while they run and forgotten once they return
+        """
+        thread = threads.start_thread(wait_release, 'wait',
+                                      app_id='kj-000001',
+                                      args=(self.release,))
+
+        described, = self.find('wait:kj-000001')
+        self.assertEqual(described['role'], 'wait')
+        self.assertEqual(described['app_id'], 'kj-000001')
+        self.assertGreaterEqual(described['running_for'], 0)
+        self.assertTrue(any('wait_release' in frame
+                            for frame in described['stack']))
+
+        self.release.set()
+        thread.join(5)
+        self.assertEqual(self.find('wait:kj-000001'), [])
+        self.assertNotIn(thread, threads._threads)
+
+    def test_executor(self):
+        """
+        Verify that the backlog of registered executors is reported
+        """
+        pool = futures.ThreadPoolExecutor(max_workers=1)
+        threads.register_executor('test', pool)
+        started = threading.Event()
+        pool.submit(lambda: started.set() or wait_release(self.release))
+        started.wait(5)
+        for i in range(2):
+            pool.submit(wait_release, self.release)
+
+        executor = threads.snapshot()['executors']['test']
+        self.assertEqual(executor['max_workers'], 1)
+        self.assertEqual(executor['threads'], 1)
+        self.assertEqual(executor['queued'], 2)
+
+        self.release.set()
+        pool.shutdown()
+        threads._executors.pop('test')
+
+
+class TestDebugThreadsEndpoint(unittest.TestCase):
+
+    def setUp(self):
+        app = flask.Flask(__name__)
+        app.register_blueprint(rest)
+        self.client = app.test_client()
+        self.token = api.debug_token
+        api.debug_token = 'secret'
+
+        self.release = threading.Event()
+        self.job = KubeJobsExecutor('kj-300001', status='ongoing')
+        self.job.db_connector = PersistenceMock()
+        v10.submissions['kj-300001'] = self.job
+
+    def tearDown(self):
+        api.debug_token = self.token
+        self.release.set()
+        v10.submissions.pop('kj-300001', None)
+
+    def test_threads(self):
+        """
+        Verify that job threads are reported with the phase of their
+        job, only with the debug token
+        """
+        entered = threading.Event()
+
+        def wait():
+            with self.job.timeline.phase('wait'):
+                entered.set()
+                self.release.wait(5)
+
+        threads.start_thread(wait, 'wait', app_id='kj-300001')
+        entered.wait(5)
+
+        resp = self.client.get('/debug/threads',
+                               headers={'X-Debug-Token': 'secret'})
+        self.assertEqual(resp.status_code, 200)
+        described, = [thread for thread in resp.json['threads']
+                      if thread['name'] == 'wait:kj-300001']
+        self.assertEqual(described['phase'], 'wait')
+        self.assertEqual(described['state'], 'ongoing')
+        self.assertIn('report', resp.json['executors'])
+
+        resp = self.client.get('/debug/threads')
+        self.assertEqual(resp.status_code, 403)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from broker.utils import timeline
+
+
+class TestTimeline(unittest.TestCase):
+
+    def test_phases(self):
+        """
+        Verify that phases are recorded in order, including the ones
+        that fail
+        """
+        recorded = timeline.Timeline()
+        with recorded.phase('validate'):
+            pass
+        with self.assertRaises(ValueError):
+            with recorded.phase('setup_redis'):
+                raise ValueError()
+
+        phases = recorded.to_list()
+        self.assertEqual([(p['phase'], p['status']) for p in phases],
+                         [('validate', 'ok'), ('setup_redis', 'error')])
+        self.assertEqual(phases[0]['offset'], 0)
+        self.assertGreaterEqual(phases[1]['offset'], phases[0]['duration'])
+
+    def test_restore(self):
+        """
+        Verify that a restored timeline keeps its phases and goes on
+        with increasing offsets
+        """
+        recorded = timeline.Timeline()
+        with recorded.phase('validate'):
+            pass
+
+        restored = timeline.Timeline(recorded.to_list())
+        with restored.phase('wait'):
+            pass
+
+        phases = restored.to_list()
+        self.assertEqual([p['phase'] for p in phases], ['validate', 'wait'])
+        self.assertGreaterEqual(phases[1]['offset'], 0)
+
+    def test_aggregate(self):
+        """
+        Verify the percentiles of each phase across timelines
+        """
+        timelines = [timeline.Timeline([
+            {'phase': 'trigger', 'started_at': '2019-06-01T12:00:00.000000',
+             'offset': 0, 'duration': duration, 'status': 'ok'}])
+            for duration in (1, 2, 3, 4)]
+
+        summary = timeline.aggregate(timelines)
+
+        self.assertEqual(summary, {'trigger': {'count': 4, 'p50': 2,
+                                               'p95': 4, 'p99': 4}})
+
+
+if __name__ == '__main__':
+    unittest.main()
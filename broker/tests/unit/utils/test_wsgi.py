@@ -0,0 +1,87 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import socket
+import threading
+import time
+import unittest
+
+import flask
+
+from broker.utils import wsgi
+
+
+class TestPooledWSGIServer(unittest.TestCase):
+
+    def setUp(self):
+        self.release = threading.Event()
+        self.app = flask.Flask(__name__)
+
+        @self.app.route('/slow')
+        def slow():
+            self.release.wait(5)
+            return 'done'
+
+        self.server = wsgi.PooledWSGIServer('127.0.0.1', 0, self.app,
+                                            pool_size=1)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def tearDown(self):
+        self.release.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def request(self, path):
+        connection = socket.create_connection(self.server.server_address)
+        connection.sendall(('GET %s HTTP/1.0\r\n\r\n' % path).encode())
+        return connection
+
+    def wait_busy(self):
+        for _ in range(500):
+            if self.server.slots._value == 0:
+                return
+            time.sleep(0.01)
+        self.fail("the worker never got the connection")
+
+    def test_address_in_use(self):
+        """
+        Verify that binding a port in use fails with the bind error,
+        which werkzeug may turn into an exit
+        """
+        self.assertRaises((OSError, SystemExit), wsgi.PooledWSGIServer,
+                          '127.0.0.1', self.server.server_port, self.app)
+
+    def test_busy_workers(self):
+        """
+        Verify that no connection is handed to the pool while every
+        worker is busy, and that waiting ones are served afterwards
+        """
+        first = self.request('/slow')
+        self.wait_busy()
+        second = self.request('/slow')
+        time.sleep(0.1)
+
+        self.assertEqual(self.server.pool._work_queue.qsize(), 0)
+
+        self.release.set()
+        for connection in (first, second):
+            self.assertIn(b'done', connection.makefile('rb').read())
+            connection.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -13,20 +13,36 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
+import threading
+import time
 import traceback
 
 import flask
 from werkzeug import datastructures
+from werkzeug import exceptions as http_exceptions
 
 from broker import exceptions as ex
+from broker.service import api
+from broker.utils import compression
+from broker.utils import metrics
+from broker.utils import profiler
 from broker.utils import serializer as u_serializer
 from broker.utils.logger import Log
 
 
 LOG = Log("UtilsAPI", "logs/utilsapi.log")
 
+# A followed stream holds a server worker for as long as it runs, so
+# only a few may run at once and leave the others to short requests.
+FOLLOW_SLOTS = threading.BoundedSemaphore(api.max_followed_streams)
+
 
 class Rest(flask.Blueprint):
+    def __init__(self, *args, **kwargs):
+        super(Rest, self).__init__(*args, **kwargs)
+        self.after_request(compression.compress_response)
+
     def get(self, rule, status_code=200):
         return self._mroute('GET', rule, status_code)
 
@@ -61,8 +77,20 @@ class Rest(flask.Blueprint):
             endpoint = options.pop('endpoint', func.__name__)
 
             def handler(**kwargs):
-                LOG.log("Rest.route.decorator.handler, kwargs={kwargs}".format(
-                    kwargs=kwargs))
+                start = time.monotonic()
+                # views may return a (body, status) tuple too
+                resp = flask.make_response(
+                    profiler.PROFILER.call(endpoint, dispatch, **kwargs))
+                metrics.REGISTRY.histogram(
+                    'http_request_seconds', endpoint=endpoint,
+                    method=flask.request.method,
+                    status=resp.status_code).observe(
+                        time.monotonic() - start)
+                return resp
+
+            def dispatch(**kwargs):
+                LOG.sample("Rest.route.decorator.handler, kwargs={kwargs}"
+                           .format(kwargs=kwargs), key=endpoint)
 
                 _init_resp_type(file_upload)
 
@@ -81,6 +109,10 @@ class Rest(flask.Blueprint):
                     return access_denied(e)
                 except ex.BadRequestException as e:
                     return bad_request(e)
+                except ex.ServiceUnavailableException as e:
+                    return service_unavailable(e)
+                except http_exceptions.HTTPException as e:
+                    return http_error(e)
                 except Exception as e:
                     return internal_error(500, 'Internal Server Error', e)
 
@@ -94,6 +126,16 @@ class Rest(flask.Blueprint):
 
 RT_JSON = datastructures.MIMEAccept([("application/json", 1)])
 
+# Body (de)serializers by content type. When the client accepts several,
+# the first one is used.
+SERIALIZERS = collections.OrderedDict([
+    ('application/json', u_serializer.JSONDictSerializer)])
+DESERIALIZERS = {'application/json': u_serializer.JSONDeserializer}
+if u_serializer.msgpack_available():
+    for _mimetype in ('application/msgpack', 'application/x-msgpack'):
+        SERIALIZERS[_mimetype] = u_serializer.MsgpackDictSerializer
+        DESERIALIZERS[_mimetype] = u_serializer.MsgpackDeserializer
+
 
 def _init_resp_type(file_upload):
     """Extracts response content type."""
@@ -121,30 +163,167 @@ def render(res=None, resp_type=None, status=None, **kwargs):
         abort_and_log(500,
                       "Non-dict and non-empty kwargs passed to render")
 
-    status_code = getattr(flask.request, 'status_code', None)
-    if status:
-        status_code = status
-    if not status_code:
-        status_code = 200
+    status_code = _status_code(status)
+
+    mimetype = _response_mimetype(resp_type)
+    if mimetype is None:
+        abort_and_log(400, "None of the accepted content types is "
+                           "supported")
 
+    body = SERIALIZERS[mimetype]().serialize(res)
+
+    resp = flask.Response(response=body, status=status_code,
+                          mimetype=mimetype)
+    if len(SERIALIZERS) > 1:
+        resp.vary.add('Accept')
+    return resp
+
+
+def _response_mimetype(resp_type=None):
+    """ Returns the content type of the response body, negotiated with
+    the Accept header, or None when no serializer is accepted.
+    """
     if not resp_type:
         resp_type = getattr(flask.request, 'resp_type', RT_JSON)
 
     if not resp_type:
         resp_type = RT_JSON
 
-    serializer1 = None
-    if "application/json" in resp_type:
-        resp_type = RT_JSON
-        serializer1 = u_serializer.JSONDictSerializer()
+    return resp_type.best_match(list(SERIALIZERS))
+
+
+def _follow_slot():
+    if not FOLLOW_SLOTS.acquire(blocking=False):
+        raise ex.ServiceUnavailableException('log follow', retry_after=5)
+
+
+def render_stream(items, status=None, follow=False):
+    """ Streams ``items`` as newline delimited JSON, one document per
+    line, writing each one as soon as the iterable yields it. A
+    ``follow`` stream takes one of the ``max_followed_streams`` slots
+    until the response is closed.
+    """
+    if follow:
+        _follow_slot()
+    serializer1 = u_serializer.JSONDictSerializer()
+
+    def generate():
+        for item in items:
+            line = serializer1.serialize(item)
+            if not isinstance(line, bytes):
+                line = line.encode('utf-8')
+            yield line + b'\n'
+
+    resp = flask.Response(flask.stream_with_context(generate()),
+                          status=_status_code(status),
+                          mimetype='application/x-ndjson')
+    if follow:
+        resp.call_on_close(FOLLOW_SLOTS.release)
+    return resp
+
+
+def render_text_stream(lines, status=None, follow=False):
+    """ Streams ``lines`` as plain text, one per line, writing each one
+    as soon as the iterable yields it. ``follow`` is handled as by
+    :func:`render_stream`.
+    """
+    if follow:
+        _follow_slot()
+
+    def generate():
+        try:
+            for line in lines:
+                yield line.encode('utf-8') + b'\n'
+        finally:
+            # lets a producer stop as soon as the client goes away
+            close = getattr(lines, 'close', None)
+            if close is not None:
+                close()
+
+    resp = flask.Response(flask.stream_with_context(generate()),
+                          status=_status_code(status),
+                          mimetype='text/plain')
+    if follow:
+        resp.call_on_close(FOLLOW_SLOTS.release)
+    return resp
+
+
+def render_text(text, mimetype='text/plain', status=None):
+    return flask.Response(response=text, status=_status_code(status),
+                          mimetype=mimetype)
+
+
+def render_versioned(build, get_etag, cache=None, cache_key=None):
+    """ Renders the result of ``build`` tagged with the ETag returned
+    by ``get_etag``.
+
+    Answers ``304 Not Modified`` when the client already holds the
+    current ETag and serves a cached serialized body while it is still
+    current, so ``build`` only runs when the representation changed.
+    ``get_etag`` returns None when the resource can't be versioned, in
+    which case ``build`` is rendered as usual. A body built while the
+    version changed is sent without ETag and isn't cached.
+    """
+    etag = get_etag()
+    if etag is not None and flask.request.if_none_match.contains_weak(etag):
+        return not_modified(etag)
+
+    # the body is cached as sent, so each content type and encoding has
+    # its own entry
+    mimetype = _response_mimetype()
+    if mimetype is None:
+        # render rejects the request
+        cache = None
+    encoding = compression.negotiate(flask.request.accept_encodings)
+    if cache_key is not None:
+        for variant in (mimetype, encoding):
+            if variant not in (None, 'application/json'):
+                cache_key = '%s;%s' % (cache_key, variant)
+
+    cached = None
+    if cache is not None and etag is not None:
+        cached = cache.get(cache_key, etag)
+
+    if cached is None:
+        resp = compression.compress_response(render(build()), encoding,
+                                             stream=False)
+        # the resource changed while the body was built, which may then
+        # hold the old state: neither tag nor cache it
+        if etag is not None and get_etag() != etag:
+            etag = None
+        if cache is not None and etag is not None and \
+           resp.status_code == 200:
+            cache.put(cache_key, etag,
+                      (resp.get_data(), resp.headers.get('Content-Encoding')))
     else:
-        abort_and_log(400, "Content type '%s' isn't supported" % resp_type)
+        body, content_encoding = cached
+        resp = flask.Response(response=body, status=_status_code(),
+                              mimetype=mimetype)
+        resp.vary.add('Accept-Encoding')
+        if len(SERIALIZERS) > 1:
+            resp.vary.add('Accept')
+        if content_encoding is not None:
+            resp.headers['Content-Encoding'] = content_encoding
+
+    if etag is not None:
+        resp.set_etag(etag, weak=True)
 
-    body = serializer1.serialize(res)
-    resp_type = str(resp_type)
+    return resp
 
-    return flask.Response(response=body, status=status_code,
-                          mimetype=resp_type)
+
+def not_modified(etag):
+    resp = flask.Response(status=304)
+    resp.set_etag(etag, weak=True)
+    return resp
+
+
+def _status_code(status=None):
+    status_code = getattr(flask.request, 'status_code', None)
+    if status:
+        status_code = status
+    if not status_code:
+        status_code = 200
+    return status_code
 
 
 def request_data():
@@ -158,16 +337,14 @@ def request_data():
     if flask.request.file_upload:
         return flask.request.data
 
-    deserializer = None
-    content_type = flask.request.mimetype
-    if not content_type or content_type in RT_JSON:
-        deserializer = u_serializer.JSONDeserializer()
-    else:
+    content_type = flask.request.mimetype or 'application/json'
+    deserializer = DESERIALIZERS.get(content_type)
+    if deserializer is None:
         abort_and_log(400,
                       "Content type '%s' isn't supported" % content_type)
 
     # parsed request data to avoid unwanted re-parsings
-    parsed_data = deserializer.deserialize(flask.request.data)['body']
+    parsed_data = deserializer().deserialize(flask.request.data)['body']
     flask.request.parsed_data = parsed_data
 
     return flask.request.parsed_data
@@ -177,6 +354,14 @@ def get_request_args():
     return flask.request.args
 
 
+def get_request_headers():
+    return flask.request.headers
+
+
+def get_request_query_string():
+    return flask.request.query_string.decode('utf-8')
+
+
 def abort_and_log(status_code, descr, exc=None):
     LOG.log("Request aborted with status code {code} and "
             "message '{message}'".format(code=status_code, message=descr))
@@ -226,6 +411,23 @@ def bad_request(error):
     return render_error_message(error_code, error.message, error.code)
 
 
+def http_error(error):
+    """ Renders the errors raised by abort_and_log. They are always
+    rendered as JSON, since the error may be that no other content type
+    is accepted.
+    """
+    message = {
+        "error_code": error.code,
+        "error_message": error.description,
+        "error_name": error.name
+    }
+
+    resp = render(message, resp_type=RT_JSON)
+    resp.status_code = error.code
+
+    return resp
+
+
 def unauthorized(error):
     error_code = 401
 
@@ -250,6 +452,21 @@ def access_denied(error):
     return render_error_message(error_code, error.message, error.code)
 
 
+def service_unavailable(error):
+    error_code = 503
+
+    LOG.sample("Service Unavailable: "
+               "error_code={code}, error_message={message}, "
+               "error_name={name}".format(code=error_code,
+                                          message=error.message,
+                                          name=error.code),
+               key=error.service)
+
+    resp = render_error_message(error_code, error.message, error.code)
+    resp.headers['Retry-After'] = str(max(1, error.retry_after))
+    return resp
+
+
 def not_found(error):
     error_code = 404
 
@@ -0,0 +1,137 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import threading
+import time
+import uuid
+
+
+class VersionCounter(object):
+    """ Thread-safe version counters for a collection and its items.
+
+    Every change to an item bumps both the item and the collection
+    versions, so either one tells whether a representation served
+    before is still current. ETags carry a random epoch, which keeps
+    the ETags of a restarted manager from matching older ones.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._epoch = uuid.uuid4().hex[:8]
+        self._version = 0
+        self._items = {}
+
+    def bump(self, key=None):
+        with self._lock:
+            self._version += 1
+            if key is not None:
+                self._items[key] = self._version
+            return self._version
+
+    def forget(self, key):
+        with self._lock:
+            self._version += 1
+            self._items.pop(key, None)
+
+    def version(self, key=None):
+        if key is None:
+            return self._version
+        return self._items.get(key, 0)
+
+    def etag(self, key=None):
+        return '%s-%s' % (self._epoch, self.version(key))
+
+
+class ResponseCache(object):
+    """ Short-lived cache of serialized responses.
+
+    Each entry is tagged with the ETag of the representation it holds
+    and is only served while that ETag is current, so bumping a version
+    on mutation invalidates every entry built from the old state.
+    """
+
+    def __init__(self, ttl=2, max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+
+    def get(self, key, etag):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            entry_etag, body, expires_at = entry
+            if entry_etag != etag or expires_at < time.time():
+                del self._entries[key]
+                return None
+            return body
+
+    def put(self, key, etag, body):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries.pop(key, None)
+            while len(self._entries) >= self.max_entries:
+                self._entries.popitem(last=False)
+            self._entries[key] = (etag, body, time.time() + self.ttl)
+
+    def invalidate(self, prefix=''):
+        with self._lock:
+            for key in list(self._entries):
+                if key.startswith(prefix):
+                    del self._entries[key]
+
+
+class TTLCache(object):
+    """ Bounded cache whose entries expire after a per-entry TTL.
+
+    When full, the least recently stored entry is evicted first.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return default
+            return value
+
+    def put(self, key, value, ttl):
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries.pop(key, None)
+            while len(self._entries) >= self.max_entries:
+                self._entries.popitem(last=False)
+            self._entries[key] = (value, time.time() + ttl)
+
+    def clear(self):
+        with self._lock:
+            size = len(self._entries)
+            self._entries.clear()
+            return size
+
+    def __len__(self):
+        return len(self._entries)
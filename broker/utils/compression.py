@@ -0,0 +1,204 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+import zlib
+
+import flask
+
+from broker.service import api
+from broker.utils import metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Bodies are compressed in slices of this size when streamed
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Upper bounds of the compressed to uncompressed size ratio buckets
+RATIO_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1)
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/x-ndjson',
+                          'application/msgpack', 'application/x-msgpack',
+                          'text/plain')
+
+
+class GzipCompressor(object):
+
+    def __init__(self):
+        # wbits 31 writes the gzip header and trailer
+        self._compressor = zlib.compressobj(api.compression_level,
+                                            zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class ZstdCompressor(object):
+
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=3).compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class BrotliCompressor(object):
+
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=5)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+COMPRESSORS = {'gzip': GzipCompressor}
+if zstandard is not None:
+    COMPRESSORS['zstd'] = ZstdCompressor
+if brotli is not None:
+    COMPRESSORS['br'] = BrotliCompressor
+
+
+def encodings():
+    """ Returns the configured encodings that are available, in order
+    of preference.
+    """
+    return [name for name in api.compression_encodings
+            if name in COMPRESSORS]
+
+
+def negotiate(accept_encodings):
+    """ Returns the encoding preferred by the client among the
+    available ones, or None when the body must be sent as is.
+    """
+    return accept_encodings.best_match(encodings()) or None
+
+
+def compress(body, encoding):
+    """ Compresses ``body`` at once and records the metrics. """
+    start = time.monotonic()
+    compressor = COMPRESSORS[encoding]()
+    compressed = compressor.compress(body) + compressor.finish()
+    _observe(encoding, len(body), len(compressed),
+             time.monotonic() - start)
+    return compressed
+
+
+def compress_stream(chunks, encoding):
+    """ Compresses an iterable of byte chunks, flushing after each one
+    so that a streamed response is not held back by the compressor.
+    """
+    compressor = COMPRESSORS[encoding]()
+    size = compressed_size = 0
+    elapsed = 0.0
+    try:
+        for chunk in chunks:
+            if not isinstance(chunk, bytes):
+                chunk = chunk.encode('utf-8')
+            start = time.monotonic()
+            compressed = compressor.compress(chunk) + compressor.flush()
+            elapsed += time.monotonic() - start
+            size += len(chunk)
+            compressed_size += len(compressed)
+            if compressed:
+                yield compressed
+        compressed = compressor.finish()
+        compressed_size += len(compressed)
+        yield compressed
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+        _observe(encoding, size, compressed_size, elapsed)
+
+
+def _slices(body):
+    for start in range(0, len(body), STREAM_CHUNK_SIZE):
+        yield body[start:start + STREAM_CHUNK_SIZE]
+
+
+def _observe(encoding, size, compressed_size, elapsed):
+    metrics.REGISTRY.histogram('response_compression_seconds',
+                               encoding=encoding).observe(elapsed)
+    metrics.REGISTRY.counter('response_uncompressed_bytes_total',
+                             encoding=encoding).inc(size)
+    metrics.REGISTRY.counter('response_compressed_bytes_total',
+                             encoding=encoding).inc(compressed_size)
+    if size:
+        metrics.REGISTRY.histogram(
+            'response_compression_ratio', buckets=RATIO_BUCKETS,
+            encoding=encoding).observe(compressed_size / float(size))
+
+
+def compress_response(response, encoding=None, stream=True):
+    """ Compresses ``response`` with the encoding negotiated with the
+    client of the current request.
+
+    Bodies smaller than ``compression_min_size`` are sent as is, and
+    bodies of at least ``compression_stream_size`` bytes, like streamed
+    responses, are compressed while they are sent, unless ``stream`` is
+    False.
+    """
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES or \
+            'Content-Encoding' in response.headers or \
+            response.status_code < 200 or response.status_code in (204, 304):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    if encoding is None:
+        encoding = negotiate(flask.request.accept_encodings)
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = compress_stream(response.response, encoding)
+    else:
+        body = response.get_data()
+        if len(body) < api.compression_min_size:
+            return response
+        if stream and len(body) >= api.compression_stream_size:
+            response.response = compress_stream(_slices(body), encoding)
+        else:
+            response.set_data(compress(body, encoding))
+
+    if response.is_streamed:
+        response.headers.pop('Content-Length', None)
+    response.headers['Content-Encoding'] = encoding
+    return response
@@ -13,15 +13,77 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import requests
+import ast
+import hashlib
+import json
+import os
+
+from broker.service import api
+from broker.utils.cache import TTLCache
+from broker.utils.framework import session
+
+# Credentials are only kept in memory as salted hashes. The salt is
+# drawn per process, so the keys are useless outside of it.
+_SALT = os.urandom(16)
+
+_cache = TTLCache(max_entries=api.authorization_cache_size)
+
+
+def _session():
+    return session.get_session('authorization')
+
+
+def credentials_key(authorizer_url, username, password):
+    digest = hashlib.sha256(_SALT)
+    for value in (authorizer_url, username, password):
+        digest.update(str(value).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def parse_authorization(content):
+    """ Parses the body returned by the authorization service.
+
+    The service answers with JSON, older versions with a Python
+    literal. Anything else is treated as a failed authorization.
+    """
+    try:
+        content_dict = json.loads(content)
+    except ValueError:
+        try:
+            content_dict = ast.literal_eval(content)
+        except (ValueError, SyntaxError):
+            return {'success': False}
+
+    if not isinstance(content_dict, dict):
+        return {'success': False}
+    return content_dict
 
 
 def get_authorization(authorizer_url, username, password):
+    key = credentials_key(authorizer_url, username, password)
+    content_dict = _cache.get(key)
+    if content_dict is not None:
+        return content_dict
+
     format_data = (lambda user, pwd: "user=%s&pwd=%s" % (user, pwd))
 
     data = format_data(username, password)
-    r = requests.post(authorizer_url, data=data)
-    content_dict = eval(r.content.replace("true", "True").replace("false",
-                                                                  "False"))
+    r = _session().post(authorizer_url, data=data)
+    content_dict = parse_authorization(r.text)
+
+    if r.ok:
+        if content_dict.get('success'):
+            ttl = api.authorization_cache_ttl
+        else:
+            ttl = api.authorization_cache_negative_ttl
+        _cache.put(key, content_dict, ttl)
 
     return content_dict
+
+
+def flush_cache():
+    """ Drops every cached authorization and returns how many
+    entries were dropped.
+    """
+    return _cache.clear()
@@ -0,0 +1,134 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import math
+import threading
+import time
+
+from broker import exceptions as ex
+from broker.service import api
+from broker.utils.logger import Log
+
+LOG = Log("CircuitBreaker", "logs/framework.log")
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+class CircuitBreaker(object):
+    """ Circuit breaker of one framework service.
+
+    After ``failure_threshold`` consecutive failures the circuit opens
+    and calls fail fast with ServiceUnavailableException. Once
+    ``reset_timeout`` seconds have passed, up to ``half_open_calls``
+    probes are let through: a success closes the circuit again and a
+    failure keeps it open for another ``reset_timeout``.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30,
+                 half_open_calls=1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.probes = 0
+
+    def before_call(self):
+        """ Raises ServiceUnavailableException when the call must not
+        reach the service.
+        """
+        with self._lock:
+            if self.state == OPEN:
+                remaining = self.opened_at + self.reset_timeout - \
+                    time.monotonic()
+                if remaining > 0:
+                    raise ex.ServiceUnavailableException(
+                        self.name, int(math.ceil(remaining)))
+                self.state = HALF_OPEN
+                self.probes = 0
+                LOG.log("Circuit of %s half-open" % self.name)
+
+            if self.state == HALF_OPEN:
+                if self.probes >= self.half_open_calls:
+                    raise ex.ServiceUnavailableException(self.name, 1)
+                self.probes += 1
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                LOG.log("Circuit of %s closed" % self.name)
+            self.state = CLOSED
+            self.failures = 0
+            self.probes = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or \
+                    self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    LOG.log("Circuit of %s opened after %d failures"
+                            % (self.name, self.failures))
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.probes = 0
+
+    def call(self, func, *args, **kwargs):
+        self.before_call()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    def snapshot(self):
+        with self._lock:
+            snapshot = {'state': self.state,
+                        'consecutive_failures': self.failures}
+            if self.state == OPEN:
+                snapshot['retry_after'] = max(0, int(math.ceil(
+                    self.opened_at + self.reset_timeout -
+                    time.monotonic())))
+        return snapshot
+
+
+def get_breaker(service):
+    breaker = _breakers.get(service)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(service)
+            if breaker is None:
+                breaker = CircuitBreaker(
+                    service,
+                    failure_threshold=api.breaker_failure_threshold,
+                    reset_timeout=api.breaker_reset_timeout)
+                _breakers[service] = breaker
+    return breaker
+
+
+def states():
+    """ Returns the state of the breaker of every framework service. """
+    return dict((service, get_breaker(service).snapshot())
+                for service in sorted(api.pool_sizes))
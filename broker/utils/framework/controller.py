@@ -14,9 +14,13 @@
 # limitations under the License.
 
 import json
-import requests
 
 from broker.service import api
+from broker.utils.framework import session
+
+
+def _session():
+    return session.get_session('controller')
 
 
 def start_controller(controller_url, app_id, workers, data):
@@ -28,7 +32,7 @@ def start_controller(controller_url, app_id, workers, data):
     controller_data['plugin_info'] = data['scaling_parameters']
     controller_data['plugin_info']['instances'] = workers
     controller_body = json.dumps(controller_data)
-    requests.post(request_url, data=controller_body, headers=headers)
+    _session().post(request_url, data=controller_body, headers=headers)
 
 
 def start_controller_k8s(controller_url, app_id, data):
@@ -36,13 +40,13 @@ def start_controller_k8s(controller_url, app_id, data):
     headers = {'Content-type': 'application/json'}
     data.update({"app_id": app_id})
     data = json.dumps(data)
-    requests.post(request_url, data=data, headers=headers)
+    _session().post(request_url, data=data, headers=headers)
 
 
 def stop_controller(controller_url, app_id):
     stop_scaling_url = controller_url + '/scaling/' + app_id + '/stop'
     headers = {'Content-type': 'application/json'}
-    requests.put(stop_scaling_url, headers=headers)
+    return _session().put(stop_scaling_url, headers=headers)
 
 
 def setup_environment(controller_url, instances, cap, data):
@@ -57,7 +61,8 @@ def setup_environment(controller_url, instances, cap, data):
     data["instances_cap"] = instances_cap
     data['actuator_plugin'] = data['scaling_parameters']['actuator']
 
-    requests.post(setup_enviroment_url, data=json.dumps(data), headers=headers)
+    _session().post(setup_enviroment_url, data=json.dumps(data),
+                    headers=headers)
 
 
 def install_plugin(source, plugin):
@@ -65,5 +70,5 @@ def install_plugin(source, plugin):
         "install_source": source,
         "plugin_source": plugin
     }
-    return requests.post("{}/plugins".format(api.controller_url),
-                         json=payload)
+    return _session().post("{}/plugins".format(api.controller_url),
+                           json=payload)
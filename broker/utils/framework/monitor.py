@@ -15,8 +15,12 @@
 # limitations under the License.
 
 import json
-import requests
 from broker.service import api
+from broker.utils.framework import session
+
+
+def _session():
+    return session.get_session('monitor')
 
 
 def _get_monitor_data(plugin, plugin_info, collect_period=10):
@@ -33,7 +37,7 @@ def get_job_report(monitor_url, app_id, plugin, plugin_info):
     request_url = monitor_url + '/monitoring/' + app_id + '/report'
     headers = {'Content-type': 'application/json'}
     data = _get_monitor_data(plugin, plugin_info)
-    resp = requests.get(request_url, data=data, headers=headers)
+    resp = _session().get(request_url, data=data, headers=headers)
     return resp.status_code, json.loads(resp.text)
 
 
@@ -41,7 +45,7 @@ def get_detailed_report(monitor_url, app_id, plugin, plugin_info):
     request_url = monitor_url + '/monitoring/' + app_id + '/report/detailed'
     headers = {'Content-type': 'application/json'}
     data = _get_monitor_data(plugin, plugin_info)
-    resp = requests.get(request_url, data=data, headers=headers)
+    resp = _session().get(request_url, data=data, headers=headers)
     return json.loads(resp.text)
 
 
@@ -49,13 +53,13 @@ def start_monitor(monitor_url, app_id, plugin, plugin_info, collect_period):
     request_url = monitor_url + '/monitoring/' + app_id
     headers = {'Content-type': 'application/json'}
     data = _get_monitor_data(plugin, plugin_info, collect_period)
-    requests.post(request_url, data=data, headers=headers)
+    _session().post(request_url, data=data, headers=headers)
 
 
 def stop_monitor(monitor_url, app_id):
     request_url = monitor_url + '/monitoring/' + app_id + "/stop"
     headers = {'Content-type': 'application/json'}
-    requests.put(request_url, headers=headers)
+    return _session().put(request_url, headers=headers)
 
 
 def install_plugin(source, plugin):
@@ -63,5 +67,5 @@ def install_plugin(source, plugin):
         "install_source": source,
         "plugin_source": plugin
     }
-    return requests.post("{}/plugins".format(api.monitor_url),
-                         json=payload)
+    return _session().post("{}/plugins".format(api.monitor_url),
+                           json=payload)
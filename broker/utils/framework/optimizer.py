@@ -14,7 +14,11 @@
 # limitations under the License.
 
 import json
-import requests
+from broker.utils.framework import session
+
+
+def _session():
+    return session.get_session('optimizer')
 
 
 def _get_optimizer_data(hosts, percentage, dummy):
@@ -32,7 +36,7 @@ def get_cluster_size(optimizer_url, hosts, percentage, dummy):
     request_url = optimizer_url + '/get_cluster_size'
     headers = {'Content-type': 'application/json'}
     data = _get_optimizer_data(hosts, percentage, dummy)
-    request = requests.get(request_url, data=data, headers=headers)
+    request = _session().get(request_url, data=data, headers=headers)
     data = request.json()
 
     return data['cluster_size']
@@ -44,7 +48,7 @@ def get_info(optimizer_url, expected_time, app_name, days=0):
                                    (app_name, days, expected_ms_time))
 
     headers = {'Content-type': 'application/json'}
-    request = requests.get(request_url, headers=headers)
+    request = _session().get(request_url, headers=headers)
 
     data = request.text.split()
     cores = int(data[0])
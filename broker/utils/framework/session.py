@@ -0,0 +1,121 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+
+import requests
+
+from requests import adapters
+from six.moves.urllib import parse
+
+from broker.service import api
+from broker.utils import metrics
+from broker.utils.framework import breaker as circuit_breaker
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+class ServiceSession(object):
+    """ Keep-alive HTTP client of one framework service.
+
+    Connections are pooled per host and reused by every thread, and
+    every request gets the configured connect and read timeouts unless
+    the caller passes its own. The latency of each request is recorded
+    per service and target host.
+
+    When a breaker is given, requests fail fast while it is open, and
+    transport errors and 5xx responses count as failures.
+    """
+
+    def __init__(self, service, pool_size=10, connect_timeout=3.05,
+                 read_timeout=30, breaker=None):
+        self.service = service
+        self.breaker = breaker
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        adapter = adapters.HTTPAdapter(pool_connections=pool_size,
+                                       pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        target = parse.urlsplit(url).netloc
+        if self.breaker is not None:
+            self.breaker.before_call()
+        start = time.monotonic()
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except Exception as e:
+            metrics.REGISTRY.counter(
+                'framework_request_errors_total', service=self.service,
+                target=target, error=type(e).__name__).inc()
+            if self.breaker is not None:
+                self.breaker.record_failure()
+            raise
+        finally:
+            metrics.REGISTRY.histogram(
+                'framework_request_seconds', service=self.service,
+                target=target).observe(time.monotonic() - start)
+
+        if self.breaker is not None:
+            if response.status_code >= 500:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request('PUT', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+def get_session(service):
+    """ Returns the shared session of ``service``, creating it on the
+    first call.
+    """
+    session = _sessions.get(service)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(service)
+            if session is None:
+                session = ServiceSession(
+                    service,
+                    pool_size=api.pool_sizes.get(service, api.pool_size),
+                    connect_timeout=api.connect_timeout,
+                    read_timeout=api.read_timeout,
+                    breaker=circuit_breaker.get_breaker(service))
+                _sessions[service] = session
+    return session
+
+
+def close_all():
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
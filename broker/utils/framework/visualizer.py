@@ -15,8 +15,12 @@
 
 import ast
 import json
-import requests
 from broker.service import api
+from broker.utils.framework import session
+
+
+def _session():
+    return session.get_session('visualizer')
 
 
 def start_visualization(visualizer_url, app_id, data):
@@ -25,7 +29,7 @@ def start_visualization(visualizer_url, app_id, data):
     headers = {'Content-type': 'application/json'}
     visualizer_body = json.dumps(data)
 
-    requests.post(request_url, data=visualizer_body, headers=headers)
+    _session().post(request_url, data=visualizer_body, headers=headers)
 
 
 def stop_visualization(visualizer_url, app_id, data):
@@ -39,7 +43,7 @@ def stop_visualization(visualizer_url, app_id, data):
     visualizer_data['datasource_type'] = data['datasource_type']
     visualizer_body = json.dumps(visualizer_data)
 
-    requests.put(request_url, data=visualizer_body, headers=headers)
+    return _session().put(request_url, data=visualizer_body, headers=headers)
 
 
 def get_visualizer_url(visualizer_url, app_id):
@@ -47,7 +51,7 @@ def get_visualizer_url(visualizer_url, app_id):
     request_url = visualizer_url + '/visualizing/' + app_id
     headers = {'Content-type': 'application/json'}
 
-    response_data = requests.get(request_url, headers=headers)
+    response_data = _session().get(request_url, headers=headers)
 
     url = (ast.literal_eval(response_data.text))['url']
 
@@ -59,5 +63,5 @@ def install_plugin(source, plugin):
         "install_source": source,
         "plugin_source": plugin
     }
-    return requests.post("{}/plugins".format(api.visualizer_url),
-                         json=payload)
+    return _session().post("{}/plugins".format(api.visualizer_url),
+                           json=payload)
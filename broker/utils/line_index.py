@@ -0,0 +1,139 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import os
+import threading
+
+CHUNK_SIZE = 2 ** 20
+
+_indexes = collections.OrderedDict()
+_indexes_lock = threading.Lock()
+MAX_INDEXES = 128
+
+
+class LineIndex(object):
+    """ Sparse line index of an append-only text file.
+
+    Keeps the byte offset of every ``step``-th line, so reading from
+    any line only scans at most ``step`` lines. The index is extended
+    incrementally with the bytes appended since the last refresh, and
+    rebuilt when the file is truncated or replaced.
+    """
+
+    def __init__(self, path, step=1024):
+        self.path = path
+        self.step = step
+        self._lock = threading.Lock()
+        self._reset(None)
+
+    def _reset(self, inode):
+        self.inode = inode
+        self.offsets = [0]
+        self.lines = 0
+        self.scanned = 0
+
+    def refresh(self):
+        """ Indexes the lines appended to the file and returns the
+        number of complete lines. A missing file has no lines.
+        """
+        with self._lock:
+            try:
+                stat = os.stat(self.path)
+            except OSError:
+                self._reset(None)
+                return 0
+
+            if stat.st_ino != self.inode or stat.st_size < self.scanned:
+                self._reset(stat.st_ino)
+
+            if stat.st_size > self.scanned:
+                with open(self.path, 'rb') as log_file:
+                    log_file.seek(self.scanned)
+                    self._scan(log_file)
+            return self.lines
+
+    def _scan(self, log_file):
+        position = self.scanned
+        while True:
+            chunk = log_file.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            # count whole chunks at once unless they hold the next
+            # line that must be indexed
+            needed = self.step - self.lines % self.step
+            if chunk.count(b'\n') < needed:
+                self.lines += chunk.count(b'\n')
+            else:
+                start = 0
+                while True:
+                    newline = chunk.find(b'\n', start)
+                    if newline < 0:
+                        break
+                    self.lines += 1
+                    if self.lines % self.step == 0:
+                        self.offsets.append(position + newline + 1)
+                    start = newline + 1
+            position += len(chunk)
+        self.scanned = position
+
+    def read(self, offset, limit):
+        """ Reads up to ``limit`` lines starting at line ``offset``.
+
+        Returns the lines, without line breaks, and the offset of the
+        next line to read. A trailing line still being written is
+        returned but not counted, so it is read again once complete.
+        """
+        self.refresh()
+        with self._lock:
+            block = min(offset // self.step, len(self.offsets) - 1)
+            start = self.offsets[block]
+        skip = offset - block * self.step
+
+        lines = []
+        next_offset = offset
+        try:
+            log_file = open(self.path, 'rb')
+        except (IOError, OSError):
+            return lines, next_offset
+
+        with log_file:
+            log_file.seek(start)
+            for i in range(skip):
+                if not log_file.readline():
+                    return lines, next_offset
+            while len(lines) < limit:
+                line = log_file.readline()
+                if not line:
+                    break
+                if line.endswith(b'\n'):
+                    next_offset += 1
+                lines.append(line.rstrip(b'\r\n').decode('utf-8',
+                                                         'replace'))
+        return lines, next_offset
+
+
+def get_index(path):
+    """ Returns the shared index of ``path``. The indexes of the least
+    recently used files are dropped once there are too many.
+    """
+    with _indexes_lock:
+        index = _indexes.pop(path, None)
+        if index is None:
+            index = LineIndex(path)
+        _indexes[path] = index
+        while len(_indexes) > MAX_INDEXES:
+            _indexes.popitem(last=False)
+    return index
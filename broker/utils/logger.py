@@ -13,28 +13,253 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import atexit
+import configparser
 import logging
 import os
+import queue
+import threading
+import time
+
+from logging import handlers
+
+config = configparser.RawConfigParser()
+config.read('./broker.cfg')
+
+""" Logging configuration """
+max_bytes = config.getint('logging', 'max_bytes', fallback=10 * 2 ** 20)
+backup_count = config.getint('logging', 'backup_count', fallback=5)
+rotation = config.get('logging', 'rotation', fallback='size')
+rotation_when = config.get('logging', 'rotation_when', fallback='midnight')
+queue_size = config.getint('logging', 'queue_size', fallback=10000)
+sample_interval = config.getfloat('logging', 'sample_interval', fallback=10)
+sample_keys = config.getint('logging', 'sample_keys', fallback=1024)
+default_level = config.get('logging', 'level', fallback='INFO').upper()
+levels = config.get('logging', 'levels', fallback='')
+
+
+def parse_level(name):
+    """ Returns the numeric level of a level name, or None when the
+    name is not a level, which is logged.
+    """
+    level = logging.getLevelName(name.strip().upper())
+    if not isinstance(level, int):
+        logging.getLogger(__name__).warning(
+            "Ignoring unknown log level '%s'" % name)
+        return None
+    return level
+
+
+def parse_levels(value):
+    """ Parses a comma separated list of ``LoggerName:LEVEL`` pairs
+    into a dict mapping each logger name to its numeric level. Pairs
+    with an unknown level are skipped.
+    """
+    parsed = {}
+    for item in value.split(','):
+        if not item.strip():
+            continue
+        name, _, level = item.rpartition(':')
+        level = parse_level(level)
+        if level is not None:
+            parsed[name.strip()] = level
+    return parsed
+
+
+class _DispatchingHandler(logging.Handler):
+    """ Handler run by the writer thread. It routes every record to
+    the console and to the files registered for the logger that
+    emitted it.
+    """
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.console = logging.StreamHandler()
+        self.console.setLevel(logging.INFO)
+        self.routes = {}
+        self.files = {}
+        self.routes_lock = threading.Lock()
+
+    def add_route(self, name, output_file_path):
+        with self.routes_lock:
+            path = os.path.abspath(output_file_path)
+            if path not in self.files:
+                self.files[path] = _file_handler(output_file_path)
+            self.routes[name] = self.files[path]
+
+    def handle(self, record):
+        if record.levelno >= self.console.level:
+            self.console.handle(record)
+        handler = self.routes.get(record.name)
+        if handler is not None:
+            handler.handle(record)
+        # the writer caught up, so the drops are over
+        if _dropped.value and _queue.empty():
+            self.report_dropped()
+
+    def report_dropped(self):
+        """ Writes to the console how many records were dropped since
+        the last report. The record is not queued, the queue may be
+        full again.
+        """
+        dropped = _dropped.reset()
+        if dropped:
+            self.console.handle(logging.makeLogRecord({
+                'name': __name__, 'levelno': logging.WARNING,
+                'levelname': 'WARNING',
+                'msg': "%d log records dropped, the log queue was full"
+                       % dropped}))
+
+    def close(self):
+        with self.routes_lock:
+            for handler in self.files.values():
+                handler.close()
+            self.files.clear()
+            self.routes.clear()
+        logging.Handler.close(self)
+
+
+class _DroppingQueueHandler(handlers.QueueHandler):
+    """ QueueHandler that never blocks the caller. Records that do not
+    fit in the queue are dropped and counted, and the writer thread
+    reports the count once it empties the queue.
+    """
+
+    def enqueue(self, record):
+        # the writer thread starts with the first record, so merely
+        # importing modules that create loggers starts no thread
+        if _listener is None:
+            start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _dropped.increment()
+
+
+class _Counter(object):
+
+    def __init__(self):
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def increment(self):
+        with self.lock:
+            self.value += 1
+
+    def reset(self):
+        with self.lock:
+            value, self.value = self.value, 0
+        return value
+
+
+_queue = queue.Queue(queue_size)
+_dropped = _Counter()
+_dispatcher = _DispatchingHandler()
+_queue_handler = _DroppingQueueHandler(_queue)
+_listener = None
+_listener_lock = threading.Lock()
+_stop_registered = False
+_levels = parse_levels(levels)
+_default_level = parse_level(default_level) or logging.INFO
+
+
+def _file_handler(output_file_path):
+    if rotation == 'time':
+        return handlers.TimedRotatingFileHandler(
+            output_file_path, when=rotation_when, backupCount=backup_count)
+    return handlers.RotatingFileHandler(
+        output_file_path, maxBytes=max_bytes, backupCount=backup_count)
+
+
+def start():
+    """ Starts the writer thread, unless it is running already. """
+    global _listener, _stop_registered
+    with _listener_lock:
+        if _listener is None:
+            _listener = handlers.QueueListener(_queue, _dispatcher)
+            _listener.start()
+            if not _stop_registered:
+                atexit.register(stop)
+                _stop_registered = True
+
+
+def flush():
+    """ Blocks until every record queued so far was written. """
+    if _listener is not None:
+        _queue.join()
+    _dispatcher.report_dropped()
+
+
+def stop():
+    """ Writes the pending records and stops the writer thread. """
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
 
 
 class Log:
     def __init__(self, name, output_file_path):
         self._verify_existing_paths()
         self.logger = logging.getLogger(name)
-        if not len(self.logger.handlers):
-            handler = logging.StreamHandler()
-            handler.setLevel(logging.INFO)
-            self.logger.addHandler(handler)
-            handler = logging.FileHandler(output_file_path)
-            self.logger.addHandler(handler)
+        self.logger.setLevel(_levels.get(name, _default_level))
+        if _queue_handler not in self.logger.handlers:
+            _dispatcher.add_route(name, output_file_path)
+            self.logger.addHandler(_queue_handler)
+            self.logger.propagate = False
+        self._samples = {}
+        self._samples_lock = threading.Lock()
 
     def log(self, text):
         self.logger.info(text)
 
+    def sample(self, text, key=None, interval=None):
+        """ Logs ``text`` at most once every ``interval`` seconds
+        for each ``key``. Messages suppressed in between are counted
+        and the count is reported with the next one logged. At most
+        ``sample_keys`` keys are remembered.
+        """
+        if not self.logger.isEnabledFor(logging.INFO):
+            return
+        key = text if key is None else key
+        interval = sample_interval if interval is None else interval
+        now = time.monotonic()
+        with self._samples_lock:
+            last, suppressed = self._samples.get(key, (None, 0))
+            if last is not None and now - last < interval:
+                self._samples[key] = (last, suppressed + 1)
+                return
+            if key not in self._samples and \
+               len(self._samples) >= sample_keys:
+                self._prune_samples(now, interval)
+            self._samples[key] = (now, 0)
+        if suppressed:
+            text = "%s (%d similar messages suppressed)" % (text, suppressed)
+        self.logger.info(text)
+
+    def _prune_samples(self, now, interval):
+        # keys whose interval is over would be logged anyway, then the
+        # least recently logged ones go
+        samples = dict((key, sample) for key, sample in self._samples.items()
+                       if now - sample[0] < interval)
+        if len(samples) >= sample_keys:
+            recent = sorted(samples.items(), key=lambda item: item[1][0],
+                            reverse=True)[:sample_keys // 2]
+            samples = dict(recent)
+        self._samples = samples
+
     def _verify_existing_paths(self):
         if not os.path.exists('logs'):
             os.mkdir('logs')
 
 
 def configure_logging():
-    logging.basicConfig(level=logging.INFO)
+    """ Sends the records of loggers not created through Log, such as
+    the ones of Flask and its dependencies, through the same queue.
+    """
+    root = logging.getLogger()
+    root.setLevel(_default_level)
+    if _queue_handler not in root.handlers:
+        root.addHandler(_queue_handler)
+    start()
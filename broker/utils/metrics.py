@@ -0,0 +1,253 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import bisect
+import collections
+import functools
+import math
+import threading
+import time
+
+# Upper bounds, in seconds, of the latency histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1, 2.5, 5, 10, 30)
+
+
+def percentile(values, q):
+    """ Nearest-rank percentile ``q`` (0-100) of ``values``. """
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = int(math.ceil(q / 100.0 * len(ordered))) - 1
+    return ordered[max(index, 0)]
+
+
+class Counter(object):
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self):
+        return {'value': self.value}
+
+
+class Gauge(object):
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def snapshot(self):
+        return {'value': self.value}
+
+
+class Histogram(object):
+    """ Cumulative bucket counts, as exposed by Prometheus, plus a
+    window of the most recent observations used for percentiles.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, window=1024):
+        self._lock = threading.Lock()
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = collections.deque(maxlen=window)
+
+    def observe(self, value):
+        with self._lock:
+            self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+            self.recent.append(value)
+
+    def percentiles(self, qs=(50, 95, 99)):
+        with self._lock:
+            recent = list(self.recent)
+        return dict(('p%d' % q, percentile(recent, q)) for q in qs)
+
+    def snapshot(self):
+        snapshot = {'count': self.count, 'sum': self.sum}
+        snapshot.update(self.percentiles())
+        return snapshot
+
+
+class Registry(object):
+    """ Named metrics, each one possibly split by a set of labels.
+
+    Asking twice for the same name and labels returns the same metric.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = collections.OrderedDict()
+        self._collectors = []
+
+    def _get(self, kind, name, labels, **options):
+        key = (name, tuple(sorted(labels.items())))
+        metric = self._metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(key)
+                if metric is None:
+                    metric = self._metrics[key] = kind(**options)
+        if not isinstance(metric, kind):
+            raise TypeError("metric %s is not a %s" % (name, kind.__name__))
+        return metric
+
+    def counter(self, name, **labels):
+        return self._get(Counter, name, labels)
+
+    def histogram(self, name, buckets=DEFAULT_BUCKETS, **labels):
+        return self._get(Histogram, name, labels, buckets=buckets)
+
+    def gauge(self, name, **labels):
+        return self._get(Gauge, name, labels)
+
+    def add_collector(self, collector):
+        """ Registers a function called before the metrics are read,
+        to update the gauges that are cheaper to compute on demand.
+        """
+        self._collectors.append(collector)
+
+    def collect(self):
+        for collector in list(self._collectors):
+            collector(self)
+
+    def items(self):
+        """ Returns (name, labels, metric) for every metric. """
+        with self._lock:
+            metrics = list(self._metrics.items())
+        return [(name, dict(labels), metric)
+                for (name, labels), metric in metrics]
+
+    def snapshot(self):
+        return [{'name': name, 'labels': labels,
+                 'value': metric.snapshot()}
+                for name, labels, metric in self.items()]
+
+
+REGISTRY = Registry()
+
+
+def timed(name, **labels):
+    """ Decorator recording the duration of every call of the function
+    in the histogram ``name``. Unless given, the ``operation`` label is
+    the name of the function.
+    """
+    def decorator(func):
+        labels.setdefault('operation', func.__name__)
+        histogram = REGISTRY.histogram(name, **labels)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.monotonic()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(time.monotonic() - start)
+        return wrapper
+    return decorator
+
+
+class InstrumentedClient(object):
+    """ Proxy of a client, like a Redis connection, recording the
+    duration of each of its method calls in the histogram ``name``,
+    labeled by ``command``.
+    """
+
+    def __init__(self, client, name, **labels):
+        self._client = client
+        self._name = name
+        self._labels = labels
+
+    def __getattr__(self, attr):
+        value = getattr(self._client, attr)
+        if not callable(value):
+            return value
+
+        histogram = REGISTRY.histogram(self._name, command=attr,
+                                       **self._labels)
+
+        def call(*args, **kwargs):
+            start = time.monotonic()
+            try:
+                return value(*args, **kwargs)
+            finally:
+                histogram.observe(time.monotonic() - start)
+        return call
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace(
+        '"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels, extra=None):
+    items = sorted(labels.items())
+    if extra is not None:
+        items.append(extra)
+    if not items:
+        return ''
+    return '{%s}' % ','.join('%s="%s"' % (key, _escape(value))
+                             for key, value in items)
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def exposition(registry=REGISTRY):
+    """ Renders the metrics of ``registry`` in the Prometheus text
+    exposition format.
+    """
+    registry.collect()
+    families = collections.OrderedDict()
+    for name, labels, metric in registry.items():
+        families.setdefault(name, []).append((labels, metric))
+
+    lines = []
+    for name, members in families.items():
+        kind = type(members[0][1]).__name__.lower()
+        lines.append('# TYPE %s %s' % (name, kind))
+        for labels, metric in members:
+            if isinstance(metric, Histogram):
+                with metric._lock:
+                    counts = list(metric.bucket_counts)
+                    count, total = metric.count, metric.sum
+                cumulative = 0
+                bounds = metric.buckets + (float('inf'),)
+                for bound, bucket_count in zip(bounds, counts):
+                    cumulative += bucket_count
+                    lines.append('%s_bucket%s %d' % (
+                        name, _labels(labels, ('le', _number(bound))),
+                        cumulative))
+                lines.append('%s_sum%s %s' % (name, _labels(labels),
+                                              _number(total)))
+                lines.append('%s_count%s %d' % (name, _labels(labels),
+                                                count))
+            else:
+                lines.append('%s%s %s' % (name, _labels(labels),
+                                          _number(metric.value)))
+    return '\n'.join(lines) + '\n'
@@ -12,18 +12,26 @@
 # implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import threading
 import time
 
 import kubernetes as kube
 import redis
 
+from six.moves import queue
+
 from broker.service import api
+from broker.utils import metrics
 from influxdb import InfluxDBClient
 from broker.utils.logger import Log
 
 KUBEJOBS_LOG = Log("KubeJobsPlugin", "logs/kubejobs.log")
 
+# Longest pod log line buffered, longer lines are cut
+MAX_LOG_LINE_BYTES = 64 * 1024
+
 
+@metrics.timed('k8s_call_seconds')
 def create_job(app_id, cmd, img, init_size, env_vars,
                config_id="",
                cas_addr="",
@@ -104,6 +112,7 @@ def create_job(app_id, cmd, img, init_size, env_vars,
     return job
 
 
+@metrics.timed('k8s_call_seconds')
 def provision_redis_or_die(app_id, namespace="default",
                            redis_port=6379, timeout=60):
     """Provision a redis database for the workload being executed.
@@ -193,7 +202,8 @@ def provision_redis_or_die(app_id, namespace="default",
     start = time.time()
     while time.time() - start < timeout:
         time.sleep(5)
-        KUBEJOBS_LOG.log("trying redis on %s:%s..." % (redis_ip, node_port))
+        KUBEJOBS_LOG.sample("trying redis on %s:%s..."
+                            % (redis_ip, node_port), key=name)
         try:
             r = redis.StrictRedis(host=redis_ip, port=node_port)
             if r.info()['loading'] == 0:
@@ -202,7 +212,8 @@ def provision_redis_or_die(app_id, namespace="default",
                                  % (redis_ip, node_port))
                 break
         except redis.exceptions.ConnectionError:
-            KUBEJOBS_LOG.log("redis is not ready yet")
+            KUBEJOBS_LOG.sample("redis is not ready yet",
+                                key="%s-not-ready" % name)
 
     if redis_ready:
         return redis_ip, node_port
@@ -215,12 +226,14 @@ def provision_redis_or_die(app_id, namespace="default",
         raise Exception("Could not provision redis")
 
 
+@metrics.timed('k8s_call_seconds')
 def completed(app_id, namespace="default"):
     job_api = kube.client.BatchV1Api()
     job = job_api.read_namespaced_job_status(name=app_id, namespace=namespace)
     return job.status.completion_time is not None
 
 
+@metrics.timed('k8s_call_seconds')
 def get_job_status(app_id, namespace="default"):
     kube.config.load_kube_config(api.k8s_conf_path)
 
@@ -230,6 +243,129 @@ def get_job_status(app_id, namespace="default"):
     return status
 
 
+@metrics.timed('k8s_call_seconds')
+def list_job_statuses(namespace="default"):
+    """Statuses of every job of the namespace by name, read with a
+    single call instead of one :func:`get_job_status` per job"""
+    kube.config.load_kube_config(api.k8s_conf_path)
+
+    job_api = kube.client.BatchV1Api()
+    jobs = job_api.list_namespaced_job(namespace=namespace)
+    return dict((job.metadata.name, job.status) for job in jobs.items)
+
+
+@metrics.timed('k8s_call_seconds')
+def list_job_pods(app_id, namespace="default"):
+    """Names of the pods created by the job ``app_id``"""
+    kube.config.load_kube_config(api.k8s_conf_path)
+
+    CoreV1Api = kube.client.CoreV1Api()
+    pods = CoreV1Api.list_namespaced_pod(
+        namespace=namespace, label_selector="job-name=%s" % app_id)
+    return sorted(pod.metadata.name for pod in pods.items)
+
+
+@metrics.timed('k8s_call_seconds')
+def stream_job_logs(app_id, namespace="default", follow=False,
+                    limit_bytes=None, tail_lines=None, buffer_lines=1000):
+    """Multiplexes the logs of every pod of the job ``app_id``.
+
+    Each pod log is read by its own thread into a queue holding at most
+    ``buffer_lines`` lines, so a pod that writes faster than the client
+    reads is paused instead of growing the manager memory. Closing the
+    returned generator stops the readers and releases the connections.
+
+    Returns:
+        generator -- Yields ``(pod_name, line)`` tuples as the lines
+        arrive, until every log ends. With ``follow`` the logs only end
+        when the pods stop.
+    """
+    pods = list_job_pods(app_id, namespace)
+
+    kwargs = {'follow': follow, '_preload_content': False}
+    if limit_bytes:
+        kwargs['limit_bytes'] = limit_bytes
+    if tail_lines is not None:
+        kwargs['tail_lines'] = tail_lines
+
+    return _multiplex_logs(kube.client.CoreV1Api(), pods, namespace,
+                           kwargs, buffer_lines)
+
+
+def _multiplex_logs(CoreV1Api, pods, namespace, kwargs, buffer_lines):
+    lines = queue.Queue(maxsize=buffer_lines)
+    stop = threading.Event()
+    done = object()
+    responses = []
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                lines.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                pass
+
+    def read(pod):
+        response = None
+        try:
+            response = CoreV1Api.read_namespaced_pod_log(
+                name=pod, namespace=namespace, **kwargs)
+            responses.append(response)
+            if stop.is_set():
+                return
+            for line in _split_lines(response.stream(4096), stop):
+                put((pod, line))
+        except Exception as e:
+            if not stop.is_set():
+                KUBEJOBS_LOG.log("Log of pod %s interrupted: %s" % (pod, e))
+                put((pod, "error reading log: %s" % e))
+        finally:
+            if response is not None:
+                response.release_conn()
+            put(done)
+
+    readers = [threading.Thread(target=read, args=(pod,),
+                                name="pod-log-%s" % pod)
+               for pod in pods]
+    for reader in readers:
+        reader.daemon = True
+        reader.start()
+
+    try:
+        running = len(readers)
+        while running:
+            item = lines.get()
+            if item is done:
+                running -= 1
+            else:
+                yield item
+    finally:
+        stop.set()
+        for response in list(responses):
+            response.close()
+
+
+def _split_lines(chunks, stop):
+    """Splits a stream of byte chunks in decoded lines of at most
+    MAX_LOG_LINE_BYTES."""
+    pending = b''
+    for chunk in chunks:
+        if stop.is_set():
+            return
+        lines = (pending + chunk).split(b'\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line[:MAX_LOG_LINE_BYTES].decode('utf-8', 'replace')
+        if len(pending) > MAX_LOG_LINE_BYTES:
+            # a line without end is flushed in pieces
+            yield pending[:MAX_LOG_LINE_BYTES].decode('utf-8', 'replace')
+            pending = pending[MAX_LOG_LINE_BYTES:]
+    if pending:
+        yield pending.decode('utf-8', 'replace')
+
+
+@metrics.timed('k8s_call_seconds')
 def delete_redis_resources(app_id, namespace="default"):
     """Delete redis resources (Pod and Service) for a given ``app_id``"""
 
@@ -242,12 +378,25 @@ def delete_redis_resources(app_id, namespace="default"):
     name = "redis-%s" % app_id
     # create generic ``V1DeleteOptions``
     delete = kube.client.V1DeleteOptions()
-    CoreV1Api.delete_namespaced_pod(
-        name=name, namespace=namespace, body=delete)
-    CoreV1Api.delete_namespaced_service(
-        name=name, namespace=namespace, body=delete)
+    _delete_if_exists(CoreV1Api.delete_namespaced_pod,
+                      name=name, namespace=namespace, body=delete)
+    _delete_if_exists(CoreV1Api.delete_namespaced_service,
+                      name=name, namespace=namespace, body=delete)
+
+
+def _delete_if_exists(delete, **kwargs):
+    """ Calls ``delete`` ignoring the resources that are already
+    gone, so that a teardown interrupted halfway can be run again.
+    """
+    try:
+        delete(**kwargs)
+    except kube.client.rest.ApiException as e:
+        if e.status != 404:
+            raise
+        KUBEJOBS_LOG.log("%s already deleted" % kwargs.get('name'))
 
 
+@metrics.timed('k8s_call_seconds')
 def terminate_job(app_id, namespace="default"):
 
     kube.config.load_kube_config(api.k8s_conf_path)
@@ -257,10 +406,11 @@ def terminate_job(app_id, namespace="default"):
     delete = kube.client.V1DeleteOptions(propagation_policy='Foreground')
 
     delete_redis_resources(app_id)
-    batch_v1.delete_namespaced_job(
-        name=app_id, namespace=namespace, body=delete)
+    _delete_if_exists(batch_v1.delete_namespaced_job,
+                      name=app_id, namespace=namespace, body=delete)
 
 
+@metrics.timed('k8s_call_seconds')
 def create_influxdb(app_id, database_name="asperathos",
                     img="influxdb", namespace="default",
                     visualizer_port=8086, timeout=60):
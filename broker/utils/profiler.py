@@ -0,0 +1,149 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import cProfile
+import hmac
+import pstats
+import random
+import threading
+
+import flask
+
+from broker.service import api
+
+PROFILE_HEADER = 'X-Debug-Profile'
+
+# Functions kept per endpoint between requests, as a multiple of the
+# number served, so the top ones survive the trimming
+KEPT_FUNCTIONS_FACTOR = 5
+
+
+class EndpointProfile(object):
+    """ Statistics of the profiled requests of one endpoint, aggregated
+    per function. Only the functions with the highest cumulative time
+    are kept, which bounds the memory used.
+    """
+
+    def __init__(self, max_functions):
+        self.max_functions = max_functions
+        self.requests = 0
+        self.functions = {}
+
+    def add(self, stats):
+        self.requests += 1
+        for (filename, line, name), entry in stats.stats.items():
+            calls, tottime, cumtime, callers = entry[1:]
+            key = '%s:%d(%s)' % (filename, line, name)
+            function = self.functions.get(key)
+            if function is None:
+                function = self.functions[key] = {
+                    'function': key, 'calls': 0, 'tottime': 0.0,
+                    'cumtime': 0.0, 'callers': collections.Counter()}
+            function['calls'] += calls
+            function['tottime'] += tottime
+            function['cumtime'] += cumtime
+            for (c_filename, c_line, c_name), c_entry in callers.items():
+                function['callers']['%s:%d(%s)' % (
+                    c_filename, c_line, c_name)] += c_entry[1]
+
+        if len(self.functions) > self.max_functions:
+            kept = self.top(self.max_functions)
+            self.functions = dict((f['function'], f) for f in kept)
+
+    def top(self, n):
+        return sorted(self.functions.values(),
+                      key=lambda f: f['cumtime'], reverse=True)[:n]
+
+    def snapshot(self, n):
+        functions = []
+        for function in self.top(n):
+            function = dict(function)
+            function['callers'] = [
+                caller for caller, calls in
+                function['callers'].most_common(3)]
+            functions.append(function)
+        return {'requests': self.requests, 'functions': functions}
+
+
+class Profiler(object):
+    """ Profiles a sample of the requests of each endpoint.
+
+    A request is profiled with probability ``sample_rate``, or when it
+    carries the debug token in the X-Debug-Profile header. Only one
+    request is profiled at a time, so the overhead stays bounded under
+    load, and at most ``max_endpoints`` endpoints are kept, dropping
+    the least recently profiled one.
+    """
+
+    def __init__(self, sample_rate=0.0, top=20, max_endpoints=64,
+                 token=None):
+        self.sample_rate = sample_rate
+        self.top = top
+        self.max_endpoints = max_endpoints
+        self.token = token
+        self._active = threading.Lock()
+        self._lock = threading.Lock()
+        self._profiles = collections.OrderedDict()
+
+    def wanted(self, headers):
+        header = headers.get(PROFILE_HEADER)
+        if header and self.token and \
+                hmac.compare_digest(header, self.token):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def call(self, endpoint, func, *args, **kwargs):
+        """ Calls ``func``, profiling the call when it is sampled. """
+        if not self.wanted(flask.request.headers) or \
+                not self._active.acquire(False):
+            return func(*args, **kwargs)
+
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(func, *args, **kwargs)
+        finally:
+            self._active.release()
+            self._add(endpoint, pstats.Stats(profile))
+
+    def _add(self, endpoint, stats):
+        with self._lock:
+            endpoint_profile = self._profiles.pop(endpoint, None)
+            if endpoint_profile is None:
+                endpoint_profile = EndpointProfile(
+                    self.top * KEPT_FUNCTIONS_FACTOR)
+            endpoint_profile.add(stats)
+            self._profiles[endpoint] = endpoint_profile
+            while len(self._profiles) > self.max_endpoints:
+                self._profiles.popitem(last=False)
+
+    def snapshot(self, endpoint=None):
+        """ Returns the top functions of every profiled endpoint, or
+        only of ``endpoint``, by cumulative time.
+        """
+        with self._lock:
+            return dict((name, profile.snapshot(self.top))
+                        for name, profile in self._profiles.items()
+                        if endpoint is None or name == endpoint)
+
+    def clear(self):
+        with self._lock:
+            self._profiles.clear()
+
+
+PROFILER = Profiler(sample_rate=api.profile_sample_rate,
+                    top=api.profile_top,
+                    max_endpoints=api.profile_max_endpoints,
+                    token=api.debug_token)
@@ -14,11 +14,128 @@
 # limitations under the License.
 
 import datetime
+import enum
 import json
+import math
 import six
 
 from broker import exceptions
 
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _sanitizer(obj):
+    if isinstance(obj, datetime.datetime):
+        _dtime = obj - datetime.timedelta(microseconds=obj.microsecond)
+        return _dtime.isoformat()
+    if isinstance(obj, enum.Enum):
+        return obj.value
+    return six.text_type(obj)
+
+
+def _finite(obj):
+    """Replaces NaN and infinities, which JSON can't represent,
+    with None, as orjson does."""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return dict((key, _finite(value)) for key, value in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return [_finite(value) for value in obj]
+    return obj
+
+
+class StdlibJSONBackend(object):
+    """JSON backend based on the standard library.
+
+    Its output matches the orjson backend: compact separators,
+    non-ASCII characters left unescaped, NaN and infinities as null
+    and enums as their values. Bodies then don't depend on whether
+    orjson is installed.
+    """
+
+    name = 'json'
+
+    def dumps(self, data):
+        try:
+            return json.dumps(data, default=_sanitizer, allow_nan=False,
+                              ensure_ascii=False, separators=(',', ':'))
+        except ValueError:
+            # only bodies with non-finite floats pay for the copy
+            return json.dumps(_finite(data), default=_sanitizer,
+                              ensure_ascii=False, separators=(',', ':'))
+
+    def loads(self, datastring):
+        return json.loads(datastring)
+
+
+class OrjsonBackend(StdlibJSONBackend):
+    """JSON backend based on orjson.
+
+    Datetimes are passed through to the same sanitizer used by the
+    standard library backend, so both produce the same timestamps.
+    Payloads orjson refuses, like integers wider than 64 bits, fall
+    back to the standard library. The output is UTF-8 encoded bytes,
+    otherwise the same as the standard library backend.
+    """
+
+    name = 'orjson'
+
+    def __init__(self):
+        self.options = (orjson.OPT_PASSTHROUGH_DATETIME |
+                        orjson.OPT_NON_STR_KEYS)
+
+    def dumps(self, data):
+        try:
+            return orjson.dumps(data, default=_sanitizer,
+                                option=self.options)
+        except TypeError:
+            return super(OrjsonBackend, self).dumps(data)
+
+    def loads(self, datastring):
+        return orjson.loads(datastring)
+
+
+JSON_BACKENDS = {StdlibJSONBackend.name: StdlibJSONBackend()}
+if orjson is not None:
+    JSON_BACKENDS[OrjsonBackend.name] = OrjsonBackend()
+
+_json_backend = JSON_BACKENDS.get(OrjsonBackend.name,
+                                  JSON_BACKENDS[StdlibJSONBackend.name])
+
+
+def register_json_backend(backend):
+    """Makes a backend with ``name``, ``dumps`` and ``loads``
+    available to :func:`set_json_backend`."""
+    JSON_BACKENDS[backend.name] = backend
+
+
+def set_json_backend(name):
+    """Selects the backend used to (de)serialize JSON bodies.
+
+    ``auto`` keeps the fastest backend installed.
+    """
+    global _json_backend
+    if name == 'auto':
+        return _json_backend
+    if name not in JSON_BACKENDS:
+        raise exceptions.ConfigurationError(
+            "JSON backend '%s' is not available" % name)
+    _json_backend = JSON_BACKENDS[name]
+    return _json_backend
+
+
+def get_json_backend():
+    return _json_backend
+
 
 class ActionDispatcher(object):
     """Maps method name to local methods through action name."""
@@ -47,12 +164,18 @@ class JSONDictSerializer(DictSerializer):
     """Default JSON request body serialization."""
 
     def default(self, data):
-        def sanitizer(obj):
-            if isinstance(obj, datetime.datetime):
-                _dtime = obj - datetime.timedelta(microseconds=obj.microsecond)
-                return _dtime.isoformat()
-            return six.text_type(obj)
-        return json.dumps(data, default=sanitizer)
+        return get_json_backend().dumps(data)
+
+
+class MsgpackDictSerializer(DictSerializer):
+    """MessagePack request body serialization.
+
+    Datetimes and other types MessagePack can't represent go through
+    the same sanitizer as JSON, so both carry the same values.
+    """
+
+    def default(self, data):
+        return msgpack.packb(data, default=_sanitizer, use_bin_type=True)
 
 
 class TextDeserializer(ActionDispatcher):
@@ -69,10 +192,26 @@ class JSONDeserializer(TextDeserializer):
 
     def _from_json(self, datastring):
         try:
-            return json.loads(datastring)
+            return get_json_backend().loads(datastring)
         except ValueError:
             msg = ("cannot understand JSON")
             raise exceptions.MalformedRequestBody(msg)
 
     def default(self, datastring):
         return {'body': self._from_json(datastring)}
+
+
+class MsgpackDeserializer(TextDeserializer):
+
+    def default(self, datastring):
+        try:
+            body = msgpack.unpackb(datastring, raw=False,
+                                   strict_map_key=False)
+        except Exception:
+            msg = ("cannot understand MessagePack")
+            raise exceptions.MalformedRequestBody(msg)
+        return {'body': body}
+
+
+def msgpack_available():
+    return msgpack is not None
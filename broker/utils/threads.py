@@ -0,0 +1,110 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+import threading
+import time
+import traceback
+
+# Innermost frames reported per thread
+STACK_DEPTH = 8
+
+_threads = {}
+_executors = {}
+_lock = threading.Lock()
+
+
+def start_thread(target, role, app_id=None, args=(), kwargs=None,
+                 daemon=True):
+    """ Starts ``target`` in a thread named after its ``role`` and the
+    job it serves, registered until it returns.
+
+    Returns:
+        threading.Thread -- The started thread
+    """
+    name = role if app_id is None else '%s:%s' % (role, app_id)
+
+    def run():
+        try:
+            target(*args, **(kwargs or {}))
+        finally:
+            with _lock:
+                _threads.pop(threading.current_thread(), None)
+
+    thread = threading.Thread(target=run, name=name)
+    thread.daemon = daemon
+    with _lock:
+        _threads[thread] = {'role': role, 'app_id': app_id,
+                            'started': time.monotonic()}
+    thread.start()
+    return thread
+
+
+def register_executor(name, executor):
+    """ Makes the threads and the backlog of a ThreadPoolExecutor
+    visible in :func:`snapshot`.
+    """
+    with _lock:
+        _executors[name] = executor
+
+
+def unregister_executor(name):
+    with _lock:
+        _executors.pop(name, None)
+
+
+def _stack(frame):
+    return ['%s:%d in %s' % (entry.filename, entry.lineno, entry.name)
+            for entry in traceback.extract_stack(frame, STACK_DEPTH)]
+
+
+def snapshot():
+    """ Describes the live threads, innermost frame last, and the
+    registered executors.
+
+    Returns:
+        dict -- 'threads', each with its 'name', 'daemon' flag,
+        'stack' and, when started by :func:`start_thread`, its 'role',
+        'app_id' and 'running_for' seconds, and 'executors', each with
+        its 'max_workers', live 'threads' and 'queued' work items
+    """
+    frames = sys._current_frames()
+    now = time.monotonic()
+    with _lock:
+        registered = dict(_threads)
+        executors = dict(_executors)
+
+    threads = []
+    for thread in threading.enumerate():
+        description = {'name': thread.name, 'daemon': thread.daemon,
+                       'stack': []}
+        frame = frames.get(thread.ident)
+        if frame is not None:
+            description['stack'] = _stack(frame)
+        info = registered.get(thread)
+        if info is not None:
+            description.update({'role': info['role'],
+                                'app_id': info['app_id'],
+                                'running_for': now - info['started']})
+        threads.append(description)
+
+    pools = {}
+    for name, executor in executors.items():
+        # ThreadPoolExecutor has no public accessors for its state
+        pools[name] = {'max_workers': executor._max_workers,
+                       'threads': len(executor._threads),
+                       'queued': executor._work_queue.qsize()}
+
+    return {'threads': threads, 'executors': pools}
@@ -0,0 +1,106 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import contextlib
+import datetime
+import threading
+import time
+
+from broker.utils import metrics
+
+TIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
+
+class Timeline(object):
+    """ Phases a submission went through, in the order they started.
+
+    Each phase records the wall clock time it started at, its offset
+    from the start of the first phase and its duration, both measured
+    with the monotonic clock, and whether it failed. The phases are
+    plain dicts so they can be persisted with the submission.
+    ``current`` is the phase in progress.
+    """
+
+    def __init__(self, phases=None):
+        self._lock = threading.Lock()
+        self.phases = list(phases or [])
+        self.current = None
+        self._origin = None
+        if self.phases:
+            # resume the offsets of a restored timeline from the wall
+            # clock, the monotonic clock of another process is lost
+            started_at = datetime.datetime.strptime(
+                self.phases[0]['started_at'], TIME_FORMAT)
+            elapsed = datetime.datetime.now() - started_at
+            self._origin = time.monotonic() - elapsed.total_seconds()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """ Records the phase ``name`` for the duration of the block.
+        """
+        start = time.monotonic()
+        started_at = datetime.datetime.now()
+        with self._lock:
+            if self._origin is None:
+                self._origin = start
+        previous, self.current = self.current, name
+        status = 'error'
+        try:
+            yield
+            status = 'ok'
+        finally:
+            self.current = previous
+            duration = time.monotonic() - start
+            with self._lock:
+                self.phases.append({
+                    'phase': name,
+                    'started_at': started_at.strftime(TIME_FORMAT),
+                    'offset': start - self._origin,
+                    'duration': duration,
+                    'status': status})
+            metrics.REGISTRY.histogram('submission_phase_seconds',
+                                       phase=name).observe(duration)
+
+    def to_list(self):
+        with self._lock:
+            return [dict(phase) for phase in self.phases]
+
+    def durations(self):
+        """ Returns the total duration of each phase, by name. """
+        durations = {}
+        for phase in self.to_list():
+            durations[phase['phase']] = \
+                durations.get(phase['phase'], 0) + phase['duration']
+        return durations
+
+
+def aggregate(timelines, qs=(50, 95, 99)):
+    """ Summarizes the duration of each phase across ``timelines``.
+
+    Returns:
+        dict -- The count and the percentiles ``qs`` of the duration
+        of each phase, by name
+    """
+    samples = {}
+    for timeline in timelines:
+        for name, duration in timeline.durations().items():
+            samples.setdefault(name, []).append(duration)
+
+    summary = {}
+    for name, durations in samples.items():
+        summary[name] = {'count': len(durations)}
+        for q in qs:
+            summary[name]['p%d' % q] = metrics.percentile(durations, q)
+    return summary
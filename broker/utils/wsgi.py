@@ -0,0 +1,97 @@
+# Copyright (c) 2019 UFCG-LSD.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+
+from concurrent import futures
+
+from six.moves import socketserver
+from werkzeug import serving
+
+from broker.utils import threads
+from broker.utils.logger import Log
+
+LOG = Log("WSGIServer", "logs/wsgi.log")
+
+
+class PooledWSGIServer(socketserver.ThreadingMixIn, serving.BaseWSGIServer):
+    """ WSGI server that hands every accepted connection to a bounded
+    pool of worker threads.
+
+    No more connections are accepted while every worker is busy, so
+    the clients wait in the listen backlog of the socket instead of
+    an unbounded queue of the pool.
+
+    The whole pool lives in a single process, so this process remains
+    the only owner of the in-memory submissions and of the threads that
+    follow each job. Running several copies of the manager against the
+    same persistence would make each of them restore, synchronize and
+    clean the same jobs, which is why a pre-fork server is not used.
+    """
+
+    multithread = True
+    daemon_threads = True
+
+    def __init__(self, host, port, app, pool_size=16, backlog=128,
+                 keepalive_timeout=5):
+        # The listen backlog is read when the socket is activated,
+        # so it has to be set before the base constructor runs.
+        self.request_queue_size = backlog
+        # server_close reads the pool when binding fails in the base
+        # constructor, so it must exist first
+        self.pool_size = pool_size
+        self.keepalive_timeout = keepalive_timeout
+        self.pool = futures.ThreadPoolExecutor(
+            max_workers=pool_size, thread_name_prefix='wsgi-worker')
+        self.slots = threading.BoundedSemaphore(pool_size)
+        serving.BaseWSGIServer.__init__(self, host, port, app)
+        threads.register_executor('wsgi', self.pool)
+
+    def process_request(self, request, client_address):
+        # A keep-alive connection holds its worker until it is closed,
+        # so idle clients are dropped after ``keepalive_timeout`` seconds
+        # to give the worker back to the pool.
+        request.settimeout(self.keepalive_timeout)
+        self.slots.acquire()
+        try:
+            self.pool.submit(self._process_request, request, client_address)
+        except RuntimeError:
+            # the pool was shut down
+            self.slots.release()
+            self.shutdown_request(request)
+
+    def _process_request(self, request, client_address):
+        try:
+            self.process_request_thread(request, client_address)
+        finally:
+            self.slots.release()
+
+    def server_close(self):
+        serving.BaseWSGIServer.server_close(self)
+        self.pool.shutdown(wait=False)
+        threads.unregister_executor('wsgi')
+
+
+def serve(app, host, port, pool_size=16, backlog=128):
+    """ Serves ``app`` with a :class:`PooledWSGIServer` until
+    interrupted.
+    """
+    server = PooledWSGIServer(host, port, app, pool_size, backlog)
+    LOG.log("Serving on %s:%s with %s worker threads" %
+            (host, port, pool_size))
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
@@ -12,22 +12,27 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
 import datetime
 import json
+import re
 import redis
 import requests
 import six
-import threading
 import time
 import uuid
 
+from concurrent import futures
+
 from broker.service import api
+from broker.service import versions
 from broker.plugins import base
-from broker.persistence.etcd_db import plugin as etcd
-from broker.persistence.sqlite import plugin as sqlite
 from broker.utils import ids
 from broker.utils import logger
+from broker.utils import metrics
+from broker.utils import threads
 from broker.utils.plugins import k8s
+from broker.utils.timeline import Timeline
 from broker.utils.framework import monitor, controller, visualizer
 from broker import exceptions as ex
 
@@ -36,9 +41,20 @@ KUBEJOBS_LOG = logger.Log("KubeJobsPlugin", "logs/kubejobs.log")
 application_time_log = \
     logger.Log("Application_time", "logs/application_time.log")
 
+# Shared by every job, so the teardown of many jobs finishing together
+# does not start a set of threads per job.
+TEARDOWN_POOL = futures.ThreadPoolExecutor(
+    max_workers=api.teardown_workers, thread_name_prefix='teardown')
+threads.register_executor('teardown', TEARDOWN_POOL)
+
+# Answer of the monitor for an application it does not monitor.
+NOT_MONITORED = re.compile(r'not (being )?monitored', re.IGNORECASE)
+
 
 class KubeJobsExecutor(base.GenericApplicationExecutor):
 
+    plugin = 'kubejobs'
+
     def __init__(self, app_id, starting_time=None,
                  redis=None, status='created',
                  job_completed=False,
@@ -48,7 +64,8 @@ class KubeJobsExecutor(base.GenericApplicationExecutor):
                  data=None, enable_detailed_report=False,
                  job_resources_lifetime=0, report={},
                  del_resources_authorization=False, finish_time=None,
-                 redis_ip=None, redis_port=None):
+                 redis_ip=None, redis_port=None, cleanup_failures=None,
+                 report_persisted=False, timeline=None):
 
         self.job_resources_lifetime = job_resources_lifetime
         self.id = ids.ID_Generator().get_ID()
@@ -65,10 +82,15 @@ class KubeJobsExecutor(base.GenericApplicationExecutor):
         self.db_connector = self.get_db_connector()
         self.enable_visualizer = enable_visualizer
         self.enable_detailed_report = enable_detailed_report
+        self.report_persisted = report_persisted
         self.report = report
         self.data = data
         self.finish_time = finish_time
         self.del_resources_authorization = del_resources_authorization
+        self.cleanup_failures = cleanup_failures or {}
+        # teardown steps still running after their timeout, by name
+        self.teardown_futures = {}
+        self.timeline = Timeline(timeline)
 
     def __repr__(self):
 
@@ -81,26 +103,99 @@ class KubeJobsExecutor(base.GenericApplicationExecutor):
             "redis_port": self.redis_port
         }
 
+        if self.cleanup_failures:
+            representation["cleanup_failures"] = self.cleanup_failures
+
         representation.update(self.report)
         return json.dumps(representation)
 
+    @property
+    def report(self):
+        # Once stored, the final report is loaded on first use instead
+        # of being carried by the serialized state.
+        if self._report is None:
+            self._report = self.get_final_report()['summary']
+        return self._report
+
+    @report.setter
+    def report(self, report):
+        if report is None and not self.report_persisted:
+            report = {}
+        self._report = report
+
+    def get_final_report(self):
+        final_report = None
+        if self.report_persisted:
+            final_report = self.db_connector.get_report(self.app_id)
+        return final_report or {'summary': {}, 'detailed': None}
+
+    def persist_final_report(self):
+        """ Stores the reports of a finished job as a separate record,
+        which serves them from then on without calling the monitor.
+        """
+        try:
+            detailed_report = self.get_detailed_report()
+        except Exception as e:
+            KUBEJOBS_LOG.log("Detailed report of %s unavailable: %s"
+                             % (self.app_id, e))
+            return
+        if self.enable_detailed_report and 'message' in detailed_report:
+            return
+
+        try:
+            self.db_connector.put_report(self.app_id,
+                                         {'summary': self.report,
+                                          'detailed': detailed_report})
+        except Exception as e:
+            KUBEJOBS_LOG.log("Final report of %s not persisted: %s"
+                             % (self.app_id, e))
+            return
+        self.report_persisted = True
+
     def get_report(self):
         report = {}
         status_code = -1
-        while status_code != 200 and status_code != 400:
-            status_code, report = monitor.get_job_report(
-                                            api.monitor_url,
-                                            self.app_id,
-                                            self.data['monitor_plugin'],
-                                            self.data['monitor_info'])
+        deadline = time.monotonic() + api.report_timeout
+        while True:
+            try:
+                status_code, report = monitor.get_job_report(
+                                                api.monitor_url,
+                                                self.app_id,
+                                                self.data['monitor_plugin'],
+                                                self.data['monitor_info'])
+            except ex.ServiceUnavailableException as e:
+                # the breaker of the monitor is open, polling again
+                # would fail as fast until it closes
+                KUBEJOBS_LOG.log("Report of %s unavailable: %s"
+                                 % (self.app_id, e.message))
+                self.report = {'message': e.message}
+                return -1
+            except (requests.exceptions.RequestException, ValueError) as e:
+                status_code = -1
+                KUBEJOBS_LOG.sample("Report of %s unavailable: %s"
+                                    % (self.app_id, e), key=self.app_id)
+            if status_code == 200 or status_code == 400:
+                break
+            if time.monotonic() >= deadline:
+                status_code = None
+                break
             time.sleep(1)
 
         if status_code == 400:
             report = {'message': 'Monitoring does not exists '
                       'yet or has been deleted!'}
+        elif status_code is None:
+            report = {'message': 'Monitoring did not answer within '
+                      '%s seconds!' % api.report_timeout}
         self.report = report
+        return status_code
 
     def get_detailed_report(self):
+        if self.report_persisted:
+            detailed_report = self.get_final_report()['detailed']
+            if detailed_report is not None:
+                return detailed_report
+
         if not self.enable_detailed_report:
             report = {'message': 'The detailed report is '
                       'disabled to this job!'}
@@ -120,7 +215,7 @@ class KubeJobsExecutor(base.GenericApplicationExecutor):
                           self.status,
                           self.visualizer_url,
                           self.data,
-                          self.report,
+                          None if self.report_persisted else self.report,
                           self.del_resources_authorization,
                           self.finish_time,
                           self.job_resources_lifetime,
@@ -128,14 +223,20 @@ class KubeJobsExecutor(base.GenericApplicationExecutor):
                           self.job_completed,
                           self.enable_visualizer,
                           self.redis_ip,
-                          self.redis_port))
+                          self.redis_port,
+                          self.cleanup_failures,
+                          self.report_persisted,
+                          self.timeline.to_list()))
 
     def get_db_connector(self):
+        # only the configured backend and its client are imported
         if (api.plugin_name == "etcd"):
+            from broker.persistence.etcd_db import plugin as etcd
             return etcd.Etcd3JobPersistence(api.persistence_ip,
                                             api.persistence_port)
 
         elif (api.plugin_name == "sqlite"):
+            from broker.persistence.sqlite import plugin as sqlite
             return sqlite.SqliteJobPersistence()
 
     def enable_detailed_report_if_visualizer_is_enabled(self):
@@ -144,27 +245,41 @@ class KubeJobsExecutor(base.GenericApplicationExecutor):
 
     def start_application(self, data):
         try:
+            phase = self.timeline.phase
             self.data = data
+            self.reindex()
             self.persist_state()
-            self.validate(data)
-            self.enable_detailed_report_if_visualizer_is_enabled()
-            self.activate_related_cluster(data)
-            self.update_env_vars(data)
-            self.setup_redis()
-            database_data, datasource_type = \
-                self.setup_metric_persistence(data)
-            self.update_visualizer_info(data, database_data, self.redis_ip)
-            self.start_visualization(data)
+            with phase('validate'):
+                self.validate(data)
+                self.enable_detailed_report_if_visualizer_is_enabled()
+            with phase('activate_cluster'):
+                self.activate_related_cluster(data)
+                self.update_env_vars(data)
+            with phase('setup_redis'):
+                self.setup_redis()
+            with phase('metric_persistence'):
+                database_data, datasource_type = \
+                    self.setup_metric_persistence(data)
+            with phase('visualization'):
+                self.update_visualizer_info(data, database_data,
+                                            self.redis_ip)
+                self.start_visualization(data)
             self.persist_state()
-            queue_size = self.push_jobs_to_redis(data)
-            self.trigger_job(data)
+            with phase('push_jobs'):
+                queue_size = self.push_jobs_to_redis(data)
+            with phase('trigger'):
+                self.trigger_job(data)
+            self.persist_state()
+            with phase('monitor'):
+                self.update_monitor_info(database_data, datasource_type,
+                                         queue_size)
+                self.start_monitoring(data)
+            with phase('controller'):
+                self.add_redis_info_to_data()
+                self.start_controlling(data)
+            with phase('wait'):
+                self.wait_job_finish(check_interval=1)
             self.persist_state()
-            self.update_monitor_info(database_data, datasource_type,
-                                     queue_size)
-            self.start_monitoring(data)
-            self.add_redis_info_to_data()
-            self.start_controlling(data)
-            self.wait_job_finish(check_interval=1)
 
         except Exception as ex:
             self.terminated = True
@@ -209,8 +324,9 @@ class KubeJobsExecutor(base.GenericApplicationExecutor):
 
         # create a new Redis client and fill the work queue
         if(self.rds is None):
-            self.rds = redis.StrictRedis(host=self.redis_ip,
-                                         port=self.redis_port)
+            self.rds = metrics.InstrumentedClient(
+                redis.StrictRedis(host=self.redis_ip, port=self.redis_port),
+                'redis_command_seconds')
 
     def setup_metric_persistence(self, data):
 
@@ -340,7 +456,8 @@ class KubeJobsExecutor(base.GenericApplicationExecutor):
                 time.sleep(check_interval)
             KUBEJOBS_LOG.log("Job finished - Status: "
                              + self.get_application_state())
-            self.get_report()
+            if self.get_report() == 200:
+                self.persist_final_report()
             self.finish_time = datetime.datetime.now()
             self.set_job_resources_lifetime()
             self.del_resources_authorization = True
@@ -360,40 +477,125 @@ class KubeJobsExecutor(base.GenericApplicationExecutor):
 
     def schedule_resources_deletion(self):
         if self.job_resources_lifetime > 0:
-            api.v10.job_cleaner_svc.\
-                insert_element(self.app_id, self.job_resources_lifetime)
-        else:
-            self.delete_job_resources()
+            self.schedule_cleaner(self.job_resources_lifetime)
+        elif self.delete_job_resources():
+            self.schedule_teardown_retry()
+
+    def schedule_teardown_retry(self):
+        self.schedule_cleaner(api.cleanup_retry_interval)
+
+    def schedule_cleaner(self, seconds):
+        # The cleaner belongs to the manager service, which is not
+        # running when the executor is used on its own.
+        service = getattr(api, 'v10', None)
+        cleaner = getattr(service, 'job_cleaner_svc', None)
+        if cleaner is not None:
+            cleaner.insert_element(self.app_id, seconds)
+
+    def reindex(self):
+        # the submissions of the manager are indexed by state and owner,
+        # which must follow the job even when persisting it fails
+        service = getattr(api, 'v10', None)
+        registry = getattr(service, 'submissions', None)
+        if registry is not None:
+            registry.refresh(self.app_id)
+
+    def teardown_steps(self):
+        """ Returns the steps that release the resources of this job,
+        by name. A service answering with an error status fails its
+        step, like a service that can't be reached, unless it already
+        released the job.
+        """
+        steps = collections.OrderedDict()
+        if self.enable_visualizer:
+            steps['visualizer'] = lambda: self._check_stopped(
+                visualizer.stop_visualization(
+                    api.visualizer_url, self.app_id,
+                    self.data['visualizer_info']))
+        steps['monitor'] = lambda: self._check_stopped(
+            monitor.stop_monitor(api.monitor_url, self.app_id))
+        steps['controller'] = lambda: self._check_stopped(
+            controller.stop_controller(api.controller_url, self.app_id))
+        if not self.get_application_state() == 'terminated':
+            steps['k8s'] = lambda: self.k8s.terminate_job(self.app_id)
+        return steps
+
+    def _check_stopped(self, response):
+        # a component that doesn't know the job anymore released it
+        if response.status_code == 404 or (
+                response.status_code == 400 and
+                NOT_MONITORED.search(response.text or '')):
+            KUBEJOBS_LOG.log("%s already released by %s"
+                             % (self.app_id, response.url))
+            return
+        response.raise_for_status()
 
     def delete_job_resources(self):
-        try:
-            if self.enable_visualizer:
-                visualizer.stop_visualization(api.visualizer_url,
-                                              self.app_id,
-                                              self.data['visualizer_info'])
-
-            monitor.stop_monitor(api.monitor_url, self.app_id)
-            controller.stop_controller(api.controller_url,
-                                       self.app_id)
-
+        """ Runs the teardown steps concurrently, each one bounded by
+        ``teardown_timeout`` seconds. Failed steps are kept in
+        ``cleanup_failures`` and the job keeps its deletion
+        authorization, so the next call retries only those steps.
+        Steps that timed out keep running, and the next call waits for
+        them again instead of starting them twice.
+        """
+        steps = self.teardown_steps()
+        if self.cleanup_failures:
+            steps = collections.OrderedDict(
+                (name, step) for name, step in steps.items()
+                if name in self.cleanup_failures)
+
+        pending = {}
+        for name, step in steps.items():
+            future = self.teardown_futures.get(name)
+            if future is None:
+                future = TEARDOWN_POOL.submit(step)
+                self.teardown_futures[name] = future
+            pending[future] = name
+        done, not_done = futures.wait(pending, timeout=api.teardown_timeout)
+
+        failures = {}
+        for future in done:
+            self.teardown_futures.pop(pending[future], None)
+            error = future.exception()
+            if error is not None:
+                failures[pending[future]] = str(error) or \
+                    type(error).__name__
+        for future in not_done:
+            failures[pending[future]] = "timed out after %s seconds" \
+                % api.teardown_timeout
+
+        if not set(failures) & set(['visualizer', 'monitor', 'controller']):
             self.visualizer_url = "Url is dead!"
             KUBEJOBS_LOG.log("Stoped services")
 
-            # delete redis resources
-            if not self.get_application_state() == 'terminated':
-                self.k8s.terminate_job(self.app_id)
-        except Exception:
-            KUBEJOBS_LOG.log("Job " + self.app_id +
-                             " resources already deleted!")
-        self.del_resources_authorization = False
+        self.cleanup_failures = failures
+        if failures:
+            KUBEJOBS_LOG.log("Job %s teardown failed: %s"
+                             % (self.app_id, failures))
+        else:
+            self.del_resources_authorization = False
         self.persist_state()
+        return failures
 
     def get_application_state(self):
         return self.status
 
+    def get_owner(self):
+        # the user who submitted the job, when authorization is enabled
+        return (self.data or {}).get('username')
+
     def get_visualizer_url(self):
         return self.visualizer_url
 
+    def get_pod_logs(self, follow=False, limit_bytes=None, tail_lines=None):
+        """ Streams the logs of the pods of the job, each line
+        prefixed with the name of its pod.
+        """
+        logs = self.k8s.stream_job_logs(
+            self.app_id, follow=follow, limit_bytes=limit_bytes,
+            tail_lines=tail_lines, buffer_lines=api.pod_log_buffer_lines)
+        return ("[%s] %s" % (pod, line) for pod, line in logs)
+
     def get_application_start_time(self):
         if(self.starting_time is not None):
             return self.starting_time.strftime('%Y-%m-%dT%H:%M:%S.%fGMT')
@@ -402,6 +604,7 @@ class KubeJobsExecutor(base.GenericApplicationExecutor):
 
     def update_application_state(self, state):
         self.status = state
+        self.reindex()
         self.persist_state()
 
     def terminate_job(self):
@@ -428,8 +631,18 @@ class KubeJobsExecutor(base.GenericApplicationExecutor):
     def persist_state(self):
         self.db_connector.\
             put(self.app_id, self)
+        versions.SUBMISSIONS.bump(self.app_id)
+
+    def get_cluster_statuses(self):
+        """ Statuses of every job in Kubernetes by name, read with a
+        single request, to synchronize many jobs at once.
+
+        Returns:
+        dict -- The job statuses by job name
+        """
+        return self.k8s.list_job_statuses()
 
-    def synchronize(self):
+    def synchronize(self, statuses=None):
         """ Infer the job state from job status in Kubernetes.
         If a job is active in Kubernetes, its state is 'ongoing'.
         If a job is not active in Kubernetes, it can be
@@ -437,11 +650,19 @@ class KubeJobsExecutor(base.GenericApplicationExecutor):
         If an exception has been thrown, the job does not exist,
         so its state is 'not found'.
 
+        Args:
+        statuses (dict) -- Job statuses from get_cluster_statuses,
+        used instead of requesting the status of this job. A job
+        missing from them does not exist.
+
         Returns:
         None -
         """
         try:
-            current_status = self.k8s.get_job_status(self.app_id)
+            if statuses is None:
+                current_status = self.k8s.get_job_status(self.app_id)
+            else:
+                current_status = statuses[self.app_id]
             if current_status.active is not None:
                 if self.get_application_state() != 'ongoing':
                     self.update_application_state("ongoing")
@@ -450,20 +671,26 @@ class KubeJobsExecutor(base.GenericApplicationExecutor):
                 if condition == 'Complete':
                     if self.get_application_state() != 'stopped':
                         self.job_completed = True
-                        self.update_application_state("completed")
+                        if self.get_application_state() != 'completed':
+                            self.update_application_state("completed")
                     else:
                         self.terminated = True
                 else:
                     self.terminated = True
-                    self.update_application_state("failed")
+                    if self.get_application_state() != 'failed':
+                        self.update_application_state("failed")
         except Exception:
+            # only persisted when something changed, as persisting bumps
+            # the version of the submission
+            terminated = self.terminated
             self.terminated = True
             final_states = ['completed', 'failed',
-                            'error', 'created', 'stopped']
+                            'error', 'created', 'stopped', 'not found']
             if self.status not in final_states:
 
                 self.update_application_state('not found')
-            self.persist_state()
+            elif not terminated:
+                self.persist_state()
 
     def validate(self, data):
         data_model = {
@@ -542,9 +769,8 @@ class KubeJobsProvider(base.PluginInterface):
         app_id = 'kj-' + str(uuid.uuid4())[0:7]
         executor = KubeJobsExecutor(app_id)
 
-        handling_thread = threading.Thread(target=executor.start_application,
-                                           args=(data,))
-        handling_thread.start()
+        threads.start_thread(executor.start_application, 'application',
+                             app_id=app_id, args=(data,), daemon=False)
         return app_id, executor
 
 
@@ -554,7 +780,8 @@ def rebuild(app_id, starting_time,
             del_resources_auth, finish_time,
             job_resources_lifetime,
             terminated, job_completed,
-            enable_visualizer, redis_ip, redis_port):
+            enable_visualizer, redis_ip, redis_port,
+            cleanup_failures=None, report_persisted=False, timeline=None):
 
     obj = KubeJobsExecutor(app_id=app_id,
                            starting_time=starting_time,
@@ -569,7 +796,10 @@ def rebuild(app_id, starting_time,
                            job_completed=job_completed,
                            enable_visualizer=enable_visualizer,
                            redis_ip=redis_ip,
-                           redis_port=redis_port)
+                           redis_port=redis_port,
+                           cleanup_failures=cleanup_failures,
+                           report_persisted=report_persisted,
+                           timeline=timeline)
     return obj
 
 